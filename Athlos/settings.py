@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -90,6 +91,41 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Compartilhado entre os processos: as versões dos escopos (ETags e cache dos
+# relatórios, ver core/cache_relatorios.py) precisam ser as mesmas em todos os
+# workers, senão uma alteração feita em um deles nunca chega aos outros, que
+# seguem respondendo 304 e servindo relatórios antigos. Em arquivos serve
+# para um host; com mais de um, use Redis/Memcached.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("ATHLOS_CACHE_DIR", BASE_DIR / ".cache"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+# Um cache só do processo (LocMemCache) é recusado pelo check core.E001,
+# exceto quando o servidor roda em um processo só e isto é True.
+RELATORIOS_PROCESSO_UNICO = False
+
+# Tempo máximo (s) de um relatório em cache. As alterações de dados já
+# invalidam as entradas; o limite cobre os períodos relativos a "hoje".
+RELATORIOS_CACHE_TIMEOUT = 600
+
+# Pool local de threads para relatórios pedidos com ?async=1 e tempo (s)
+# que o resultado de uma tarefa concluída fica disponível para consulta.
+RELATORIOS_WORKERS = 2
+RELATORIOS_TAREFAS_TTL = 600
+
+# Processos do pool que faz o hash das senhas das importações pela API. O pool
+# é criado uma vez por worker e reutilizado; com 1, o hash roda no próprio
+# worker. O comando importar_alunos usa o seu próprio pool (--processos).
+IMPORTACAO_PROCESSOS = 2
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,6 +175,11 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # Listagens paginadas por cursor (core/paginacao.py); ?page_size= até 200
+    "DEFAULT_PAGINATION_CLASS": "core.paginacao.PaginacaoCursor",
+    "PAGE_SIZE": 50,
+    # Filtros validados das listagens (core/filtros.py)
+    "DEFAULT_FILTER_BACKENDS": ("core.filtros.FiltroFormularioBackend",),
 }
 
 # Simple JWT
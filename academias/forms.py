@@ -69,6 +69,11 @@ class AlunoForm(forms.ModelForm):
             self.fields["password"].required = True
             self.fields["password"].help_text = "Senha para o novo aluno"
 
+        # O rótulo de cada opção usa o nome do usuário
+        self.fields["personal_responsavel"].queryset = (
+            PersonalTrainer.objects.select_related("user")
+        )
+
         # Se o usuário logado é PERSONAL, filtrar apenas ele mesmo
         if self.request_user and self.request_user.user_type == "PERSONAL":
             try:
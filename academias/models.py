@@ -18,6 +18,10 @@ class Academia(models.Model):
     class Meta:
         verbose_name = "Academia"
         verbose_name_plural = "Academias"
+        indexes = [
+            # ordem da paginação por cursor da API
+            models.Index(fields=["data_criacao", "id"]),
+        ]
 
     def __str__(self):
         return self.nome_fantasia
@@ -0,0 +1,103 @@
+"""
+Camada de agregação usada pelos relatórios da API.
+
+Cada série é obtida com uma única consulta agrupada no banco, de modo que o
+número de queries de um relatório não cresce com a quantidade de academias,
+alunos ou treinos cadastrados.
+"""
+
+from datetime import datetime, timedelta
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+
+def inicio_do_mes(data):
+    """Retorna o primeiro instante do mês de `data`."""
+    return data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def meses_recentes(quantidade, hoje=None):
+    """
+    Retorna o início dos últimos `quantidade` meses, do mais antigo ao atual.
+    """
+    atual = inicio_do_mes(timezone.localtime(hoje or timezone.now()))
+    meses = [atual]
+    for _ in range(quantidade - 1):
+        atual = inicio_do_mes(atual - timedelta(days=1))
+        meses.append(atual)
+    meses.reverse()
+    return meses
+
+
+def _serie_mensal(queryset, campo_data, meses, agregado):
+    linhas = (
+        queryset.filter(**{f"{campo_data}__gte": meses[0]})
+        .annotate(mes=TruncMonth(campo_data))
+        .order_by()
+        .values("mes")
+        .annotate(total=agregado)
+    )
+    totais = {}
+    for linha in linhas:
+        mes = linha["mes"]
+        if isinstance(mes, datetime):
+            mes = timezone.localtime(mes)
+        chave = (mes.year, mes.month)
+        totais[chave] = totais.get(chave, 0) + (linha["total"] or 0)
+    return [totais.get((mes.year, mes.month), 0) for mes in meses]
+
+
+def contagem_por_mes(queryset, campo_data, meses):
+    """
+    Conta as linhas de `queryset` agrupadas pelo mês de `campo_data`.
+
+    Retorna uma lista alinhada com `meses` (ver `meses_recentes`), com zero
+    para os meses sem registros. Executa uma única consulta.
+    """
+    return _serie_mensal(queryset, campo_data, meses, Count("pk"))
+
+
+def soma_por_mes(queryset, campo_data, campo_valor, meses):
+    """Como `contagem_por_mes`, mas somando `campo_valor` em vez de contar."""
+    return _serie_mensal(queryset, campo_data, meses, Sum(campo_valor))
+
+
+def contagem_por_valor(queryset, campo):
+    """Conta as linhas de `queryset` agrupadas por `campo` em uma consulta."""
+    linhas = queryset.order_by().values(campo).annotate(total=Count("pk"))
+    return {linha[campo]: linha["total"] for linha in linhas}
+
+
+def soma_por_valor(queryset, campo, campo_valor):
+    """Soma `campo_valor` agrupando por `campo` em uma consulta."""
+    linhas = queryset.order_by().values(campo).annotate(total=Sum(campo_valor))
+    return {linha[campo]: linha["total"] or 0 for linha in linhas}
+
+
+def _subquery_relacionada(queryset, campo, agregado):
+    subquery = (
+        queryset.filter(**{campo: OuterRef("pk")})
+        .order_by()
+        .values(campo)
+        .annotate(total=agregado)
+        .values("total")
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+def contagem_relacionada(queryset, campo):
+    """
+    Subquery de COUNT para usar em `annotate()`.
+
+    `campo` é o caminho, a partir de `queryset`, até a chave do modelo externo.
+    Diferente de `Count()` sobre joins, várias contagens podem ser combinadas
+    no mesmo queryset sem multiplicar as linhas umas das outras.
+    """
+    return _subquery_relacionada(queryset, campo, Count("pk"))
+
+
+def soma_relacionada(queryset, campo, campo_valor):
+    """Como `contagem_relacionada`, mas somando `campo_valor`."""
+    return _subquery_relacionada(queryset, campo, Sum(campo_valor))
@@ -10,14 +10,21 @@ from .api_views import (
     AlunoViewSet,
     ExercicioViewSet,
     TreinoViewSet,
+    SessaoTreinoViewSet,
+    ModeloTreinoViewSet,
     DashboardPersonalView,
     DashboardAlunoView,
     DashboardAcademiaView,
     DashboardAdminView,
+    DashboardCompostoView,
     RelatorioPersonalView,
     RelatorioAlunoView,
     RelatorioAcademiaView,
     RelatorioAdminView,
+    EvolucaoCargaView,
+    CacheRelatoriosView,
+    TarefaRelatorioView,
+    ResultadoTarefaRelatorioView,
 )
 
 router = DefaultRouter()
@@ -26,6 +33,8 @@ router.register(r"personais", PersonalTrainerViewSet)
 router.register(r"alunos", AlunoViewSet)
 router.register(r"exercicios", ExercicioViewSet)
 router.register(r"treinos", TreinoViewSet)
+router.register(r"sessoes", SessaoTreinoViewSet)
+router.register(r"modelos-treino", ModeloTreinoViewSet)
 
 urlpatterns = [
     # Autenticação JWT
@@ -33,6 +42,7 @@ urlpatterns = [
     path("auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("auth/me/", MeView.as_view(), name="user_me"),
     # Dashboard endpoints
+    path("dashboard/", DashboardCompostoView.as_view(), name="dashboard_composto"),
     path(
         "dashboard/personal/",
         DashboardPersonalView.as_view(),
@@ -58,6 +68,26 @@ urlpatterns = [
         name="relatorio_academia",
     ),
     path("relatorios/admin/", RelatorioAdminView.as_view(), name="relatorio_admin"),
+    path(
+        "relatorios/evolucao-carga/",
+        EvolucaoCargaView.as_view(),
+        name="relatorio_evolucao_carga",
+    ),
+    path(
+        "relatorios/cache/",
+        CacheRelatoriosView.as_view(),
+        name="relatorio_cache",
+    ),
+    path(
+        "relatorios/tarefas/<uuid:tarefa_id>/",
+        TarefaRelatorioView.as_view(),
+        name="relatorio_tarefa",
+    ),
+    path(
+        "relatorios/tarefas/<uuid:tarefa_id>/resultado/",
+        ResultadoTarefaRelatorioView.as_view(),
+        name="relatorio_tarefa_resultado",
+    ),
     # Rotas do router
     path("", include(router.urls)),
 ]
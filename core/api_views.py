@@ -1,17 +1,93 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Avg, Sum, F
-from django.db.models.functions import TruncMonth, TruncWeek
-from datetime import datetime, timedelta
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Count, Avg, Sum, F, Max, Q
+from django.db.models.functions import ExtractWeekDay, TruncMonth, TruncWeek
+from datetime import date, datetime, timedelta
 from collections import defaultdict
 
 from academias.models import Academia, PersonalTrainer, Aluno
-from treinos.models import Exercicio, Treino, ItemTreino
+from treinos.contadores import inicio_da_semana, valores_atuais
+from treinos.historico_carga import medias_semanais, series_de_carga
+from treinos.modelos import atribuir_modelo
+from treinos.models import (
+    ContadorAluno,
+    Exercicio,
+    HistoricoCarga,
+    ModeloTreino,
+    Treino,
+    ItemTreino,
+    ResumoDiario,
+    ResumoDiarioCategoria,
+    SessaoTreino,
+)
+from treinos.sessoes import itens_do_treino, registrar_series
+from .agregacoes import (
+    contagem_por_mes,
+    contagem_por_valor,
+    contagem_relacionada,
+    meses_recentes,
+    soma_por_mes,
+    soma_por_valor,
+    soma_relacionada,
+)
+from .cache_relatorios import (
+    ESCOPO_GLOBAL,
+    RelatorioCacheMixin,
+    escopo_academia,
+    escopo_aluno,
+    escopo_personal,
+    ESCOPO_CATALOGO,
+    escopos_dos_alunos,
+    escopos_dos_treinos,
+    estatisticas,
+    invalidar_escopos,
+)
+from .catalogo import CatalogoEmMemoriaMixin, catalogo_atual, resposta_json
+from .condicional import RespostaCondicionalGlobalMixin, RespostaCondicionalMixin
+from .leitura_rapida import (
+    LEITOR_ALUNOS,
+    LEITOR_EXERCICIOS,
+    LEITOR_TREINOS,
+    LeituraRapidaMixin,
+)
+from .exportacao import FORMATOS, GERADORES
+from .facetas import filtros_da_query
+from .importacao import (
+    ImportacaoInvalida,
+    importar_alunos,
+    ler_arquivo,
+    restricoes_do_usuario,
+)
+from .filtros import (
+    AutocompletarForm,
+    FiltroAcademiaForm,
+    FiltroAlunoForm,
+    FiltroExercicioForm,
+    FiltroPersonalForm,
+    FiltroSessaoForm,
+    FiltroTreinoForm,
+    SimilaresForm,
+    aplicar_filtro,
+)
+from .tarefas_relatorios import CONCLUIDA, ERRO, obter_tarefa
+from .widgets_dashboard import (
+    ContextoAcademia,
+    ContextoAdmin,
+    ContextoAluno,
+    ContextoPersonal,
+    achatar,
+    contexto_do_usuario,
+    montar_widgets,
+    widgets_do_papel,
+)
 from .serializers import (
     UserSerializer,
     UserDetailSerializer,
@@ -27,11 +103,34 @@ from .serializers import (
     TreinoDetailSerializer,
     TreinoCreateSerializer,
     ItemTreinoSerializer,
+    ModeloTreinoSerializer,
+    AtribuirModeloSerializer,
+    LoteSeriesSerializer,
+    SessaoTreinoSerializer,
 )
 
 User = get_user_model()
 
 
+class QuerysetDoSerializerMixin:
+    """
+    Aplica ao queryset o `preparar_queryset` do serializer da ação, que faz
+    os select_related e as anotações que o serializer lê. Assim as listagens
+    executam um número fixo de queries, qualquer que seja o número de linhas.
+    Com ?fields= / ?expand= só o que vai ser renderizado é carregado.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        preparar = getattr(serializer_class, "preparar_queryset", None)
+        if not preparar:
+            return queryset
+        if hasattr(serializer_class, "selecao"):
+            return preparar(queryset, *serializer_class.selecao(self.request))
+        return preparar(queryset)
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Serializer customizado para incluir dados do usuário no token"""
 
@@ -66,12 +165,16 @@ class MeView(APIView):
         return Response(serializer.data)
 
 
-class AcademiaViewSet(viewsets.ModelViewSet):
+class AcademiaViewSet(
+    RespostaCondicionalGlobalMixin, QuerysetDoSerializerMixin, viewsets.ModelViewSet
+):
     """ViewSet para gerenciamento de Academias"""
 
     queryset = Academia.objects.all()
     serializer_class = AcademiaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_cursor = ("-data_criacao", "-id")
+    filtro_form = FiltroAcademiaForm
 
     def get_queryset(self):
         user = self.request.user
@@ -91,11 +194,15 @@ class AcademiaViewSet(viewsets.ModelViewSet):
         return Academia.objects.none()
 
 
-class PersonalTrainerViewSet(viewsets.ModelViewSet):
+class PersonalTrainerViewSet(
+    RespostaCondicionalGlobalMixin, QuerysetDoSerializerMixin, viewsets.ModelViewSet
+):
     """ViewSet para gerenciamento de Personal Trainers"""
 
     queryset = PersonalTrainer.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_cursor = ("-user__date_joined", "-pk")
+    filtro_form = FiltroPersonalForm
 
     def get_serializer_class(self):
         if self.action in ["create", "update", "partial_update"]:
@@ -115,11 +222,41 @@ class PersonalTrainerViewSet(viewsets.ModelViewSet):
         return PersonalTrainer.objects.none()
 
 
-class AlunoViewSet(viewsets.ModelViewSet):
+def alunos_visiveis(user):
+    """Alunos que o usuário pode ver, pela API e pelas ações sobre alunos."""
+    if user.user_type == "ADMIN_SISTEMA":
+        return Aluno.objects.all()
+    elif user.user_type == "PERSONAL":
+        # Personal vê apenas seus alunos
+        try:
+            personal = PersonalTrainer.objects.get(user=user)
+            return Aluno.objects.filter(personal_responsavel=personal)
+        except PersonalTrainer.DoesNotExist:
+            return Aluno.objects.none()
+    elif user.user_type == "ADMIN":
+        # Admin da academia vê alunos da sua academia
+        if user.academia:
+            return Aluno.objects.filter(academia=user.academia)
+    elif user.user_type == "ALUNO":
+        # Aluno vê apenas seu próprio perfil
+        return Aluno.objects.filter(user=user)
+
+    return Aluno.objects.none()
+
+
+class AlunoViewSet(
+    RespostaCondicionalMixin,
+    LeituraRapidaMixin,
+    QuerysetDoSerializerMixin,
+    viewsets.ModelViewSet,
+):
     """ViewSet para gerenciamento de Alunos"""
 
     queryset = Aluno.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_cursor = ("-user__date_joined", "-pk")
+    filtro_form = FiltroAlunoForm
+    leitor_rapido = LEITOR_ALUNOS
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -128,64 +265,200 @@ class AlunoViewSet(viewsets.ModelViewSet):
             return AlunoCreateUpdateSerializer
         return AlunoDetailSerializer
 
+    def escopos_do_objeto(self, pk):
+        # O detalhe traz o personal e a academia com as suas contagens
+        return escopos_dos_alunos({"pk": pk})
+
     def get_queryset(self):
-        user = self.request.user
+        return alunos_visiveis(self.request.user)
+
+    @action(detail=False, methods=["post"])
+    def importar(self, request):
+        """
+        Cria alunos em lote a partir de um arquivo CSV ou JSON enviado em
+        `arquivo` (multipart) ou de uma lista JSON no corpo. Nada é gravado
+        se alguma linha for inválida; os erros voltam por linha.
+        """
+        user = request.user
+        if user.user_type not in ["ADMIN_SISTEMA", "ADMIN", "PERSONAL"] or (
+            user.user_type == "ADMIN" and not user.academia_id
+        ):
+            return Response(
+                {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
+            )
 
-        if user.user_type == "ADMIN_SISTEMA":
-            return Aluno.objects.all()
-        elif user.user_type == "PERSONAL":
-            # Personal vê apenas seus alunos
-            try:
-                personal = PersonalTrainer.objects.get(user=user)
-                return Aluno.objects.filter(personal_responsavel=personal)
-            except PersonalTrainer.DoesNotExist:
-                return Aluno.objects.none()
-        elif user.user_type == "ADMIN":
-            # Admin da academia vê alunos da sua academia
-            if user.academia:
-                return Aluno.objects.filter(academia=user.academia)
-        elif user.user_type == "ALUNO":
-            # Aluno vê apenas seu próprio perfil
-            return Aluno.objects.filter(user=user)
+        try:
+            arquivo = request.FILES.get("arquivo")
+            if arquivo:
+                formato = arquivo.name.rsplit(".", 1)[-1].lower()
+                linhas = ler_arquivo(arquivo.read(), formato)
+            elif isinstance(request.data, list):
+                linhas = request.data
+            else:
+                linhas = request.data.get("alunos")
+            ids = importar_alunos(linhas, fixos=restricoes_do_usuario(user))
+        except ImportacaoInvalida as erro:
+            return Response(erro.erros, status=status.HTTP_400_BAD_REQUEST)
 
-        return Aluno.objects.none()
+        return Response(
+            {"criados": len(ids), "ids": ids}, status=status.HTTP_201_CREATED
+        )
 
 
-class ExercicioViewSet(viewsets.ReadOnlyModelViewSet):
+class ExercicioViewSet(
+    RespostaCondicionalMixin,
+    CatalogoEmMemoriaMixin,
+    LeituraRapidaMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """ViewSet para consulta de Exercícios (somente leitura)"""
 
     queryset = Exercicio.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    # O catálogo é o mesmo para todos os usuários
+    etag_por_usuario = False
+    # Catálogo de referência, pequeno e lido inteiro pelos formulários de treino
+    pagination_class = None
+    filtro_form = FiltroExercicioForm
+    leitor_rapido = LEITOR_EXERCICIOS
 
     def get_serializer_class(self):
         if self.action == "list":
             return ExercicioListSerializer
         return ExercicioSerializer
 
+    def escopos_condicionais(self, request):
+        return {ESCOPO_CATALOGO}
+
     @action(detail=False, methods=["get"])
     def categorias(self, request):
         """Retorna lista de categorias únicas"""
-        categorias = Exercicio.objects.values_list("category", flat=True).distinct()
-        return Response(list(filter(None, categorias)))
+
+        def gerar():
+            if self.usa_catalogo(request):
+                return resposta_json(catalogo_atual().categorias)
+            categorias = Exercicio.objects.values_list("category", flat=True).distinct()
+            return Response(list(filter(None, categorias)))
+
+        return self.responder_condicional(request, gerar)
 
     @action(detail=False, methods=["get"])
     def por_categoria(self, request):
         """Retorna exercícios agrupados por categoria"""
-        categoria = request.query_params.get("categoria")
-        if categoria:
-            exercicios = Exercicio.objects.filter(category__iexact=categoria)
-        else:
+
+        def gerar():
+            filtros = filtros_da_query(request.query_params)
+            if self.usa_catalogo(request, self.parametros_do_catalogo):
+                return resposta_json(catalogo_atual().listagem(filtros))
             exercicios = Exercicio.objects.all()
+            if filtros:
+                # Pelo índice do catálogo: category__iexact não usa o índice
+                exercicios = exercicios.filter(pk__in=catalogo_atual().filtrar(filtros))
 
-        serializer = ExercicioListSerializer(exercicios, many=True)
-        return Response(serializer.data)
+            serializer = ExercicioListSerializer(exercicios, many=True)
+            return Response(serializer.data)
+
+        return self.responder_condicional(request, gerar)
 
+    @action(detail=False, methods=["get"])
+    def autocompletar(self, request):
+        """
+        Exercícios cujo nome começa com ?q= (ou tem uma palavra que começa),
+        sem diferença de caixa nem de acentos, para o seletor de exercícios.
+        ?limite= define quantos (padrão 10, até 50).
+        """
+        form = AutocompletarForm(request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        prefixo = form.cleaned_data["q"]
+        limite = form.cleaned_data["limite"] or form.fields["limite"].initial
+
+        def gerar():
+            return resposta_json(catalogo_atual().autocompletar(prefixo, limite))
+
+        return self.responder_condicional(request, gerar)
+
+    @action(detail=True, methods=["get"])
+    def similares(self, request, pk=None):
+        """
+        Exercícios parecidos com este, para substituí-lo: músculos, equipamento,
+        mecânica e nível em comum, do mais parecido ao menos. ?limite= define
+        quantos (padrão 10, até 50) e as facetas da listagem (?equipamento=...)
+        restringem as opções.
+        """
+        form = SimilaresForm(request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        limite = form.cleaned_data["limite"] or form.fields["limite"].initial
+        filtros = filtros_da_query(request.query_params)
+
+        def gerar():
+            conteudo = None
+            if str(pk).isdigit():
+                conteudo = catalogo_atual().similares(int(pk), limite, filtros)
+            if conteudo is None:
+                return Response(
+                    {"error": "Exercício não encontrado"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            return resposta_json(conteudo)
+
+        return self.responder_condicional(request, gerar)
 
-class TreinoViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["get"])
+    def facetas(self, request):
+        """
+        Contagens por faceta (músculo, equipamento, nível, força, mecânica e
+        categoria) com os filtros da query string, para refinar a escolha de
+        exercícios. Cada faceta conta com os filtros das outras.
+        """
+
+        def gerar():
+            filtros = filtros_da_query(request.query_params)
+            return Response(catalogo_atual().facetas.contagens(filtros))
+
+        return self.responder_condicional(request, gerar)
+
+
+def treinos_visiveis(user):
+    """Treinos que o usuário pode ver, pelas regras de cada papel."""
+    if user.user_type == "ADMIN_SISTEMA":
+        return Treino.objects.all()
+    elif user.user_type == "PERSONAL":
+        # Personal vê treinos que criou
+        try:
+            personal = PersonalTrainer.objects.get(user=user)
+            return Treino.objects.filter(personal_criador=personal)
+        except PersonalTrainer.DoesNotExist:
+            return Treino.objects.none()
+    elif user.user_type == "ADMIN":
+        # Admin da academia vê treinos de alunos da academia
+        if user.academia:
+            return Treino.objects.filter(aluno__academia=user.academia)
+    elif user.user_type == "ALUNO":
+        # Aluno vê apenas seus treinos
+        try:
+            aluno = Aluno.objects.get(user=user)
+            return Treino.objects.filter(aluno=aluno)
+        except Aluno.DoesNotExist:
+            return Treino.objects.none()
+
+    return Treino.objects.none()
+
+
+class TreinoViewSet(
+    RespostaCondicionalMixin,
+    LeituraRapidaMixin,
+    QuerysetDoSerializerMixin,
+    viewsets.ModelViewSet,
+):
     """ViewSet para gerenciamento de Treinos"""
 
     queryset = Treino.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_cursor = ("-data_criacao", "-id")
+    filtro_form = FiltroTreinoForm
+    leitor_rapido = LEITOR_TREINOS
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -194,34 +467,155 @@ class TreinoViewSet(viewsets.ModelViewSet):
             return TreinoCreateSerializer
         return TreinoDetailSerializer
 
+    def escopos_do_objeto(self, pk):
+        # O detalhe traz o aluno e o personal com as suas contagens
+        return escopos_dos_treinos({"pk": pk})
+
+    def get_queryset(self):
+        return treinos_visiveis(self.request.user)
+
+    @action(detail=False, methods=["get"])
+    def exportar(self, request):
+        """
+        Exporta os treinos visíveis ao usuário, com os itens, em streaming.
+        Parâmetros: formato (ndjson ou csv) e os filtros da listagem.
+        """
+        formato = request.query_params.get("formato", "ndjson")
+        if formato not in FORMATOS:
+            return Response(
+                {"error": "Formato inválido", "disponiveis": sorted(FORMATOS)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        treinos = aplicar_filtro(self.filtro_form, request, self.get_queryset())
+        response = StreamingHttpResponse(
+            GERADORES[formato](treinos), content_type=FORMATOS[formato]
+        )
+        response["Content-Disposition"] = f'attachment; filename="treinos.{formato}"'
+        return response
+
+
+class SessaoTreinoViewSet(viewsets.ModelViewSet):
+    """ViewSet para as sessões de treino realizadas e as suas séries"""
+
+    queryset = SessaoTreino.objects.all()
+    serializer_class = SessaoTreinoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordenacao_cursor = ("-inicio", "-id")
+    filtro_form = FiltroSessaoForm
+
     def get_queryset(self):
         user = self.request.user
+        sessoes = SessaoTreino.objects.order_by("-inicio")
 
         if user.user_type == "ADMIN_SISTEMA":
-            return Treino.objects.all()
+            return sessoes
         elif user.user_type == "PERSONAL":
-            # Personal vê treinos que criou
-            try:
-                personal = PersonalTrainer.objects.get(user=user)
-                return Treino.objects.filter(personal_criador=personal)
-            except PersonalTrainer.DoesNotExist:
-                return Treino.objects.none()
+            # Personal vê as sessões dos treinos que criou
+            return sessoes.filter(treino__personal_criador_id=user.pk)
         elif user.user_type == "ADMIN":
-            # Admin da academia vê treinos de alunos da academia
-            if user.academia:
-                return Treino.objects.filter(aluno__academia=user.academia)
+            # Admin da academia vê as sessões dos alunos da academia
+            if user.academia_id:
+                return sessoes.filter(aluno__academia_id=user.academia_id)
         elif user.user_type == "ALUNO":
-            # Aluno vê apenas seus treinos
-            try:
-                aluno = Aluno.objects.get(user=user)
-                return Treino.objects.filter(aluno=aluno)
-            except Aluno.DoesNotExist:
-                return Treino.objects.none()
+            # Aluno vê apenas as suas sessões
+            return sessoes.filter(aluno_id=user.pk)
+
+        return SessaoTreino.objects.none()
+
+    def perform_create(self, serializer):
+        sessao = serializer.save()
+        # As séries enviadas junto com a sessão entram depois do signal dela
+        invalidar_escopos(escopos_dos_alunos({"pk": sessao.aluno_id}))
+
+    def perform_update(self, serializer):
+        sessao = serializer.save()
+        invalidar_escopos(escopos_dos_alunos({"pk": sessao.aluno_id}))
+
+    @action(detail=True, methods=["post"])
+    def series(self, request, pk=None):
+        """Registra um lote de séries na sessão com um único INSERT em lote"""
+        sessao = self.get_object()
+        serializer = LoteSeriesSerializer(
+            data=request.data,
+            context={"request": request, "itens": itens_do_treino(sessao.treino_id)},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        criadas = registrar_series(
+            sessao,
+            serializer.validated_data["series"],
+            serializer.context["itens"],
+        )
+        # bulk_create não dispara signals; o histórico de carga do aluno, que
+        # também entra nos relatórios do personal, mudou
+        invalidar_escopos(escopos_dos_alunos({"pk": sessao.aluno_id}))
+        return Response({"registradas": len(criadas)}, status=status.HTTP_201_CREATED)
 
-        return Treino.objects.none()
 
+class ModeloTreinoViewSet(viewsets.ModelViewSet):
+    """ViewSet para os modelos de treino e a sua atribuição a alunos"""
 
-class DashboardPersonalView(APIView):
+    queryset = ModeloTreino.objects.all()
+    serializer_class = ModeloTreinoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordenacao_cursor = ("-data_criacao", "-id")
+
+    def get_queryset(self):
+        user = self.request.user
+        modelos = ModeloTreinoSerializer.preparar_queryset(ModeloTreino.objects.all())
+
+        if user.user_type == "ADMIN_SISTEMA":
+            return modelos
+        elif user.user_type == "PERSONAL":
+            # Personal vê apenas os seus modelos
+            return modelos.filter(personal_criador_id=user.pk)
+        elif user.user_type == "ADMIN":
+            # Admin da academia vê os modelos dos personais da academia
+            if user.academia_id:
+                return modelos.filter(
+                    personal_criador__user__academia_id=user.academia_id
+                )
+
+        return ModeloTreino.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        if request.user.user_type == "ALUNO":
+            raise PermissionDenied("Alunos não criam modelos de treino.")
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=True, methods=["post"])
+    def atribuir(self, request, pk=None):
+        """
+        Copia o modelo como um novo treino para cada aluno informado, com um
+        INSERT em lote para os treinos e outro para os itens.
+        """
+        modelo = self.get_object()
+        serializer = AtribuirModeloSerializer(
+            data=request.data,
+            context={"request": request, "alunos": alunos_visiveis(request.user)},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        aluno_ids = serializer.validated_data["alunos"]
+        treinos = atribuir_modelo(
+            modelo,
+            aluno_ids,
+            nome_treino=serializer.validated_data.get("nome_treino"),
+            ativo=serializer.validated_data["ativo"],
+        )
+        # bulk_create não dispara os signals que invalidam o cache
+        escopos = escopos_dos_alunos({"pk__in": aluno_ids})
+        escopos.add(escopo_personal(modelo.personal_criador_id))
+        invalidar_escopos(escopos | {ESCOPO_GLOBAL})
+
+        return Response(
+            {"criados": len(treinos), "treinos": [treino.pk for treino in treinos]},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class DashboardPersonalView(RelatorioCacheMixin, APIView):
     """View para dados do dashboard do Personal Trainer"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -242,54 +636,18 @@ class DashboardPersonalView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        alunos = Aluno.objects.filter(personal_responsavel=personal)
-        treinos = Treino.objects.filter(personal_criador=personal)
-        academias = Academia.objects.filter(
-            alunos__personal_responsavel=personal
-        ).distinct()
-
-        # Treinos por mês (últimos 6 meses)
-        hoje = datetime.now()
-        treinos_por_mes = []
-        for i in range(5, -1, -1):
-            data_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            data_fim = (
-                (hoje - timedelta(days=30 * (i - 1))).replace(day=1) if i > 0 else hoje
-            )
-            count = treinos.filter(
-                data_criacao__gte=data_inicio, data_criacao__lt=data_fim
-            ).count()
-            treinos_por_mes.append(
-                {"mes": data_inicio.strftime("%b"), "treinos": count}
-            )
-
-        # Top exercícios
-        top_exercicios = (
-            ItemTreino.objects.filter(treino__in=treinos)
-            .values("exercicio__nome")
-            .annotate(total=Count("id"))
-            .order_by("-total")[:5]
+        contexto = ContextoPersonal(user, personal)
+        return self.responder_com_cache(
+            request,
+            contexto.escopo,
+            lambda: self.montar_dados(contexto),
         )
 
-        # Alunos recentes
-        alunos_recentes = alunos.order_by("-user__date_joined")[:5]
-
-        data = {
-            "total_alunos": alunos.count(),
-            "total_academias": academias.count(),
-            "total_treinos": treinos.count(),
-            "taxa_atividade": round(
-                (treinos.filter(ativo=True).count() / max(treinos.count(), 1)) * 100, 1
-            ),
-            "treinos_por_mes": treinos_por_mes,
-            "top_exercicios": list(top_exercicios),
-            "alunos_recentes": AlunoListSerializer(alunos_recentes, many=True).data,
-        }
-
-        return Response(data)
+    def montar_dados(self, contexto):
+        return achatar(montar_widgets(contexto))
 
 
-class DashboardAlunoView(APIView):
+class DashboardAlunoView(RelatorioCacheMixin, APIView):
     """View para dados do dashboard do Aluno"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -310,24 +668,18 @@ class DashboardAlunoView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        treinos = Treino.objects.filter(aluno=aluno)
-
-        data = {
-            "total_treinos": treinos.count(),
-            "treinos_ativos": treinos.filter(ativo=True).count(),
-            "sequencia_dias": 0,  # Implementar lógica de sequência
-            "tempo_total_minutos": 0,  # Implementar cálculo
-            "meta_semanal_atual": 0,
-            "meta_semanal_total": 5,
-            "treinos": TreinoListSerializer(
-                treinos.order_by("-data_criacao")[:5], many=True
-            ).data,
-        }
+        contexto = ContextoAluno(user, aluno)
+        return self.responder_com_cache(
+            request,
+            contexto.escopo,
+            lambda: self.montar_dados(contexto),
+        )
 
-        return Response(data)
+    def montar_dados(self, contexto):
+        return achatar(montar_widgets(contexto))
 
 
-class DashboardAcademiaView(APIView):
+class DashboardAcademiaView(RelatorioCacheMixin, APIView):
     """View para dados do dashboard da Academia"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -340,28 +692,19 @@ class DashboardAcademiaView(APIView):
                 {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
             )
 
-        if user.user_type == "ADMIN" and user.academia:
-            academia = user.academia
-            alunos = Aluno.objects.filter(academia=academia)
-            personais = PersonalTrainer.objects.filter(user__academia=academia)
-            treinos = Treino.objects.filter(aluno__academia=academia)
-        else:
-            alunos = Aluno.objects.all()
-            personais = PersonalTrainer.objects.all()
-            treinos = Treino.objects.all()
-
-        data = {
-            "total_alunos": alunos.count(),
-            "total_personais": personais.count(),
-            "total_treinos": treinos.count(),
-            "taxa_retencao": 95.0,  # Implementar cálculo real
-            "personais": PersonalTrainerSerializer(personais[:5], many=True).data,
-        }
+        # Admin do sistema vê os números de todas as academias
+        contexto = ContextoAcademia(user)
+        return self.responder_com_cache(
+            request,
+            contexto.escopo,
+            lambda: self.montar_dados(contexto),
+        )
 
-        return Response(data)
+    def montar_dados(self, contexto):
+        return achatar(montar_widgets(contexto))
 
 
-class DashboardAdminView(APIView):
+class DashboardAdminView(RelatorioCacheMixin, APIView):
     """View para dados do dashboard do Admin do Sistema"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -374,64 +717,67 @@ class DashboardAdminView(APIView):
                 {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
             )
 
-        # Dados gerais
-        total_usuarios = User.objects.count()
-        total_academias = Academia.objects.count()
-        total_personais = PersonalTrainer.objects.count()
-        total_alunos = Aluno.objects.count()
-        total_treinos = Treino.objects.count()
+        contexto = ContextoAdmin(user)
+        return self.responder_com_cache(
+            request,
+            contexto.escopo,
+            lambda: self.montar_dados(contexto),
+        )
 
-        # Crescimento de usuários (últimos 6 meses)
-        hoje = datetime.now()
-        crescimento = []
-        for i in range(5, -1, -1):
-            data_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            data_fim = (
-                (hoje - timedelta(days=30 * (i - 1))).replace(day=1) if i > 0 else hoje
-            )
-            alunos_mes = Aluno.objects.filter(
-                user__date_joined__gte=data_inicio, user__date_joined__lt=data_fim
-            ).count()
-            personais_mes = PersonalTrainer.objects.filter(
-                user__date_joined__gte=data_inicio, user__date_joined__lt=data_fim
-            ).count()
-            crescimento.append(
-                {
-                    "mes": data_inicio.strftime("%b"),
-                    "alunos": alunos_mes,
-                    "personais": personais_mes,
-                }
-            )
+    def montar_dados(self, contexto):
+        return achatar(montar_widgets(contexto))
 
-        # Volume de treinos
-        volume_treinos = []
-        for i in range(5, -1, -1):
-            data_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            data_fim = (
-                (hoje - timedelta(days=30 * (i - 1))).replace(day=1) if i > 0 else hoje
-            )
-            count = Treino.objects.filter(
-                data_criacao__gte=data_inicio, data_criacao__lt=data_fim
-            ).count()
-            volume_treinos.append({"mes": data_inicio.strftime("%b"), "treinos": count})
 
-        # Top academias
-        top_academias = Academia.objects.annotate(num_alunos=Count("alunos")).order_by(
-            "-num_alunos"
-        )[:5]
+class DashboardCompostoView(RelatorioCacheMixin, APIView):
+    """
+    View que monta vários widgets do dashboard do usuário em uma requisição.
 
-        data = {
-            "total_usuarios": total_usuarios,
-            "total_academias": total_academias,
-            "total_personais": total_personais,
-            "total_alunos": total_alunos,
-            "total_treinos": total_treinos,
-            "crescimento_usuarios": crescimento,
-            "volume_treinos": volume_treinos,
-            "top_academias": AcademiaSerializer(top_academias, many=True).data,
-        }
+    ?widgets=kpis,treinos_por_mes escolhe os widgets; sem o parâmetro, todos
+    os do papel são montados. Widgets não pedidos não são calculados.
+    """
 
-        return Response(data)
+    permission_classes = [permissions.IsAuthenticated]
+    parametros_cache = ("widgets",)
+
+    def widgets_pedidos(self, request):
+        disponiveis = widgets_do_papel(request.user.user_type)
+        pedidos = request.query_params.get("widgets")
+        if not pedidos:
+            return disponiveis
+        nomes = {nome.strip() for nome in pedidos.split(",") if nome.strip()}
+        # Mantém a ordem do registro para que a chave de cache não dependa
+        # da ordem em que o cliente listou os widgets.
+        return [nome for nome in disponiveis if nome in nomes] + sorted(
+            nomes - set(disponiveis)
+        )
+
+    def parametros_relatorio(self, request):
+        return {"widgets": ",".join(self.widgets_pedidos(request))}
+
+    def get(self, request):
+        contexto = contexto_do_usuario(request.user)
+        if contexto is None:
+            return Response(
+                {"error": "Perfil não encontrado"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        disponiveis = widgets_do_papel(contexto.papel)
+        nomes = self.widgets_pedidos(request)
+        invalidos = [nome for nome in nomes if nome not in disponiveis]
+        if invalidos:
+            return Response(
+                {
+                    "error": f"Widgets inválidos: {', '.join(invalidos)}",
+                    "disponiveis": disponiveis,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return self.responder_com_cache(
+            request,
+            contexto.escopo,
+            lambda: montar_widgets(contexto, nomes),
+        )
 
 
 # ==========================================
@@ -439,10 +785,11 @@ class DashboardAdminView(APIView):
 # ==========================================
 
 
-class RelatorioPersonalView(APIView):
+class RelatorioPersonalView(RelatorioCacheMixin, APIView):
     """View para relatórios detalhados do Personal Trainer"""
 
     permission_classes = [permissions.IsAuthenticated]
+    parametros_cache = ("periodo", "aluno_id")
 
     def get(self, request):
         user = request.user
@@ -460,6 +807,13 @@ class RelatorioPersonalView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        return self.responder_com_cache(
+            request,
+            escopo_personal(personal.pk),
+            lambda: self.montar_dados(request, personal),
+        )
+
+    def montar_dados(self, request, personal):
         # Parâmetros
         periodo = request.query_params.get("periodo", "mes")
         aluno_id = request.query_params.get("aluno_id")
@@ -477,86 +831,69 @@ class RelatorioPersonalView(APIView):
 
         # Filtrar dados
         alunos = Aluno.objects.filter(personal_responsavel=personal)
-        treinos = Treino.objects.filter(
-            personal_criador=personal, data_criacao__gte=data_inicio
+        resumos_personal = ResumoDiario.objects.filter(personal=personal)
+        resumos = resumos_personal.filter(dia__gte=data_inicio)
+        resumos_categoria = ResumoDiarioCategoria.objects.filter(
+            personal=personal, dia__gte=data_inicio
         )
 
         if aluno_id and aluno_id != "todos":
-            treinos = treinos.filter(aluno_id=aluno_id)
+            resumos = resumos.filter(aluno_id=aluno_id)
 
         # === ESTATÍSTICAS GERAIS ===
-        total_treinos = treinos.count()
-        treinos_mes_anterior = Treino.objects.filter(
-            personal_criador=personal,
-            data_criacao__gte=data_inicio - timedelta(days=30),
-            data_criacao__lt=data_inicio,
-        ).count()
+        total_treinos = resumos.aggregate(total=Sum("total_treinos"))["total"] or 0
+        treinos_mes_anterior = (
+            resumos_personal.filter(
+                dia__gte=data_inicio - timedelta(days=30), dia__lt=data_inicio
+            ).aggregate(total=Sum("total_treinos"))["total"]
+            or 0
+        )
         variacao_treinos = (
             (total_treinos - treinos_mes_anterior) / max(treinos_mes_anterior, 1)
         ) * 100
 
         # === TREINOS POR MÊS (últimos 6 meses) ===
-        treinos_por_mes = []
-        for i in range(5, -1, -1):
-            mes_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            if i > 0:
-                mes_fim = (hoje - timedelta(days=30 * (i - 1))).replace(day=1)
-            else:
-                mes_fim = hoje + timedelta(days=1)
-
-            count_treinos = Treino.objects.filter(
-                personal_criador=personal,
-                data_criacao__gte=mes_inicio,
-                data_criacao__lt=mes_fim,
-            ).count()
-
-            count_alunos = Aluno.objects.filter(
-                personal_responsavel=personal, user__date_joined__lt=mes_fim
-            ).count()
+        meses = meses_recentes(6)
+        treinos_mes = soma_por_mes(resumos_personal, "dia", "total_treinos", meses)
+        alunos_mes = contagem_por_mes(alunos, "user__date_joined", meses)
+        alunos_acumulados = alunos.filter(user__date_joined__lt=meses[0]).count()
 
+        treinos_por_mes = []
+        for i, mes in enumerate(meses):
+            alunos_acumulados += alunos_mes[i]
             treinos_por_mes.append(
                 {
-                    "mes": mes_inicio.strftime("%b"),
-                    "treinos": count_treinos,
-                    "alunos": count_alunos,
+                    "mes": mes.strftime("%b"),
+                    "treinos": treinos_mes[i],
+                    "alunos": alunos_acumulados,
                 }
             )
 
         # === PROGRESSO DE CARGA ===
-        progresso_carga = []
+        # Média semanal do histórico de carga dos alunos, em uma consulta
         semanas = 4
-        for i in range(semanas - 1, -1, -1):
-            semana_inicio = hoje - timedelta(days=7 * (i + 1))
-            semana_fim = hoje - timedelta(days=7 * i)
-
-            # Média de carga por exercício principal
-            itens = (
-                ItemTreino.objects.filter(
-                    treino__personal_criador=personal,
-                    treino__data_criacao__gte=semana_inicio,
-                    treino__data_criacao__lt=semana_fim,
-                )
-                .values("exercicio__nome")
-                .annotate(media_carga=Avg("carga"))
-            )
+        atual = inicio_da_semana(timezone.localdate())
+        inicios = [atual - timedelta(weeks=i) for i in range(semanas - 1, -1, -1)]
+        pontos = HistoricoCarga.objects.filter(aluno__personal_responsavel=personal)
+        if aluno_id and aluno_id != "todos":
+            pontos = pontos.filter(aluno_id=aluno_id)
+        series = medias_semanais(pontos, inicios)  # Top 3 exercícios
 
-            progresso_semana = {"semana": f"Sem {semanas - i}"}
-            for item in itens[:3]:  # Top 3 exercícios
-                nome = (
-                    item["exercicio__nome"][:10] if item["exercicio__nome"] else "N/A"
+        progresso_carga = []
+        for i in range(semanas):
+            progresso_semana = {"semana": f"Sem {i + 1}"}
+            for serie in series:
+                media = serie["medias"][i]
+                progresso_semana[serie["exercicio"][:10]] = (
+                    None if media is None else round(media, 1)
                 )
-                progresso_semana[nome] = round(item["media_carga"] or 0, 1)
-
             progresso_carga.append(progresso_semana)
 
         # === DISTRIBUIÇÃO POR GRUPO MUSCULAR ===
         cores = ["#ef4444", "#3b82f6", "#22c55e", "#f59e0b", "#8b5cf6", "#ec4899"]
         distribuicao = (
-            ItemTreino.objects.filter(
-                treino__personal_criador=personal, treino__data_criacao__gte=data_inicio
-            )
-            .values("exercicio__category")
-            .annotate(total=Count("id"))
+            resumos_categoria.values("categoria")
+            .annotate(total=Sum("total_itens"))
             .order_by("-total")
         )
 
@@ -564,7 +901,7 @@ class RelatorioPersonalView(APIView):
         for i, item in enumerate(distribuicao[:6]):
             distribuicao_exercicios.append(
                 {
-                    "nome": item["exercicio__category"] or "Outros",
+                    "nome": item["categoria"] or "Outros",
                     "valor": item["total"],
                     "cor": cores[i % len(cores)],
                 }
@@ -572,10 +909,15 @@ class RelatorioPersonalView(APIView):
 
         # === FREQUÊNCIA SEMANAL ===
         dias_semana = ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"]
+        # Treinos criados em cada dia da semana (1 = domingo, 7 = sábado)
+        treinos_dia_semana = soma_por_valor(
+            resumos.annotate(dia_semana=ExtractWeekDay("dia")),
+            "dia_semana",
+            "total_treinos",
+        )
         frequencia_semanal = []
         for i, dia in enumerate(dias_semana):
-            # Calcular treinos criados em cada dia da semana
-            count = treinos.filter(data_criacao__week_day=i + 2 if i < 6 else 1).count()
+            count = treinos_dia_semana.get(i + 2 if i < 6 else 1, 0)
             frequencia_semanal.append({"dia": dia, "alunos": count})
 
         # === TOP EXERCÍCIOS ===
@@ -598,38 +940,41 @@ class RelatorioPersonalView(APIView):
         ]
 
         # === ALUNOS COM ESTATÍSTICAS ===
-        alunos_stats = []
-        for aluno in alunos:
-            treinos_aluno = Treino.objects.filter(
-                aluno=aluno, data_criacao__gte=data_inicio
+        treinos_no_periodo = Q(treinos__data_criacao__gte=data_inicio)
+        alunos_com_totais = (
+            alunos.select_related("user")
+            .annotate(
+                total_treinos=Count("treinos", filter=treinos_no_periodo),
+                ultimo_treino=Max("treinos__data_criacao", filter=treinos_no_periodo),
             )
-            total = treinos_aluno.count()
-            ativos = treinos_aluno.filter(ativo=True).count()
-            ultimo = treinos_aluno.order_by("-data_criacao").first()
+            .order_by("-total_treinos", "pk")
+        )
+
+        # Calcular frequência (treinos por semana esperados vs realizados)
+        dias_periodo = (hoje - data_inicio.replace(tzinfo=None)).days
+        semanas = max(dias_periodo / 7, 1)
 
-            # Calcular frequência (treinos por semana esperados vs realizados)
-            dias_periodo = (hoje - data_inicio.replace(tzinfo=None)).days
-            semanas = max(dias_periodo / 7, 1)
+        alunos_stats = []
+        for aluno in alunos_com_totais:
             frequencia = min(
-                round((total / semanas / 5) * 100, 1), 100
+                round((aluno.total_treinos / semanas / 5) * 100, 1), 100
             )  # Assumindo meta de 5 treinos/semana
 
             alunos_stats.append(
                 {
-                    "id": aluno.id,
+                    "id": aluno.pk,
                     "nome": f"{aluno.user.first_name} {aluno.user.last_name}".strip()
                     or aluno.user.email,
-                    "treinos": total,
+                    "treinos": aluno.total_treinos,
                     "frequencia": frequencia,
                     "ultimoTreino": (
-                        ultimo.data_criacao.strftime("%Y-%m-%d") if ultimo else None
+                        aluno.ultimo_treino.strftime("%Y-%m-%d")
+                        if aluno.ultimo_treino
+                        else None
                     ),
                 }
             )
 
-        # Ordenar por treinos
-        alunos_stats.sort(key=lambda x: x["treinos"], reverse=True)
-
         # === TAXA DE FREQUÊNCIA MÉDIA ===
         taxa_frequencia = round(
             sum(a["frequencia"] for a in alunos_stats) / max(len(alunos_stats), 1), 1
@@ -660,10 +1005,10 @@ class RelatorioPersonalView(APIView):
             "alunos": alunos_stats,
         }
 
-        return Response(data)
+        return data
 
 
-class RelatorioAlunoView(APIView):
+class RelatorioAlunoView(RelatorioCacheMixin, APIView):
     """View para relatórios detalhados do Aluno"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -684,6 +1029,13 @@ class RelatorioAlunoView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        return self.responder_com_cache(
+            request,
+            escopo_aluno(aluno.pk),
+            lambda: self.montar_dados(request, aluno),
+        )
+
+    def montar_dados(self, request, aluno):
         # Parâmetros
         periodo = request.query_params.get("periodo", "mes")
 
@@ -701,36 +1053,26 @@ class RelatorioAlunoView(APIView):
         treinos_periodo = treinos.filter(data_criacao__gte=data_inicio)
 
         # === EVOLUÇÃO DE CARGA POR EXERCÍCIO ===
-        evolucao_carga = []
-        exercicios_aluno = (
-            ItemTreino.objects.filter(treino__aluno=aluno)
-            .values("exercicio_id", "exercicio__nome")
-            .distinct()[:5]
+        # Uma consulta ao histórico de carga, já reduzida para o gráfico
+        _, series = series_de_carga(
+            aluno.pk,
+            inicio=data_inicio.date(),
+            fim=hoje.date(),
+            max_pontos=30,
         )
-
-        for ex in exercicios_aluno:
-            itens = (
-                ItemTreino.objects.filter(
-                    treino__aluno=aluno,
-                    exercicio_id=ex["exercicio_id"],
-                    treino__data_criacao__gte=data_inicio,
-                )
-                .order_by("treino__data_criacao")
-                .values("carga", "treino__data_criacao")
-            )
-
-            evolucao_carga.append(
-                {
-                    "exercicio": ex["exercicio__nome"],
-                    "dados": [
-                        {
-                            "data": item["treino__data_criacao"].strftime("%d/%m"),
-                            "carga": item["carga"] or 0,
-                        }
-                        for item in itens
-                    ],
-                }
-            )
+        evolucao_carga = [
+            {
+                "exercicio": serie["exercicio"],
+                "dados": [
+                    {
+                        "data": ponto["data"].strftime("%d/%m"),
+                        "carga": ponto["carga_max"],
+                    }
+                    for ponto in serie["pontos"]
+                ],
+            }
+            for serie in series
+        ]
 
         # === PROGRESSO POR CATEGORIA ===
         categorias = (
@@ -740,7 +1082,7 @@ class RelatorioAlunoView(APIView):
             .values("exercicio__category")
             .annotate(
                 total_exercicios=Count("id"),
-                media_carga=Avg("carga"),
+                media_carga=Avg("carga_kg"),
                 total_series=Sum("series"),
                 total_reps=Sum("repeticoes"),
             )
@@ -760,22 +1102,28 @@ class RelatorioAlunoView(APIView):
 
         # === HISTÓRICO DE TREINOS ===
         historico = []
-        for treino in treinos_periodo.order_by("-data_criacao")[:20]:
-            itens = ItemTreino.objects.filter(treino=treino)
+        recentes = treinos_periodo.order_by("-data_criacao").prefetch_related(
+            "itens__exercicio"
+        )[:20]
+        for treino in recentes:
+            itens = list(treino.itens.all())
             historico.append(
                 {
                     "id": treino.id,
-                    "nome": treino.nome,
+                    "nome": treino.nome_treino,
                     "data": treino.data_criacao.strftime("%Y-%m-%d"),
-                    "categoria": treino.tipo or "Geral",
-                    "exercicios": itens.count(),
+                    "categoria": next(
+                        (i.exercicio.category for i in itens if i.exercicio.category),
+                        "Geral",
+                    ),
+                    "exercicios": len(itens),
                     "ativo": treino.ativo,
                     "detalhes": [
                         {
                             "exercicio": item.exercicio.nome,
                             "series": item.series,
                             "reps": item.repeticoes,
-                            "carga": item.carga or 0,
+                            "carga": item.carga_kg or 0,
                         }
                         for item in itens[:5]
                     ],
@@ -786,32 +1134,29 @@ class RelatorioAlunoView(APIView):
         total_treinos = treinos.count()
         treinos_ativos = treinos.filter(ativo=True).count()
 
-        # Cálculo de sequência de dias (streak)
-        sequencia = 0
-        # Implementar lógica real de sequência
-
-        # Tempo total estimado
-        total_exercicios = ItemTreino.objects.filter(treino__aluno=aluno).count()
-        tempo_estimado = total_exercicios * 3  # 3 minutos por exercício em média
+        # Sequência e tempo vêm dos contadores mantidos a cada sessão
+        contador = valores_atuais(ContadorAluno.objects.filter(aluno=aluno).first())
 
         data = {
             "total_treinos": total_treinos,
             "treinos_ativos": treinos_ativos,
             "treinos_periodo": treinos_periodo.count(),
-            "sequencia_dias": sequencia,
-            "tempo_total_minutos": tempo_estimado,
+            "sequencia_dias": contador["sequencia_dias"],
+            "maior_sequencia": contador["maior_sequencia"],
+            "tempo_total_minutos": contador["minutos_totais"],
             "evolucao_carga": evolucao_carga,
             "progresso_categoria": progresso_categoria,
             "historico": historico,
         }
 
-        return Response(data)
+        return data
 
 
-class RelatorioAcademiaView(APIView):
+class RelatorioAcademiaView(RelatorioCacheMixin, APIView):
     """View para relatórios detalhados da Academia"""
 
     permission_classes = [permissions.IsAuthenticated]
+    permite_assincrono = True
 
     def get(self, request):
         user = request.user
@@ -821,16 +1166,34 @@ class RelatorioAcademiaView(APIView):
                 {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
             )
 
+        if user.user_type == "ADMIN" and user.academia_id:
+            escopo = escopo_academia(user.academia_id)
+        else:
+            escopo = ESCOPO_GLOBAL
+
+        return self.responder_com_cache(
+            request,
+            escopo,
+            lambda: self.montar_dados(request),
+        )
+
+    def montar_dados(self, request):
+        user = request.user
+
         # Filtrar por academia se for admin
         if user.user_type == "ADMIN" and user.academia:
             academia = user.academia
             alunos = Aluno.objects.filter(academia=academia)
             personais = PersonalTrainer.objects.filter(user__academia=academia)
             treinos = Treino.objects.filter(aluno__academia=academia)
+            resumos = ResumoDiario.objects.filter(academia=academia)
+            resumos_categoria = ResumoDiarioCategoria.objects.filter(academia=academia)
         else:
             alunos = Aluno.objects.all()
             personais = PersonalTrainer.objects.all()
             treinos = Treino.objects.all()
+            resumos = ResumoDiario.objects.all()
+            resumos_categoria = ResumoDiarioCategoria.objects.all()
 
         hoje = datetime.now()
         periodo = request.query_params.get("periodo", "mes")
@@ -847,30 +1210,37 @@ class RelatorioAcademiaView(APIView):
         # === MÉTRICAS PRINCIPAIS ===
         total_alunos = alunos.count()
         total_personais = personais.count()
-        total_treinos = treinos.count()
-        treinos_periodo = treinos.filter(data_criacao__gte=data_inicio).count()
+        total_treinos = resumos.aggregate(total=Sum("total_treinos"))["total"] or 0
+        treinos_periodo = (
+            resumos.filter(dia__gte=data_inicio).aggregate(total=Sum("total_treinos"))[
+                "total"
+            ]
+            or 0
+        )
 
         # === TREINOS MAIS REALIZADOS (RANKING) ===
         treinos_ranking = (
-            treinos.values("nome").annotate(total=Count("id")).order_by("-total")[:10]
+            treinos.values("nome_treino")
+            .annotate(total=Count("id"))
+            .order_by("-total")[:10]
         )
 
         treinos_top = [
-            {"nome": item["nome"], "total": item["total"]} for item in treinos_ranking
+            {"nome": item["nome_treino"], "total": item["total"]}
+            for item in treinos_ranking
         ]
 
         # === CATEGORIAS MAIS USADAS ===
         categorias = (
-            ItemTreino.objects.filter(treino__in=treinos)
-            .values("exercicio__category")
-            .annotate(total=Count("id"))
+            resumos_categoria.values("categoria")
+            .annotate(total=Sum("total_itens"))
             .order_by("-total")
         )
 
         cores = ["#ef4444", "#3b82f6", "#22c55e", "#f59e0b", "#8b5cf6", "#ec4899"]
         categorias_ranking = [
             {
-                "categoria": item["exercicio__category"] or "Outros",
+                "categoria": item["categoria"] or "Outros",
                 "total": item["total"],
                 "cor": cores[i % len(cores)],
             }
@@ -878,46 +1248,41 @@ class RelatorioAcademiaView(APIView):
         ]
 
         # === CRESCIMENTO MENSAL ===
-        crescimento = []
-        for i in range(5, -1, -1):
-            mes_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            if i > 0:
-                mes_fim = (hoje - timedelta(days=30 * (i - 1))).replace(day=1)
-            else:
-                mes_fim = hoje + timedelta(days=1)
-
-            novos_alunos = alunos.filter(
-                user__date_joined__gte=mes_inicio, user__date_joined__lt=mes_fim
-            ).count()
-
-            novos_treinos = treinos.filter(
-                data_criacao__gte=mes_inicio, data_criacao__lt=mes_fim
-            ).count()
-
-            crescimento.append(
-                {
-                    "mes": mes_inicio.strftime("%b"),
-                    "alunos": novos_alunos,
-                    "treinos": novos_treinos,
-                }
-            )
+        meses = meses_recentes(6)
+        novos_alunos = contagem_por_mes(alunos, "user__date_joined", meses)
+        novos_treinos = soma_por_mes(resumos, "dia", "total_treinos", meses)
+        crescimento = [
+            {
+                "mes": mes.strftime("%b"),
+                "alunos": novos_alunos[i],
+                "treinos": novos_treinos[i],
+            }
+            for i, mes in enumerate(meses)
+        ]
 
         # === PERSONAIS MAIS ATIVOS ===
-        personais_ativos = []
-        for p in personais:
-            treinos_p = Treino.objects.filter(personal_criador=p).count()
-            alunos_p = Aluno.objects.filter(personal_responsavel=p).count()
-            personais_ativos.append(
-                {
-                    "id": p.id,
-                    "nome": f"{p.user.first_name} {p.user.last_name}".strip()
-                    or p.user.email,
-                    "treinos": treinos_p,
-                    "alunos": alunos_p,
-                }
+        personais_ranking = (
+            personais.select_related("user")
+            .annotate(
+                total_treinos=soma_relacionada(
+                    ResumoDiario.objects.all(), "personal", "total_treinos"
+                ),
+                total_alunos=contagem_relacionada(
+                    Aluno.objects.all(), "personal_responsavel"
+                ),
             )
-
-        personais_ativos.sort(key=lambda x: x["treinos"], reverse=True)
+            .order_by("-total_treinos", "pk")[:10]
+        )
+        personais_ativos = [
+            {
+                "id": p.pk,
+                "nome": f"{p.user.first_name} {p.user.last_name}".strip()
+                or p.user.email,
+                "treinos": p.total_treinos,
+                "alunos": p.total_alunos,
+            }
+            for p in personais_ranking
+        ]
 
         # === MÉTRICAS DE USO ===
         dias_periodo = (hoje - data_inicio.replace(tzinfo=None)).days
@@ -936,16 +1301,17 @@ class RelatorioAcademiaView(APIView):
             "treinos_ranking": treinos_top,
             "categorias_ranking": categorias_ranking,
             "crescimento": crescimento,
-            "personais_ativos": personais_ativos[:10],
+            "personais_ativos": personais_ativos,
         }
 
-        return Response(data)
+        return data
 
 
-class RelatorioAdminView(APIView):
+class RelatorioAdminView(RelatorioCacheMixin, APIView):
     """View para relatórios detalhados do Admin do Sistema"""
 
     permission_classes = [permissions.IsAuthenticated]
+    permite_assincrono = True
 
     def get(self, request):
         user = request.user
@@ -955,6 +1321,13 @@ class RelatorioAdminView(APIView):
                 {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
             )
 
+        return self.responder_com_cache(
+            request,
+            ESCOPO_GLOBAL,
+            lambda: self.montar_dados(request),
+        )
+
+    def montar_dados(self, request):
         hoje = datetime.now()
         periodo = request.query_params.get("periodo", "mes")
 
@@ -981,82 +1354,74 @@ class RelatorioAdminView(APIView):
             (usuarios_ativos / max(total_usuarios, 1)) * 100, 1
         )
 
-        treinos_periodo = Treino.objects.filter(data_criacao__gte=data_inicio).count()
+        treinos_periodo = (
+            ResumoDiario.objects.filter(dia__gte=data_inicio).aggregate(
+                total=Sum("total_treinos")
+            )["total"]
+            or 0
+        )
         treinos_por_dia = round(
             treinos_periodo / max((hoje - data_inicio.replace(tzinfo=None)).days, 1), 1
         )
 
         # === CRESCIMENTO DE USUÁRIOS ===
-        crescimento = []
-        for i in range(11, -1, -1):  # 12 meses
-            mes_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            if i > 0:
-                mes_fim = (hoje - timedelta(days=30 * (i - 1))).replace(day=1)
-            else:
-                mes_fim = hoje + timedelta(days=1)
-
-            alunos_mes = Aluno.objects.filter(
-                user__date_joined__gte=mes_inicio, user__date_joined__lt=mes_fim
-            ).count()
-
-            personais_mes = PersonalTrainer.objects.filter(
-                user__date_joined__gte=mes_inicio, user__date_joined__lt=mes_fim
-            ).count()
-
-            academias_mes = (
-                Academia.objects.filter(
-                    created_at__gte=mes_inicio, created_at__lt=mes_fim
-                ).count()
-                if hasattr(Academia, "created_at")
-                else 0
-            )
+        meses = meses_recentes(12)
+        alunos_por_mes = contagem_por_mes(
+            Aluno.objects.all(), "user__date_joined", meses
+        )
+        personais_por_mes = contagem_por_mes(
+            PersonalTrainer.objects.all(), "user__date_joined", meses
+        )
+        academias_por_mes = contagem_por_mes(
+            Academia.objects.all(), "data_criacao", meses
+        )
 
-            crescimento.append(
-                {
-                    "mes": mes_inicio.strftime("%b/%y"),
-                    "alunos": alunos_mes,
-                    "personais": personais_mes,
-                    "academias": academias_mes,
-                }
-            )
+        crescimento = [
+            {
+                "mes": mes.strftime("%b/%y"),
+                "alunos": alunos_por_mes[i],
+                "personais": personais_por_mes[i],
+                "academias": academias_por_mes[i],
+            }
+            for i, mes in enumerate(meses)
+        ]
 
         # === VOLUME DE TREINOS ===
-        volume_treinos = []
-        for i in range(11, -1, -1):
-            mes_inicio = (hoje - timedelta(days=30 * i)).replace(day=1)
-            if i > 0:
-                mes_fim = (hoje - timedelta(days=30 * (i - 1))).replace(day=1)
-            else:
-                mes_fim = hoje + timedelta(days=1)
-
-            count = Treino.objects.filter(
-                data_criacao__gte=mes_inicio, data_criacao__lt=mes_fim
-            ).count()
-
-            volume_treinos.append(
-                {"mes": mes_inicio.strftime("%b/%y"), "treinos": count}
-            )
+        treinos_por_mes = soma_por_mes(
+            ResumoDiario.objects.all(), "dia", "total_treinos", meses
+        )
+        volume_treinos = [
+            {"mes": mes.strftime("%b/%y"), "treinos": treinos_por_mes[i]}
+            for i, mes in enumerate(meses)
+        ]
 
         # === TOP ACADEMIAS ===
-        top_academias = []
-        for academia in Academia.objects.all():
-            alunos_acad = Aluno.objects.filter(academia=academia).count()
-            personais_acad = PersonalTrainer.objects.filter(
-                user__academia=academia
-            ).count()
-            treinos_acad = Treino.objects.filter(aluno__academia=academia).count()
-
-            top_academias.append(
-                {
-                    "id": academia.id,
-                    "nome": academia.nome_fantasia,
-                    "alunos": alunos_acad,
-                    "personais": personais_acad,
-                    "treinos": treinos_acad,
-                }
+        academias_ranking = (
+            Academia.objects.annotate(
+                num_alunos=contagem_relacionada(Aluno.objects.all(), "academia"),
+                num_personais=contagem_relacionada(
+                    PersonalTrainer.objects.all(), "user__academia"
+                ),
+                num_treinos=soma_relacionada(
+                    ResumoDiario.objects.all(), "academia", "total_treinos"
+                ),
             )
+            .order_by("-num_alunos", "id")
+            .values(
+                "id", "nome_fantasia", "num_alunos", "num_personais", "num_treinos"
+            )[:10]
+        )
 
-        top_academias.sort(key=lambda x: x["alunos"], reverse=True)
+        top_academias = [
+            {
+                "id": academia["id"],
+                "nome": academia["nome_fantasia"],
+                "alunos": academia["num_alunos"],
+                "personais": academia["num_personais"],
+                "treinos": academia["num_treinos"],
+            }
+            for academia in academias_ranking
+        ]
 
         # === EXERCÍCIOS MAIS POPULARES ===
         exercicios_populares = (
@@ -1075,17 +1440,18 @@ class RelatorioAdminView(APIView):
         ]
 
         # === DISTRIBUIÇÃO POR TIPO DE USUÁRIO ===
+        usuarios_por_tipo = contagem_por_valor(User.objects.all(), "user_type")
         distribuicao_usuarios = [
             {"tipo": "Alunos", "total": total_alunos, "cor": "#3b82f6"},
             {"tipo": "Personal Trainers", "total": total_personais, "cor": "#22c55e"},
             {
                 "tipo": "Admins Academia",
-                "total": User.objects.filter(user_type="ADMIN").count(),
+                "total": usuarios_por_tipo.get("ADMIN", 0),
                 "cor": "#f59e0b",
             },
             {
                 "tipo": "Admins Sistema",
-                "total": User.objects.filter(user_type="ADMIN_SISTEMA").count(),
+                "total": usuarios_por_tipo.get("ADMIN_SISTEMA", 0),
                 "cor": "#ef4444",
             },
         ]
@@ -1116,10 +1482,160 @@ class RelatorioAdminView(APIView):
             "volume_treinos": volume_treinos,
             "distribuicao_usuarios": distribuicao_usuarios,
             # Rankings
-            "top_academias": top_academias[:10],
+            "top_academias": top_academias,
             "exercicios_populares": exercicios_top,
             # Performance
             "performance": performance,
         }
 
-        return Response(data)
+        return data
+
+
+class EvolucaoCargaView(RelatorioCacheMixin, APIView):
+    """
+    View para as séries de evolução de carga de um aluno, vários exercícios
+    por chamada, reduzidas a no máximo `max_pontos` pontos por série.
+
+    Parâmetros: aluno_id (obrigatório fora do perfil de aluno), exercicios
+    (ids separados por vírgula), inicio e fim (AAAA-MM-DD) e max_pontos.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parametros_cache = ("aluno_id", "exercicios", "inicio", "fim", "max_pontos")
+
+    MAX_PONTOS_PADRAO = 52
+    MAX_PONTOS_LIMITE = 366
+
+    def get(self, request):
+        user = request.user
+
+        if user.user_type == "ALUNO":
+            alunos = Aluno.objects.filter(pk=user.pk)
+        else:
+            aluno_id = request.query_params.get("aluno_id")
+            if not aluno_id or not aluno_id.isdigit():
+                return Response(
+                    {"error": "Informe o aluno_id"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            alunos = Aluno.objects.filter(pk=aluno_id)
+            if user.user_type == "PERSONAL":
+                alunos = alunos.filter(personal_responsavel_id=user.pk)
+            elif user.user_type == "ADMIN":
+                alunos = alunos.filter(academia_id=user.academia_id)
+            elif user.user_type != "ADMIN_SISTEMA":
+                return Response(
+                    {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
+                )
+
+        aluno_id = alunos.values_list("pk", flat=True).first()
+        if aluno_id is None:
+            return Response(
+                {"error": "Aluno não encontrado"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            filtros = self.ler_filtros(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self.responder_com_cache(
+            request,
+            escopo_aluno(aluno_id),
+            lambda: self.montar_dados(aluno_id, **filtros),
+        )
+
+    def ler_filtros(self, request):
+        params = request.query_params
+
+        exercicios = None
+        if params.get("exercicios"):
+            try:
+                exercicios = [int(e) for e in params["exercicios"].split(",") if e]
+            except ValueError:
+                raise ValueError("exercicios deve ser uma lista de ids")
+
+        try:
+            inicio = (
+                date.fromisoformat(params["inicio"]) if "inicio" in params else None
+            )
+            fim = date.fromisoformat(params["fim"]) if "fim" in params else None
+        except ValueError:
+            raise ValueError("Datas devem estar no formato AAAA-MM-DD")
+        if inicio and fim and fim < inicio:
+            raise ValueError("fim não pode ser antes de inicio")
+
+        try:
+            max_pontos = int(params.get("max_pontos", self.MAX_PONTOS_PADRAO))
+        except ValueError:
+            raise ValueError("max_pontos deve ser um número")
+        max_pontos = min(max(max_pontos, 2), self.MAX_PONTOS_LIMITE)
+
+        return {
+            "exercicio_ids": exercicios,
+            "inicio": inicio,
+            "fim": fim,
+            "max_pontos": max_pontos,
+        }
+
+    def montar_dados(self, aluno_id, **filtros):
+        resolucao, series = series_de_carga(aluno_id, **filtros)
+        for serie in series:
+            for ponto in serie["pontos"]:
+                ponto["data"] = ponto["data"].isoformat()
+
+        return {
+            "aluno_id": aluno_id,
+            "resolucao": resolucao,
+            "series": series,
+        }
+
+
+class CacheRelatoriosView(APIView):
+    """View com os contadores de acerto e falha do cache de relatórios"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if request.user.user_type != "ADMIN_SISTEMA":
+            return Response(
+                {"error": "Acesso negado"}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        return Response(estatisticas())
+
+
+class TarefaRelatorioView(APIView):
+    """View para acompanhar um relatório gerado em segundo plano"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, tarefa_id):
+        tarefa = obter_tarefa(tarefa_id, request.user.pk)
+        if tarefa is None:
+            return Response(
+                {"error": "Tarefa não encontrada"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(tarefa.como_dict())
+
+
+class ResultadoTarefaRelatorioView(APIView):
+    """View para buscar o payload de um relatório gerado em segundo plano"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, tarefa_id):
+        tarefa = obter_tarefa(tarefa_id, request.user.pk)
+        if tarefa is None:
+            return Response(
+                {"error": "Tarefa não encontrada"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if tarefa.status == CONCLUIDA:
+            return Response(tarefa.resultado)
+        if tarefa.status == ERRO:
+            return Response(
+                tarefa.como_dict(), status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(tarefa.como_dict(), status=status.HTTP_202_ACCEPTED)
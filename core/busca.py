@@ -0,0 +1,210 @@
+"""
+Busca textual no catálogo de exercícios (?q=).
+
+Índice invertido em memória, montado junto com o catálogo de cada versão
+(ver core/catalogo.py): cada termo aponta para os exercícios que o contêm,
+com um peso que depende do campo (o nome vale mais que as instruções). Os
+textos e a consulta passam pela mesma normalização, sem acentos e sem
+diferença de caixa, então "isquiotibiais", "Isquiotibiais" e "ísquiotibiais"
+são o mesmo termo.
+
+Uma busca só lê as listas dos termos consultados, começando pela menor, e o
+custo depende de quantos exercícios têm os termos, não do tamanho do
+catálogo.
+
+O autocompletar (`IndicePrefixos`) usa outro índice: os nomes, também
+normalizados, a partir do início de cada palavra, em uma lista ordenada.
+Os nomes que começam com um prefixo estão todos em uma faixa contígua da
+lista, achada com bisect.
+"""
+
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+# campo -> peso de uma ocorrência do termo no campo
+PESOS = {
+    "nome": 5.0,
+    "primary_muscles": 3.0,
+    "secondary_muscles": 2.0,
+    "equipment": 2.0,
+    "instructions": 1.0,
+}
+
+# Saturação da frequência (como no BM25): repetir um termo nas instruções
+# não deixa o exercício à frente de outro que tem o termo no nome.
+SATURACAO = 1.2
+
+PALAVRAS_VAZIAS = frozenset(
+    "a o as os e de da do das dos em no na nos nas um uma com para por se "
+    "the of and to an in on with your you is it at as or".split()
+)
+
+_PALAVRA = re.compile(r"\w+")
+
+
+def dobrar(texto):
+    """Texto em minúsculas e sem acentos."""
+    decomposto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def termos(texto):
+    """Termos indexáveis de um texto, já normalizados, na ordem em que aparecem."""
+    return [
+        termo
+        for termo in _PALAVRA.findall(dobrar(texto))
+        if termo not in PALAVRAS_VAZIAS
+    ]
+
+
+def _textos(valor):
+    # Campos de texto ou listas JSON de textos (músculos, instruções)
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        return [valor]
+    return [str(item) for item in valor]
+
+
+class IndiceBusca:
+    """
+    Índice invertido de `documentos`, pares (chave, {campo: valor}) com os
+    campos de PESOS.
+    """
+
+    def __init__(self, documentos):
+        frequencias = defaultdict(dict)
+        self.chaves = []
+        for posicao, (chave, campos) in enumerate(documentos):
+            self.chaves.append(chave)
+            for campo, peso in PESOS.items():
+                for texto in _textos(campos.get(campo)):
+                    for termo in termos(texto):
+                        documento = frequencias[termo]
+                        documento[posicao] = documento.get(posicao, 0) + peso
+
+        total = len(self.chaves)
+        # termo -> (idf, {posição do documento: peso saturado})
+        self.termos = {
+            termo: (
+                math.log(1 + total / len(documentos)),
+                {
+                    posicao: (SATURACAO + 1) * peso / (SATURACAO + peso)
+                    for posicao, peso in documentos.items()
+                },
+            )
+            for termo, documentos in frequencias.items()
+        }
+
+    def buscar(self, consulta):
+        """
+        Chaves dos documentos que têm todos os termos da consulta, do mais
+        relevante ao menos (empates na ordem do catálogo).
+        """
+        listas = []
+        for termo in dict.fromkeys(termos(consulta)):
+            if termo not in self.termos:
+                return []
+            listas.append(self.termos[termo])
+        if not listas:
+            return []
+
+        # A menor lista limita o resultado; as outras só são consultadas
+        listas.sort(key=lambda entrada: len(entrada[1]))
+        idf, documentos = listas[0]
+        placar = {posicao: idf * peso for posicao, peso in documentos.items()}
+        for idf, documentos in listas[1:]:
+            placar = {
+                posicao: pontos + idf * documentos[posicao]
+                for posicao, pontos in placar.items()
+                if posicao in documentos
+            }
+
+        ordem = sorted(placar, key=lambda posicao: (-placar[posicao], posicao))
+        return [self.chaves[posicao] for posicao in ordem]
+
+
+# Prefixos com até CURTOS caracteres casam com boa parte do catálogo; o
+# resultado deles é guardado pronto, com até LIMITE_MAXIMO nomes.
+CURTOS = 2
+LIMITE_MAXIMO = 50
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def _normalizar_nome(texto):
+    return _ESPACOS.sub(" ", dobrar(texto)).strip()
+
+
+class IndicePrefixos:
+    """
+    Autocompletar de `documentos`, pares (chave, nome). Um prefixo casa com
+    o nome inteiro ou com o nome a partir de qualquer palavra ("barra" acha
+    "Supino com barra"). Vêm antes os nomes que começam com o prefixo, depois
+    os mais curtos, depois em ordem alfabética.
+    """
+
+    def __init__(self, documentos):
+        entradas = []
+        for chave, nome in documentos:
+            normalizado = _normalizar_nome(nome)
+            inicios = [0] + [
+                posicao + 1 for posicao, letra in enumerate(normalizado) if letra == " "
+            ]
+            for inicio in inicios:
+                ordem = (inicio > 0, len(normalizado), normalizado)
+                entradas.append((normalizado[inicio:], ordem, chave))
+        entradas.sort()
+        self.textos = [texto for texto, _, _ in entradas]
+        self.entradas = [(ordem, chave) for _, ordem, chave in entradas]
+
+        self.curtos = {}
+        por_prefixo = {}
+        for texto, ordem, chave in entradas:
+            for tamanho in range(1, min(CURTOS, len(texto)) + 1):
+                por_prefixo.setdefault(texto[:tamanho], []).append((ordem, chave))
+        for prefixo, candidatos in por_prefixo.items():
+            self.curtos[prefixo] = self._melhores(candidatos, LIMITE_MAXIMO)
+
+    @staticmethod
+    def _melhores(candidatos, limite):
+        if len(candidatos) > 8 * limite:
+            # Os `limite` primeiros nomes distintos dos 4 * limite melhores
+            # candidatos são os mesmos da lista inteira ordenada; só faltam
+            # nomes quando um deles casa em muitas palavras
+            chaves = IndicePrefixos._distintos(
+                heapq.nsmallest(4 * limite, candidatos), limite
+            )
+            if len(chaves) == limite:
+                return chaves
+        return IndicePrefixos._distintos(sorted(candidatos), limite)
+
+    @staticmethod
+    def _distintos(ordenados, limite):
+        # Um nome pode casar em mais de uma palavra; vale a melhor posição
+        chaves = []
+        vistas = set()
+        for _, chave in ordenados:
+            if chave not in vistas:
+                vistas.add(chave)
+                chaves.append(chave)
+                if len(chaves) == limite:
+                    break
+        return chaves
+
+    def completar(self, prefixo, limite=10):
+        """Até `limite` chaves cujos nomes casam com `prefixo`, já ordenadas."""
+        prefixo = _normalizar_nome(prefixo)
+        if not prefixo:
+            return []
+        limite = min(limite, LIMITE_MAXIMO)
+        if len(prefixo) <= CURTOS:
+            return self.curtos.get(prefixo, [])[:limite]
+
+        inicio = bisect.bisect_left(self.textos, prefixo)
+        fim = bisect.bisect_left(self.textos, prefixo + "\U0010ffff", inicio)
+        return self._melhores(self.entradas[inicio:fim], limite)
@@ -0,0 +1,280 @@
+"""
+Cache dos payloads de dashboards e relatórios.
+
+Cada entrada é guardada sob uma chave que inclui a versão do escopo de dados
+do qual depende ("global", "academia:<id>", "personal:<id>" ou "aluno:<id>").
+Os signals em core/signals.py incrementam a versão dos escopos afetados por
+cada alteração, o que torna as entradas antigas inalcançáveis sem precisar
+apagá-las uma a uma.
+
+As mesmas versões formam os ETags das respostas: se nenhum escopo do qual a
+resposta depende mudou, o cliente recebe 304 sem que nada seja consultado ou
+serializado (ver também core/condicional.py).
+
+As versões só valem se todos os processos as leem do mesmo cache: com um
+cache por processo, a alteração feita por um worker não muda as versões dos
+outros. O check core.E001 recusa caches locais ao processo.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from academias.models import Aluno
+from treinos.models import Treino
+from .tarefas_relatorios import enfileirar
+
+PREFIXO = "relatorios"
+ESCOPO_GLOBAL = "global"
+# Catálogo de exercícios, que muda independente dos dados das academias.
+ESCOPO_CATALOGO = "catalogo"
+
+
+# Backends cujo conteúdo não é visto pelos outros processos
+CACHES_DO_PROCESSO = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@checks.register(checks.Tags.caches)
+def verificar_cache_compartilhado(app_configs, **kwargs):
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in CACHES_DO_PROCESSO or settings.RELATORIOS_PROCESSO_UNICO:
+        return []
+    return [
+        checks.Error(
+            f"O cache padrão ({backend}) não é compartilhado entre os processos.",
+            hint=(
+                "As versões dos escopos de cache precisam ser as mesmas em "
+                "todos os workers. Use um cache compartilhado (arquivos, "
+                "Redis, Memcached) ou, com um processo só, "
+                "RELATORIOS_PROCESSO_UNICO = True."
+            ),
+            id="core.E001",
+        )
+    ]
+
+
+def escopo_academia(academia_id):
+    return f"academia:{academia_id}"
+
+
+def escopo_personal(personal_id):
+    return f"personal:{personal_id}"
+
+
+def escopo_aluno(aluno_id):
+    return f"aluno:{aluno_id}"
+
+
+def escopo_do_usuario(user):
+    """Escopo com todos os dados que o usuário pode ver."""
+    if user.user_type == "PERSONAL":
+        return escopo_personal(user.pk)
+    if user.user_type == "ALUNO":
+        return escopo_aluno(user.pk)
+    if user.user_type == "ADMIN" and user.academia_id:
+        return escopo_academia(user.academia_id)
+    return ESCOPO_GLOBAL
+
+
+def escopos_dos_treinos(filtro):
+    """Escopos (aluno, personal criador, academia) dos treinos do filtro."""
+    escopos = set()
+    # Uma linha por combinação, não por treino: o histórico de um personal
+    # tem milhares de treinos e poucos alunos.
+    treinos = (
+        Treino.objects.filter(**filtro)
+        .values_list("aluno_id", "personal_criador_id", "aluno__academia_id")
+        .distinct()
+    )
+    for aluno_id, personal_id, academia_id in treinos:
+        escopos.add(escopo_aluno(aluno_id))
+        if personal_id:
+            escopos.add(escopo_personal(personal_id))
+        if academia_id:
+            escopos.add(escopo_academia(academia_id))
+    return escopos
+
+
+def escopos_dos_alunos(filtro):
+    """Escopos (aluno, personal responsável, academia) dos alunos do filtro."""
+    escopos = set()
+    alunos = Aluno.objects.filter(**filtro).values_list(
+        "pk", "personal_responsavel_id", "academia_id"
+    )
+    for aluno_id, personal_id, academia_id in alunos:
+        escopos.add(escopo_aluno(aluno_id))
+        if personal_id:
+            escopos.add(escopo_personal(personal_id))
+        if academia_id:
+            escopos.add(escopo_academia(academia_id))
+    return escopos
+
+
+def _chave_versao(escopo):
+    return f"{PREFIXO}:versao:{escopo}"
+
+
+def _versao_inicial():
+    # A entrada da versão pode ser despejada do cache (ao passar do
+    # MAX_ENTRIES o backend descarta parte das entradas). Recomeçar em 1 faria valer de novo ETags e entradas
+    # de relatório da primeira versão; o relógio em nanossegundos não repete.
+    return time.time_ns()
+
+
+def versao_escopo(escopo):
+    """Retorna a versão atual de um escopo (um número que nunca se repete)."""
+    chave = _chave_versao(escopo)
+    versao = cache.get(chave)
+    if versao is None:
+        inicial = _versao_inicial()
+        cache.add(chave, inicial, timeout=None)
+        versao = cache.get(chave, inicial)
+    return versao
+
+
+def invalidar_escopos(escopos):
+    """Troca a versão dos escopos informados. Valores None são ignorados."""
+    for escopo in set(filter(None, escopos)):
+        chave = _chave_versao(escopo)
+        # Sem incr(): nos caches em arquivo ele é um get seguido de set, e
+        # duas trocas ao mesmo tempo gravariam a mesma versão. O relógio dá a
+        # cada troca um valor próprio, sempre maior que o anterior.
+        versao = max(cache.get(chave, 0) + 1, _versao_inicial())
+        cache.set(chave, versao, timeout=None)
+
+
+def chave_relatorio(nome, papel, escopo, parametros):
+    """Monta a chave de cache de um relatório para o escopo e parâmetros dados."""
+    parametros = "&".join(f"{k}={v}" for k, v in sorted(parametros.items()))
+    resumo = hashlib.md5(parametros.encode("utf-8")).hexdigest()
+    return f"{PREFIXO}:{nome}:{papel}:{escopo}:v{versao_escopo(escopo)}:{resumo}"
+
+
+def calcular_etag(*partes):
+    """ETag forte a partir de partes já conhecidas (versões, parâmetros)."""
+    texto = "|".join(str(parte) for parte in partes)
+    return quote_etag(hashlib.md5(texto.encode("utf-8")).hexdigest())
+
+
+def etag_confere(request, etag):
+    """Indica se o If-None-Match da requisição contém `etag`."""
+    cabecalho = request.headers.get("If-None-Match")
+    if not cabecalho:
+        return False
+    # Comparação fraca, como no If-None-Match do HTTP.
+    etags = {e.removeprefix("W/") for e in parse_etags(cabecalho)}
+    return "*" in etags or etag in etags
+
+
+def marcar_resposta(response, etag):
+    """Anexa o ETag e pede que o cliente revalide antes de reusar a resposta."""
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+def nao_modificado(etag):
+    return marcar_resposta(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def _registrar(resultado):
+    chave = f"{PREFIXO}:estatisticas:{resultado}"
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.add(chave, 0, timeout=None)
+        cache.incr(chave)
+
+
+def estatisticas():
+    """Retorna os contadores de acertos e falhas do cache de relatórios."""
+    acertos = cache.get(f"{PREFIXO}:estatisticas:acertos", 0)
+    falhas = cache.get(f"{PREFIXO}:estatisticas:falhas", 0)
+    return {
+        "acertos": acertos,
+        "falhas": falhas,
+        "taxa_acerto": round(acertos / max(acertos + falhas, 1) * 100, 1),
+    }
+
+
+def obter_ou_gerar(chave, gerar):
+    """Retorna o payload em cache para `chave` ou o gera e guarda."""
+    dados = cache.get(chave)
+    if dados is not None:
+        _registrar("acertos")
+        return dados
+
+    _registrar("falhas")
+    dados = gerar()
+    cache.set(chave, dados, timeout=settings.RELATORIOS_CACHE_TIMEOUT)
+    return dados
+
+
+class RelatorioCacheMixin:
+    """
+    Mixin para as views de dashboard e relatório.
+
+    A view resolve o escopo do usuário e delega a montagem do payload para
+    `responder_com_cache`, que só chama `gerar` quando não há entrada válida.
+    """
+
+    # Nome usado na chave de cache; por padrão, o nome da classe.
+    nome_cache = None
+    # Parâmetros da query string que alteram o payload.
+    parametros_cache = ("periodo",)
+    # Permite ?async=1 para gerar o relatório em segundo plano.
+    permite_assincrono = False
+
+    def parametros_relatorio(self, request):
+        return {
+            nome: request.query_params[nome]
+            for nome in self.parametros_cache
+            if nome in request.query_params
+        }
+
+    def chave_cache(self, request, escopo):
+        parametros = self.parametros_relatorio(request)
+        if request.user.user_type == "ALUNO":
+            # A sequência e a semana do aluno mudam com a data, sem escrita
+            # nenhuma que suba a versão do escopo.
+            parametros = {**parametros, "dia": timezone.localdate().isoformat()}
+        return chave_relatorio(
+            self.nome_cache or type(self).__name__,
+            request.user.user_type,
+            escopo,
+            parametros,
+        )
+
+    def responder_com_cache(self, request, escopo, gerar):
+        chave = self.chave_cache(request, escopo)
+        # A chave já inclui papel, escopo, versão e parâmetros.
+        etag = calcular_etag(chave)
+        if etag_confere(request, etag):
+            return nao_modificado(etag)
+
+        assincrono = request.query_params.get("async") in ("1", "true")
+
+        if self.permite_assincrono and assincrono:
+            dados = cache.get(chave)
+            if dados is not None:
+                _registrar("acertos")
+                return marcar_resposta(Response(dados), etag)
+
+            tarefa = enfileirar(
+                chave, request.user.pk, lambda: obter_ou_gerar(chave, gerar)
+            )
+            return Response(tarefa.como_dict(), status=status.HTTP_202_ACCEPTED)
+
+        return marcar_resposta(Response(obter_ou_gerar(chave, gerar)), etag)
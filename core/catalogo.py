@@ -0,0 +1,204 @@
+"""
+Catálogo de exercícios em memória, por processo.
+
+O catálogo (Exercicio) quase nunca muda, mas é lido inteiro pelos
+formulários de treino. Cada processo guarda um `Catalogo` imutável com as
+respostas da API já renderizadas em JSON (listagem, listagem por categoria,
+categorias e detalhe de cada exercício), com o índice da busca ?q= (ver
+core/busca.py), com o índice do autocompletar, com os bitsets dos filtros
+por faceta (ver core/facetas.py) e com as linhas de exercícios parecidos (ver
+core/similares.py). As leituras do catálogo passam a custar uma consulta ao
+cache (a versão) e nenhuma ao banco.
+
+O catálogo é remontado quando a versão do escopo "catalogo" muda (ver
+core/cache_relatorios.py): os signals de Exercicio a incrementam a cada
+alteração, seja pelo admin ou pelo comando import_exercicios. Se a entrada
+da versão for despejada do cache, ela volta com um valor novo e o catálogo
+também é remontado. Por garantia, ele é remontado ainda depois de
+IDADE_MAXIMA segundos.
+"""
+
+import threading
+import time
+
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from treinos.models import Exercicio
+from .busca import IndiceBusca, IndicePrefixos
+from .cache_relatorios import ESCOPO_CATALOGO, versao_escopo
+from .facetas import FACETAS, IndiceFacetas, filtros_da_query, normalizar
+from .serializers import ExercicioListSerializer, ExercicioSerializer
+from .similares import IndiceSimilares
+
+IDADE_MAXIMA = 600
+
+_atual = None
+_trava = threading.Lock()
+
+
+class Catalogo:
+    """
+    Respostas do catálogo já renderizadas e os índices de busca e de
+    facetas, para uma versão.
+    """
+
+    def __init__(self, versao, exercicios):
+        renderizar = JSONRenderer().render
+        self.versao = versao
+        self.criado_em = time.monotonic()
+
+        # Linha de cada exercício na listagem, já em JSON. O JSONRenderer é
+        # compacto, então juntar as linhas com "," dá o mesmo que renderizar
+        # a lista.
+        lista = ExercicioListSerializer(exercicios, many=True).data
+        self.linhas = {linha["id"]: renderizar(linha) for linha in lista}
+
+        por_categoria = {}
+        for exercicio in exercicios:
+            if exercicio.category:
+                por_categoria.setdefault(normalizar(exercicio.category), []).append(
+                    exercicio.pk
+                )
+
+        self.lista = self.juntar(self.linhas)
+        self.por_categoria = {
+            categoria: self.juntar(ids) for categoria, ids in por_categoria.items()
+        }
+        # Na ordem em que aparecem, como o DISTINCT sem ORDER BY
+        categorias = dict.fromkeys(e.category for e in exercicios if e.category)
+        self.categorias = renderizar(list(categorias))
+        self.detalhes = {
+            linha["id"]: renderizar(linha)
+            for linha in ExercicioSerializer(exercicios, many=True).data
+        }
+        self.indice = IndiceBusca(
+            (exercicio.pk, vars(exercicio)) for exercicio in exercicios
+        )
+        self.prefixos = IndicePrefixos(
+            (exercicio.pk, exercicio.nome) for exercicio in exercicios
+        )
+        self.facetas = IndiceFacetas(
+            (exercicio.pk, vars(exercicio)) for exercicio in exercicios
+        )
+        self.similaridade = IndiceSimilares(
+            (exercicio.pk, vars(exercicio)) for exercicio in exercicios
+        )
+
+    @classmethod
+    def montar(cls, versao):
+        return cls(versao, list(Exercicio.objects.order_by("pk")))
+
+    def valido(self, versao):
+        return (
+            self.versao == versao and time.monotonic() - self.criado_em < IDADE_MAXIMA
+        )
+
+    def juntar(self, ids):
+        """Lista JSON com as linhas dos exercícios `ids`, nesta ordem."""
+        return b"[" + b",".join(self.linhas[pk] for pk in ids) + b"]"
+
+    def filtrar(self, filtros):
+        """Ids dos exercícios que atendem a `filtros` ({faceta: [valores]})."""
+        return self.facetas.chaves_de(self.facetas.filtrar(filtros))
+
+    def buscar(self, consulta, filtros=None):
+        """Ids dos exercícios da busca, do mais relevante ao menos."""
+        ids = self.indice.buscar(consulta)
+        if filtros:
+            permitidos = set(self.filtrar(filtros))
+            ids = [pk for pk in ids if pk in permitidos]
+        return ids
+
+    def autocompletar(self, prefixo, limite):
+        """Linhas dos exercícios cujo nome casa com `prefixo`, em JSON."""
+        return self.juntar(self.prefixos.completar(prefixo, limite))
+
+    def similares(self, pk, limite, filtros=None):
+        """
+        Os exercícios mais parecidos com `pk`, em JSON, cada um com a nota
+        ({"similaridade": 0.78, "exercicio": {...}}), ou None se `pk` não
+        existe. Com filtros, só os exercícios que os atendem concorrem.
+        """
+        permitidos = set(self.filtrar(filtros)) if filtros else None
+        linha = self.similaridade.similares(pk, permitidos)
+        if linha is None:
+            return None
+        renderizar = JSONRenderer().render
+        itens = (
+            b'{"similaridade":%s,"exercicio":%s}'
+            % (renderizar(nota), self.linhas[outro])
+            for nota, outro in linha[:limite]
+        )
+        return b"[" + b",".join(itens) + b"]"
+
+    def listagem(self, filtros=None, consulta=None):
+        """
+        Listagem completa, filtrada por facetas ou de uma busca, ordenada por
+        relevância.
+        """
+        if consulta:
+            return self.juntar(self.buscar(consulta, filtros))
+        if not filtros:
+            return self.lista
+        if list(filtros) == ["categoria"] and len(filtros["categoria"]) == 1:
+            # Já renderizada
+            return self.por_categoria.get(filtros["categoria"][0], b"[]")
+        return self.juntar(self.filtrar(filtros))
+
+
+def catalogo_atual():
+    """O catálogo da versão atual, remontado se a versão mudou."""
+    global _atual
+    versao = versao_escopo(ESCOPO_CATALOGO)
+    catalogo = _atual
+    if catalogo is None or not catalogo.valido(versao):
+        with _trava:
+            catalogo = _atual
+            if catalogo is None or not catalogo.valido(versao):
+                catalogo = _atual = Catalogo.montar(versao)
+    return catalogo
+
+
+def descartar_catalogo():
+    """Força a remontagem na próxima leitura."""
+    global _atual
+    _atual = None
+
+
+def resposta_json(conteudo):
+    return HttpResponse(conteudo, content_type="application/json")
+
+
+class CatalogoEmMemoriaMixin:
+    """
+    Mixin do ExercicioViewSet que responde list e retrieve com o catálogo em
+    memória. Pedidos com outros parâmetros (?fields=, ?format=...) ou que não
+    pedem JSON seguem o caminho normal do viewset. Fica depois do
+    RespostaCondicionalMixin, que cuida do ETag.
+    """
+
+    parametros_do_catalogo = {"q", *FACETAS}
+
+    def usa_catalogo(self, request, parametros=frozenset()):
+        return (
+            request.accepted_renderer.format == "json"
+            and set(request.query_params) <= parametros
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.usa_catalogo(request, self.parametros_do_catalogo):
+            return super().list(request, *args, **kwargs)
+        filtros = filtros_da_query(request.query_params)
+        consulta = request.query_params.get("q")
+        return resposta_json(catalogo_atual().listagem(filtros, consulta))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        conteudo = None
+        if pk.isdigit() and self.usa_catalogo(request):
+            conteudo = catalogo_atual().detalhes.get(int(pk))
+        if conteudo is None:
+            # Inexistente ou com parâmetros: o caminho normal (e o seu 404)
+            return super().retrieve(request, *args, **kwargs)
+        return resposta_json(conteudo)
@@ -0,0 +1,88 @@
+"""
+GET condicional (ETag / If-None-Match) para os viewsets da API.
+
+O ETag é calculado a partir das versões dos escopos de cache dos quais a
+resposta depende (ver core/cache_relatorios.py), antes de consultar o banco
+ou serializar qualquer coisa. Se o cliente já tem a versão atual, recebe 304.
+"""
+
+from .cache_relatorios import (
+    ESCOPO_CATALOGO,
+    ESCOPO_GLOBAL,
+    calcular_etag,
+    escopo_academia,
+    escopo_do_usuario,
+    etag_confere,
+    marcar_resposta,
+    nao_modificado,
+    versao_escopo,
+)
+
+
+class RespostaCondicionalMixin:
+    """
+    Mixin para viewsets que responde 304 a list e retrieve quando nenhum dos
+    escopos da resposta mudou desde o ETag enviado pelo cliente.
+    """
+
+    # False quando a resposta é igual para todos os usuários (ex.: catálogo).
+    etag_por_usuario = True
+
+    def escopos_condicionais(self, request):
+        """Escopos dos quais a resposta depende; por padrão, os do usuário."""
+        user = request.user
+        escopos = {escopo_do_usuario(user), ESCOPO_CATALOGO}
+        if user.academia_id:
+            escopos.add(escopo_academia(user.academia_id))
+        if self.action == "retrieve":
+            pk = str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+            if pk.isdigit():
+                escopos |= self.escopos_do_objeto(int(pk))
+        return escopos
+
+    def escopos_do_objeto(self, pk):
+        """
+        Escopos extras do registro pedido em retrieve, para dados aninhados
+        que vêm de outros escopos (ex.: o personal dentro do treino).
+        """
+        return set()
+
+    def etag_condicional(self, request):
+        partes = [type(self).__name__, request.get_full_path()]
+        if self.etag_por_usuario:
+            partes += [request.user.user_type, request.user.pk]
+        for escopo in sorted(self.escopos_condicionais(request)):
+            partes.append(f"{escopo}:{versao_escopo(escopo)}")
+        return calcular_etag(*partes)
+
+    def responder_condicional(self, request, gerar):
+        etag = self.etag_condicional(request)
+        if etag_confere(request, etag):
+            return nao_modificado(etag)
+
+        response = gerar()
+        if response.status_code == 200:
+            marcar_resposta(response, etag)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        gerar = super().list
+        return self.responder_condicional(
+            request, lambda: gerar(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        gerar = super().retrieve
+        return self.responder_condicional(
+            request, lambda: gerar(request, *args, **kwargs)
+        )
+
+
+class RespostaCondicionalGlobalMixin(RespostaCondicionalMixin):
+    """
+    Para respostas com contagens que cruzam escopos (ex.: total de alunos de
+    uma academia vista por um personal): depende da versão global.
+    """
+
+    def escopos_condicionais(self, request):
+        return {ESCOPO_GLOBAL, ESCOPO_CATALOGO}
@@ -0,0 +1,133 @@
+"""
+Exportação dos treinos com os seus itens, para BI.
+
+Recebe o queryset de treinos já restrito ao usuário (ver `treinos_visiveis`
+em core/api_views.py).
+
+As linhas são geradas aos poucos: os treinos são lidos com
+QuerySet.iterator(chunk_size=...) e os itens de cada lote de treinos com uma
+consulta, de modo que a memória usada depende do tamanho do lote e não do
+tamanho da exportação. Os geradores alimentam tanto o StreamingHttpResponse
+da API quanto o comando `exportar_treinos`.
+
+Formatos: NDJSON (um treino por linha, com a lista de itens) e CSV (uma linha
+por item; treinos sem itens saem em uma linha com as colunas do item vazias).
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from treinos.models import ItemTreino
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+TAMANHO_LOTE = 2000
+
+# coluna da exportação -> caminho do values()
+COLUNAS_TREINO = {
+    "treino_id": "id",
+    "nome_treino": "nome_treino",
+    "ativo": "ativo",
+    "data_criacao": "data_criacao",
+    "aluno_id": "aluno_id",
+    "aluno_nome": "aluno__user__first_name",
+    "aluno_sobrenome": "aluno__user__last_name",
+    "aluno_email": "aluno__user__email",
+    "academia_id": "aluno__academia_id",
+    "personal_id": "personal_criador_id",
+    "personal_nome": "personal_criador__user__first_name",
+    "personal_sobrenome": "personal_criador__user__last_name",
+}
+
+COLUNAS_ITEM = {
+    "item_id": "id",
+    "exercicio_id": "exercicio_id",
+    "exercicio": "exercicio__nome",
+    "categoria": "exercicio__category",
+    "series": "series",
+    "repeticoes": "repeticoes",
+    "carga_kg": "carga_kg",
+    "observacoes": "observacoes",
+}
+
+
+def _lotes(treinos, tamanho_lote):
+    lote = []
+    linhas = (
+        treinos.order_by("pk")
+        .values_list(*COLUNAS_TREINO.values())
+        .iterator(chunk_size=tamanho_lote)
+    )
+    for linha in linhas:
+        lote.append(dict(zip(COLUNAS_TREINO, linha)))
+        if len(lote) == tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def treinos_com_itens(treinos, tamanho_lote=TAMANHO_LOTE):
+    """
+    Gera um dict por treino de `treinos`, em ordem de id, com a chave "itens"
+    trazendo os seus itens. Uma consulta de itens por lote de treinos.
+    """
+    for lote in _lotes(treinos, tamanho_lote):
+        itens = {}
+        linhas = (
+            ItemTreino.objects.filter(treino_id__in=[t["treino_id"] for t in lote])
+            .order_by("treino_id", "pk")
+            .values_list("treino_id", *COLUNAS_ITEM.values())
+        )
+        for treino_id, *valores in linhas:
+            itens.setdefault(treino_id, []).append(dict(zip(COLUNAS_ITEM, valores)))
+
+        for treino in lote:
+            treino["itens"] = itens.get(treino["treino_id"], [])
+            yield treino
+
+
+def linhas_ndjson(treinos, tamanho_lote=TAMANHO_LOTE):
+    """Uma linha JSON por treino, já terminada em quebra de linha."""
+    for treino in treinos_com_itens(treinos, tamanho_lote):
+        yield json.dumps(treino, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+class _Eco:
+    """Arquivo falso que devolve o que recebe, para o csv.writer gerar texto."""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return int(valor)
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return valor
+
+
+def linhas_csv(treinos, tamanho_lote=TAMANHO_LOTE):
+    """Cabeçalho e uma linha CSV por item (ou por treino sem itens)."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([*COLUNAS_TREINO, *COLUNAS_ITEM])
+
+    vazio = [""] * len(COLUNAS_ITEM)
+    for treino in treinos_com_itens(treinos, tamanho_lote):
+        itens = treino.pop("itens")
+        base = [_valor_csv(valor) for valor in treino.values()]
+        if not itens:
+            yield escritor.writerow(base + vazio)
+        for item in itens:
+            yield escritor.writerow(base + [_valor_csv(v) for v in item.values()])
+
+
+GERADORES = {"ndjson": linhas_ndjson, "csv": linhas_csv}
@@ -0,0 +1,149 @@
+"""
+Filtros por faceta no catálogo de exercícios.
+
+Os músculos de Exercicio são listas JSON, sem como filtrar no SQL, e o filtro
+de categoria compara sem diferença de caixa, o que não usa o índice. O
+`IndiceFacetas`, montado junto com o catálogo de cada versão (ver
+core/catalogo.py), guarda para cada valor de cada faceta um bitset (um int
+do Python) com um bit por exercício, na ordem do catálogo.
+
+Filtrar é combinar bitsets: valores da mesma faceta somam (OR) e facetas
+diferentes se restringem (AND). A contagem de um valor é o número de bits do
+seu bitset no resultado dos filtros das outras facetas, de modo que cada
+faceta mostra quantos exercícios cada opção traria com o que já foi escolhido
+nas demais.
+"""
+
+from .busca import dobrar
+
+# faceta (parâmetro da query string) -> campos de Exercicio
+FACETAS = {
+    "musculo": ("primary_muscles", "secondary_muscles"),
+    "equipamento": ("equipment",),
+    "nivel": ("level",),
+    "forca": ("force",),
+    "mecanica": ("mechanic",),
+    "categoria": ("category",),
+}
+
+
+def normalizar(valor):
+    return dobrar(str(valor)).strip()
+
+
+def valores(texto):
+    """Valores de um parâmetro de faceta: "peito,costas" -> ["peito", "costas"]."""
+    return [valor for valor in map(normalizar, texto.split(",")) if valor]
+
+
+def filtros_da_query(query_params):
+    """
+    {faceta: [valores]} das facetas presentes na query string. Uma faceta
+    pode vir repetida (?musculo=peito&musculo=costas) ou separada por vírgula.
+    """
+    filtros = {}
+    for faceta in FACETAS:
+        escolhidos = [
+            valor for texto in query_params.getlist(faceta) for valor in valores(texto)
+        ]
+        if escolhidos:
+            filtros[faceta] = escolhidos
+    return filtros
+
+
+def _textos(valor):
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        return [valor]
+    return list(valor)
+
+
+def _bitset(posicoes, total):
+    # Montado de uma vez a partir dos dígitos: com `|=` bit a bit cada
+    # posição copiaria o int inteiro
+    digitos = bytearray(b"0" * total)
+    for posicao in posicoes:
+        digitos[total - 1 - posicao] = ord("1")
+    return int(digitos, 2) if total else 0
+
+
+class IndiceFacetas:
+    """
+    Bitsets das facetas de `documentos`, pares (chave, {campo: valor}) com
+    os campos de FACETAS.
+    """
+
+    def __init__(self, documentos):
+        self.chaves = []
+        # valor normalizado -> valor como está no catálogo, para as respostas
+        self.rotulos = {faceta: {} for faceta in FACETAS}
+        posicoes = {faceta: {} for faceta in FACETAS}
+        # Os valores se repetem muito (poucos níveis, equipamentos...)
+        normalizados = {}
+
+        for posicao, (chave, campos) in enumerate(documentos):
+            self.chaves.append(chave)
+            for faceta, nomes in FACETAS.items():
+                rotulos = self.rotulos[faceta]
+                for nome in nomes:
+                    for texto in _textos(campos.get(nome)):
+                        valor = normalizados.get(texto)
+                        if valor is None:
+                            valor = normalizados[texto] = normalizar(texto)
+                        if valor:
+                            posicoes[faceta].setdefault(valor, []).append(posicao)
+                            rotulos.setdefault(valor, str(texto).strip())
+
+        total = len(self.chaves)
+        # faceta -> {valor normalizado: bitset}
+        self.bitsets = {
+            faceta: {valor: _bitset(lista, total) for valor, lista in valores.items()}
+            for faceta, valores in posicoes.items()
+        }
+        self.todos = (1 << total) - 1
+
+    def _faceta(self, faceta, escolhidos):
+        bitsets = self.bitsets[faceta]
+        bitset = 0
+        for valor in escolhidos:
+            bitset |= bitsets.get(valor, 0)
+        return bitset
+
+    def filtrar(self, filtros, exceto=None):
+        """Bitset dos documentos que atendem a `filtros` (menos a faceta `exceto`)."""
+        bitset = self.todos
+        for faceta, escolhidos in filtros.items():
+            if faceta != exceto:
+                bitset &= self._faceta(faceta, escolhidos)
+        return bitset
+
+    def chaves_de(self, bitset):
+        """Chaves dos documentos de `bitset`, na ordem do catálogo."""
+        # bin() percorre o int uma vez só; isolar bit a bit custaria uma
+        # cópia do int por bit
+        bits = bin(bitset)[:1:-1]
+        return [self.chaves[posicao] for posicao, bit in enumerate(bits) if bit == "1"]
+
+    def contagens(self, filtros):
+        """
+        Total com `filtros` e, para cada faceta, {valor: exercícios} com os
+        filtros das outras facetas, do valor mais frequente ao menos. Valores
+        sem exercícios só aparecem se estiverem escolhidos.
+        """
+        facetas = {}
+        for faceta, bitsets in self.bitsets.items():
+            base = self.filtrar(filtros, exceto=faceta)
+            escolhidos = set(filtros.get(faceta, ()))
+            totais = [
+                (valor, (bitset & base).bit_count())
+                for valor, bitset in bitsets.items()
+            ]
+            totais.sort(key=lambda par: (-par[1], par[0]))
+            rotulos = self.rotulos[faceta]
+            facetas[faceta] = {
+                rotulos[valor]: total
+                for valor, total in totais
+                if total or valor in escolhidos
+            }
+        return {"total": self.filtrar(filtros).bit_count(), "facetas": facetas}
@@ -0,0 +1,241 @@
+"""
+Filtros das listagens da API.
+
+Cada viewset declara um `filtro_form`: um Form do Django cujos campos são os
+parâmetros aceitos na query string. O formulário valida os valores (ids
+inteiros, datas, booleanos) e cada campo preenchido vira um filtro no SQL,
+aplicado sobre o queryset já restrito ao que o usuário pode ver. Parâmetros
+inválidos respondem 400 com os erros de cada campo.
+
+Por padrão o campo `x` filtra `lookups["x"]` (ou o próprio nome); um método
+`filtrar_<campo>(queryset, valor)` substitui o filtro quando ele não é um
+lookup simples.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django import forms
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from treinos.models import ItemTreino
+from .busca import LIMITE_MAXIMO
+from .catalogo import catalogo_atual
+from .facetas import valores
+
+
+class FiltroForm(forms.Form):
+    """Base dos filtros: cada campo preenchido vira um `filter()`."""
+
+    # nome do campo -> lookup no queryset
+    lookups = {}
+
+    def filtrar(self, queryset):
+        for nome, valor in self.cleaned_data.items():
+            if valor is None or valor == "":
+                continue
+            filtrar_campo = getattr(self, f"filtrar_{nome}", None)
+            if filtrar_campo:
+                queryset = filtrar_campo(queryset, valor)
+            else:
+                queryset = queryset.filter(**{self.lookups.get(nome, nome): valor})
+        return queryset
+
+
+def aplicar_filtro(form_class, request, queryset):
+    """Valida a query string com `form_class` e filtra o queryset (400 se inválida)."""
+    form = form_class(request.query_params)
+    if not form.is_valid():
+        raise ValidationError(form.errors)
+    return form.filtrar(queryset)
+
+
+class FiltroFormularioBackend(BaseFilterBackend):
+    """Aplica o `filtro_form` do viewset às listagens."""
+
+    def filter_queryset(self, request, queryset, view):
+        form_class = getattr(view, "filtro_form", None)
+        if form_class is None or getattr(view, "action", None) != "list":
+            return queryset
+        return aplicar_filtro(form_class, request, queryset)
+
+
+def _id():
+    return forms.IntegerField(required=False, min_value=1)
+
+
+# Valores aceitos nos filtros booleanos; qualquer outro responde 400
+BOOLEANOS = {
+    "true": True,
+    "True": True,
+    "1": True,
+    "false": False,
+    "False": False,
+    "0": False,
+}
+
+
+def _booleano():
+    # NullBooleanField trocaria um valor desconhecido por None, e o filtro
+    # seria ignorado em silêncio
+    return forms.TypedChoiceField(
+        required=False,
+        choices=[(valor, valor) for valor in BOOLEANOS],
+        coerce=BOOLEANOS.get,
+        empty_value=None,
+    )
+
+
+class LimiteDoDiaField(forms.DateField):
+    """
+    Data AAAA-MM-DD convertida na meia-noite local do dia (ou do dia seguinte,
+    para o limite final), para que o filtro compare a coluna datetime direto
+    e use o índice, em vez de aplicar DATE() em cada linha.
+    """
+
+    def __init__(self, dia_seguinte=False, **kwargs):
+        self.dia_seguinte = dia_seguinte
+        kwargs.setdefault("required", False)
+        kwargs.setdefault("input_formats", ["%Y-%m-%d"])
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        dia = super().to_python(value)
+        if dia is None:
+            return None
+        if self.dia_seguinte:
+            dia += timedelta(days=1)
+        return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _de():
+    return LimiteDoDiaField()
+
+
+def _ate():
+    return LimiteDoDiaField(dia_seguinte=True)
+
+
+class FiltroAcademiaForm(FiltroForm):
+    criado_de = _de()
+    criado_ate = _ate()
+
+    lookups = {
+        "criado_de": "data_criacao__gte",
+        "criado_ate": "data_criacao__lt",
+    }
+
+
+class FiltroPersonalForm(FiltroForm):
+    academia = _id()
+    cadastrado_de = _de()
+    cadastrado_ate = _ate()
+
+    lookups = {
+        "academia": "user__academia_id",
+        "cadastrado_de": "user__date_joined__gte",
+        "cadastrado_ate": "user__date_joined__lt",
+    }
+
+
+class FiltroAlunoForm(FiltroForm):
+    personal = _id()
+    academia = _id()
+    cadastrado_de = _de()
+    cadastrado_ate = _ate()
+
+    lookups = {
+        "personal": "personal_responsavel_id",
+        "academia": "academia_id",
+        "cadastrado_de": "user__date_joined__gte",
+        "cadastrado_ate": "user__date_joined__lt",
+    }
+
+
+class FiltroTreinoForm(FiltroForm):
+    aluno = _id()
+    personal = _id()
+    academia = _id()
+    ativo = _booleano()
+    categoria = forms.CharField(required=False, max_length=50)
+    criado_de = _de()
+    criado_ate = _ate()
+
+    lookups = {
+        "aluno": "aluno_id",
+        "personal": "personal_criador_id",
+        "academia": "aluno__academia_id",
+        "criado_de": "data_criacao__gte",
+        "criado_ate": "data_criacao__lt",
+    }
+
+    def filtrar_categoria(self, queryset, valor):
+        # Subconsulta em vez de JOIN: um treino com vários itens da categoria
+        # não aparece repetido
+        itens = ItemTreino.objects.filter(exercicio__category__iexact=valor)
+        return queryset.filter(pk__in=itens.values("treino_id"))
+
+
+def _filtrar_faceta(faceta):
+    # Músculos são listas JSON e category__iexact não usa o índice: as
+    # facetas filtram pelos bitsets do catálogo (ver core/facetas.py)
+    def filtrar(self, queryset, valor):
+        ids = catalogo_atual().filtrar({faceta: valores(valor)})
+        return queryset.filter(pk__in=ids)
+
+    return filtrar
+
+
+class FiltroExercicioForm(FiltroForm):
+    categoria = forms.CharField(required=False, max_length=50)
+    musculo = forms.CharField(required=False, max_length=200)
+    equipamento = forms.CharField(required=False, max_length=200)
+    nivel = forms.CharField(required=False, max_length=200)
+    forca = forms.CharField(required=False, max_length=200)
+    mecanica = forms.CharField(required=False, max_length=200)
+    q = forms.CharField(required=False, max_length=200)
+
+    filtrar_categoria = _filtrar_faceta("categoria")
+    filtrar_musculo = _filtrar_faceta("musculo")
+    filtrar_equipamento = _filtrar_faceta("equipamento")
+    filtrar_nivel = _filtrar_faceta("nivel")
+    filtrar_forca = _filtrar_faceta("forca")
+    filtrar_mecanica = _filtrar_faceta("mecanica")
+
+    def filtrar_q(self, queryset, valor):
+        # Mesmo índice da listagem em memória (que também ordena por relevância)
+        return queryset.filter(pk__in=catalogo_atual().buscar(valor))
+
+
+def _limite():
+    return forms.IntegerField(
+        required=False, min_value=1, max_value=LIMITE_MAXIMO, initial=10
+    )
+
+
+class AutocompletarForm(forms.Form):
+    """Parâmetros do autocompletar de exercícios (não é um filtro de listagem)."""
+
+    q = forms.CharField(required=False, max_length=100, strip=False)
+    limite = _limite()
+
+
+class SimilaresForm(forms.Form):
+    """Parâmetros dos exercícios parecidos; as facetas são lidas à parte."""
+
+    limite = _limite()
+
+
+class FiltroSessaoForm(FiltroForm):
+    aluno = _id()
+    treino = _id()
+    inicio_de = _de()
+    inicio_ate = _ate()
+
+    lookups = {
+        "aluno": "aluno_id",
+        "treino": "treino_id",
+        "inicio_de": "inicio__gte",
+        "inicio_ate": "inicio__lt",
+    }
@@ -0,0 +1,319 @@
+"""
+Importação de alunos em lote, a partir de um arquivo CSV ou JSON.
+
+O arquivo inteiro é validado antes de qualquer gravação: cada linha passa pelo
+`LinhaAlunoForm`, e e-mails repetidos, e-mails já cadastrados, personais e
+academias são conferidos com uma consulta para o arquivo todo, não por linha.
+Se alguma linha tiver erro nada é gravado e os erros voltam com o número da
+linha.
+
+O hash das senhas (PBKDF2, a parte cara de criar um usuário) roda em um pool
+de processos iniciados com spawn (um fork do processo do servidor levaria
+junto as conexões com o banco, os sockets e as travas que outras threads
+estivessem segurando). Nas importações da API o pool tem tamanho fixo
+(IMPORTACAO_PROCESSOS) e é reutilizado, para que importações simultâneas não
+multipliquem os processos. Usuários e perfis de Aluno são gravados com
+bulk_create em uma transação, sem os signals de post_save: o perfil que
+academias/signals.py criaria é gravado aqui junto com o usuário, e os escopos
+de cache que core/signals.py invalidaria são invalidados uma vez no fim.
+Alunos novos não têm treinos, então não há resumos diários a recalcular.
+
+Usado pela ação `importar` de AlunoViewSet e pelo comando `importar_alunos`.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+
+from academias.models import Academia, Aluno, PersonalTrainer
+from .cache_relatorios import (
+    ESCOPO_GLOBAL,
+    escopo_academia,
+    escopo_personal,
+    invalidar_escopos,
+)
+
+User = get_user_model()
+
+LIMITE_LINHAS = 5000
+# Abaixo disso, subir os processos custa mais que fazer o hash aqui mesmo
+MINIMO_PARA_POOL = 50
+TAMANHO_LOTE = 500
+
+
+class ImportacaoInvalida(Exception):
+    """Arquivo ou linhas inválidos; `erros` é o corpo da resposta 400."""
+
+    def __init__(self, erros):
+        super().__init__(erros)
+        self.erros = erros
+
+
+class LinhaAlunoForm(forms.Form):
+    """Uma linha do arquivo, com os campos de AlunoCreateUpdateSerializer."""
+
+    email = forms.EmailField(max_length=254)
+    password = forms.CharField(required=False, strip=False)
+    first_name = forms.CharField(max_length=150, required=False)
+    last_name = forms.CharField(max_length=150, required=False)
+    data_nascimento = forms.DateField(required=False)
+    objetivo = forms.CharField(max_length=255, required=False)
+    personal_responsavel = forms.IntegerField(min_value=1, required=False)
+    academia = forms.IntegerField(min_value=1, required=False)
+
+
+def ler_arquivo(conteudo, formato):
+    """Lista de dicts de um arquivo "csv" ou "json" (bytes ou texto)."""
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ImportacaoInvalida({"arquivo": ["O arquivo deve estar em UTF-8."]})
+
+    if formato == "csv":
+        return list(csv.DictReader(io.StringIO(conteudo)))
+    if formato == "json":
+        try:
+            linhas = json.loads(conteudo)
+        except ValueError:
+            raise ImportacaoInvalida({"arquivo": ["JSON inválido."]})
+        if isinstance(linhas, dict):
+            linhas = linhas.get("alunos")
+        return linhas
+    raise ImportacaoInvalida(
+        {"arquivo": [f"Formato inválido: {formato}. Use csv ou json."]}
+    )
+
+
+def restricoes_do_usuario(user):
+    """Valores que o usuário não pode escolher nas linhas que importa."""
+    if user.user_type == "PERSONAL":
+        return {"personal_responsavel": user.pk, "academia": user.academia_id}
+    if user.user_type == "ADMIN":
+        return {"academia": user.academia_id}
+    return {}
+
+
+def validar_linhas(linhas, padroes=None, fixos=None):
+    """
+    Valida todas as linhas e devolve os cleaned_data, na ordem do arquivo.
+
+    `padroes` preenche campos vazios (ex.: a academia do comando) e `fixos`
+    são obrigatórios: uma linha com outro valor é rejeitada. Levanta
+    ImportacaoInvalida com os erros de todas as linhas de uma vez.
+    """
+    if not isinstance(linhas, list) or not all(
+        isinstance(linha, dict) for linha in linhas
+    ):
+        raise ImportacaoInvalida(
+            {"arquivo": ["Envie uma lista de alunos (objetos com os campos)."]}
+        )
+    if not linhas:
+        raise ImportacaoInvalida({"arquivo": ["Nenhum aluno no arquivo."]})
+    if len(linhas) > LIMITE_LINHAS:
+        raise ImportacaoInvalida(
+            {"arquivo": [f"No máximo {LIMITE_LINHAS} alunos por importação."]}
+        )
+
+    padroes = {**(padroes or {}), **(fixos or {})}
+    fixos = {campo: valor for campo, valor in (fixos or {}).items() if valor}
+
+    validas = []
+    erros = {}
+    for numero, linha in enumerate(linhas, start=1):
+        dados = {
+            campo: valor for campo, valor in linha.items() if valor not in ("", None)
+        }
+        for campo, valor in padroes.items():
+            dados.setdefault(campo, valor)
+
+        form = LinhaAlunoForm(dados)
+        if not form.is_valid():
+            erros[numero] = form.errors.get_json_data()
+            continue
+
+        dados = form.cleaned_data
+        dados["email"] = User.objects.normalize_email(dados["email"])
+        for campo, valor in fixos.items():
+            if dados[campo] != valor:
+                _erro(erros, numero, campo, "Valor não permitido para o seu usuário.")
+        validas.append((numero, dados))
+
+    _conferir_no_banco(validas, erros, fixos.get("academia"))
+    if erros:
+        raise ImportacaoInvalida(
+            {"linhas": [{"linha": n, "erros": e} for n, e in sorted(erros.items())]}
+        )
+    return [dados for _, dados in validas]
+
+
+def _erro(erros, numero, campo, mensagem, codigo="invalid"):
+    # Mesmo formato de Form.errors.get_json_data()
+    erros.setdefault(numero, {}).setdefault(campo, []).append(
+        {"message": mensagem, "code": codigo}
+    )
+
+
+def _conferir_no_banco(validas, erros, academia_fixa):
+    """Unicidade e chaves estrangeiras, com uma consulta por tipo de conferência."""
+    emails = [dados["email"] for _, dados in validas]
+    existentes = set()
+    usuarios = User.objects.filter(Q(email__in=emails) | Q(username__in=emails))
+    for email, username in usuarios.values_list("email", "username"):
+        existentes.update((email, username))
+
+    ids = {dados["personal_responsavel"] for _, dados in validas}
+    personais = dict(
+        PersonalTrainer.objects.filter(pk__in=ids).values_list(
+            "pk", "user__academia_id"
+        )
+    )
+    ids = {dados["academia"] for _, dados in validas}
+    academias = set(Academia.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+    primeira_linha = {}
+    for numero, dados in validas:
+        email = dados["email"]
+        if email in primeira_linha:
+            mensagem = f"Repetido na linha {primeira_linha[email]}."
+            _erro(erros, numero, "email", mensagem, "unique")
+        elif email in existentes:
+            mensagem = "Já existe um usuário com este e-mail."
+            _erro(erros, numero, "email", mensagem, "unique")
+        primeira_linha.setdefault(email, numero)
+
+        personal_id = dados["personal_responsavel"]
+        if personal_id and personal_id not in personais:
+            mensagem = "Personal não encontrado."
+            _erro(erros, numero, "personal_responsavel", mensagem, "invalid_choice")
+        elif personal_id and academia_fixa and personais[personal_id] != academia_fixa:
+            mensagem = "Personal de outra academia."
+            _erro(erros, numero, "personal_responsavel", mensagem, "invalid_choice")
+
+        if dados["academia"] and dados["academia"] not in academias:
+            mensagem = "Academia não encontrada."
+            _erro(erros, numero, "academia", mensagem, "invalid_choice")
+
+
+# Pool das importações pela API, criado na primeira e reutilizado
+_pool = None
+_trava_pool = threading.Lock()
+
+
+def _novo_pool(processos):
+    # Os processos novos carregam as configurações antes da primeira tarefa.
+    # O initializer é o próprio django.setup: uma função deste módulo seria
+    # recebida importando-o, e com ele os models, antes do setup
+    return ProcessPoolExecutor(
+        processos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+
+
+def _pool_compartilhado():
+    global _pool
+    with _trava_pool:
+        if _pool is None:
+            _pool = _novo_pool(settings.IMPORTACAO_PROCESSOS)
+        return _pool
+
+
+def hashear_senhas(senhas, processos=None):
+    """
+    make_password() de cada senha, em paralelo. Senha vazia gera uma senha
+    inutilizável, como create_user(password=None).
+
+    Sem `processos` (as importações pela API), usa o pool compartilhado de
+    IMPORTACAO_PROCESSOS processos: importações ao mesmo tempo dividem os
+    mesmos processos em vez de cada uma subir um pool. Com `processos` (o
+    comando importar_alunos), sobe um pool só para esta chamada.
+
+    Os processos do pool leem as configurações do zero: um PASSWORD_HASHERS
+    trocado em tempo de execução (override_settings) não chega até eles.
+    """
+    global _pool
+    senhas = [senha or None for senha in senhas]
+    tamanho = processos or settings.IMPORTACAO_PROCESSOS
+    if tamanho <= 1 or len(senhas) < MINIMO_PARA_POOL:
+        return [make_password(senha) for senha in senhas]
+
+    lote = max(1, len(senhas) // (tamanho * 4))
+    if processos:
+        with _novo_pool(processos) as pool:
+            return list(pool.map(make_password, senhas, chunksize=lote))
+
+    pool = _pool_compartilhado()
+    try:
+        return list(pool.map(make_password, senhas, chunksize=lote))
+    except BrokenProcessPool:
+        # Um processo morreu: a próxima importação sobe outro pool
+        with _trava_pool:
+            if _pool is pool:
+                _pool = None
+        raise
+
+
+def gravar_alunos(linhas, senhas):
+    """
+    Grava os usuários e os perfis de Aluno das linhas já validadas, sem
+    signals, e invalida os escopos de cache afetados. Devolve os ids.
+    """
+    with transaction.atomic():
+        usuarios = User.objects.bulk_create(
+            (
+                User(
+                    username=dados["email"],
+                    email=dados["email"],
+                    password=senha,
+                    first_name=dados["first_name"],
+                    last_name=dados["last_name"],
+                    user_type=User.TipoUsuario.ALUNO,
+                )
+                for dados, senha in zip(linhas, senhas)
+            ),
+            batch_size=TAMANHO_LOTE,
+        )
+        Aluno.objects.bulk_create(
+            (
+                Aluno(
+                    user=user,
+                    personal_responsavel_id=dados["personal_responsavel"],
+                    academia_id=dados["academia"],
+                    data_nascimento=dados["data_nascimento"],
+                    objetivo=dados["objetivo"] or None,
+                )
+                for user, dados in zip(usuarios, linhas)
+            ),
+            batch_size=TAMANHO_LOTE,
+        )
+
+    escopos = {ESCOPO_GLOBAL}
+    for dados in linhas:
+        if dados["personal_responsavel"]:
+            escopos.add(escopo_personal(dados["personal_responsavel"]))
+        if dados["academia"]:
+            escopos.add(escopo_academia(dados["academia"]))
+    invalidar_escopos(escopos)
+
+    return [user.pk for user in usuarios]
+
+
+def importar_alunos(linhas, padroes=None, fixos=None, processos=None):
+    """Valida, faz o hash das senhas e grava. Devolve os ids dos alunos."""
+    validas = validar_linhas(linhas, padroes, fixos)
+    senhas = hashear_senhas([dados["password"] for dados in validas], processos)
+    return gravar_alunos(validas, senhas)
@@ -0,0 +1,198 @@
+"""
+Leitura rápida das listagens grandes da API.
+
+Um `LeitorRapido` é compilado a partir de um serializer de leitura: cada campo
+vira um caminho de values() e uma conversão, tirada do próprio field do
+serializer (datas no mesmo formato ISO, por exemplo) ou, para os
+SerializerMethodField, declarada em `calculados`. A listagem então lê tuplas
+do banco e monta dicts direto, sem instanciar modelos nem percorrer os fields
+do DRF em cada linha, e o JSON gerado é idêntico ao do serializer.
+
+O comando `benchmark_leitura` compara os dois caminhos e confere a
+igualdade byte a byte.
+"""
+
+from functools import cached_property
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .serializers import (
+    AlunoListSerializer,
+    ExercicioListSerializer,
+    TreinoListSerializer,
+    calcular_idade,
+    nomes_do_parametro,
+)
+
+# Fields cujo to_representation devolve o próprio valor lido pelo values()
+_SEM_CONVERSAO = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.ModelField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+
+
+def nome_completo(first_name, last_name):
+    """O mesmo que User.get_full_name(), a partir das colunas."""
+    return f"{first_name} {last_name}".strip()
+
+
+def nome_do_personal(personal_id, first_name, last_name):
+    """Nome do personal criador do treino, ou None se não houver."""
+    if personal_id is None:
+        return None
+    return nome_completo(first_name, last_name)
+
+
+class LeitorRapido:
+    """
+    Monta as linhas de `serializer_class` a partir de values().
+
+    `calculados` declara os campos que não são colunas do modelo:
+    nome -> (caminhos do values(), função que recebe os valores), ou None no
+    lugar da função para devolver o valor do único caminho.
+    """
+
+    def __init__(self, serializer_class, calculados=None):
+        self.serializer_class = serializer_class
+        self.calculados = calculados or {}
+
+    @cached_property
+    def colunas(self):
+        """[(nome, caminhos, conversão ou leitor aninhado)] na ordem do serializer."""
+        return self._compilar(self.serializer_class(), "")
+
+    def _compilar(self, serializer, prefixo):
+        colunas = []
+        for nome, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if nome in self.calculados and not prefixo:
+                caminhos, funcao = self.calculados[nome]
+                colunas.append((nome, caminhos, funcao))
+            elif isinstance(field, serializers.Serializer):
+                origem = f"{prefixo}{(field.source or nome).replace('.', '__')}__"
+                pk = field.Meta.model._meta.pk.attname
+                aninhadas = self._compilar(field, origem)
+                colunas.append((nome, (origem + pk,), aninhadas))
+            elif isinstance(field, serializers.SerializerMethodField):
+                raise ValueError(
+                    f"{self.serializer_class.__name__}.{nome} precisa de uma "
+                    "entrada em `calculados`"
+                )
+            else:
+                caminho = prefixo + (field.source or nome).replace(".", "__")
+                conversao = (
+                    None
+                    if isinstance(field, _SEM_CONVERSAO)
+                    else field.to_representation
+                )
+                colunas.append((nome, (caminho,), conversao))
+        return colunas
+
+    def _selecionar(self, campos):
+        if campos is None:
+            return self.colunas
+        return [coluna for coluna in self.colunas if coluna[0] in campos]
+
+    def caminhos(self, campos=None, extras=()):
+        """Caminhos do values() para os `campos` pedidos (None = todos)."""
+        encontrados = dict.fromkeys(extras)
+
+        def juntar(colunas):
+            for _, caminhos, conversao in colunas:
+                encontrados.update(dict.fromkeys(caminhos))
+                if isinstance(conversao, list):
+                    juntar(conversao)
+
+        juntar(self._selecionar(campos))
+        return list(encontrados)
+
+    def montar(self, linhas, campos=None):
+        """Converte os dicts do values() nas linhas do serializer."""
+        colunas = self._selecionar(campos)
+        return [_montar_linha(linha, colunas) for linha in linhas]
+
+
+def _montar_linha(linha, colunas):
+    resultado = {}
+    for nome, caminhos, conversao in colunas:
+        if isinstance(conversao, list):
+            # Registro aninhado: None quando a chave estrangeira é nula
+            resultado[nome] = (
+                None if linha[caminhos[0]] is None else _montar_linha(linha, conversao)
+            )
+        elif len(caminhos) > 1:
+            resultado[nome] = conversao(*(linha[caminho] for caminho in caminhos))
+        else:
+            valor = linha[caminhos[0]]
+            if conversao is not None and valor is not None:
+                valor = conversao(valor)
+            resultado[nome] = valor
+    return resultado
+
+
+class LeituraRapidaMixin:
+    """
+    Mixin para viewsets cuja listagem usa o `leitor_rapido` em vez do
+    serializer. Com ?expand= a listagem volta ao serializer, que sabe
+    recolher os aninhados em ids.
+    """
+
+    leitor_rapido = None
+
+    def list(self, request, *args, **kwargs):
+        leitor = self.leitor_rapido
+        if leitor is None or "expand" in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        campos = nomes_do_parametro(request, "fields")
+        # A posição do cursor é lida da linha, então o campo da ordem vai junto
+        ordenacao = getattr(self, "ordenacao_cursor", ())
+        extras = [campo.lstrip("-") for campo in ordenacao[:1]]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        linhas = queryset.values(*leitor.caminhos(campos, extras))
+
+        pagina = self.paginate_queryset(linhas)
+        if pagina is not None:
+            return self.get_paginated_response(leitor.montar(pagina, campos))
+        return Response(leitor.montar(linhas, campos))
+
+
+LEITOR_EXERCICIOS = LeitorRapido(ExercicioListSerializer)
+
+LEITOR_TREINOS = LeitorRapido(
+    TreinoListSerializer,
+    calculados={
+        "aluno_nome": (
+            ("aluno__user__first_name", "aluno__user__last_name"),
+            nome_completo,
+        ),
+        "personal_nome": (
+            (
+                "personal_criador_id",
+                "personal_criador__user__first_name",
+                "personal_criador__user__last_name",
+            ),
+            nome_do_personal,
+        ),
+        "total_exercicios": (("total_exercicios",), None),
+    },
+)
+
+LEITOR_ALUNOS = LeitorRapido(
+    AlunoListSerializer,
+    calculados={
+        "nome": (("user__first_name", "user__last_name"), nome_completo),
+        "email": (("user__email",), None),
+        "academia_nome": (("academia__nome_fantasia",), None),
+        "total_treinos": (("total_treinos",), None),
+        "idade": (("data_nascimento",), calcular_idade),
+    },
+)
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from academias.models import Aluno
+from core.leitura_rapida import LEITOR_ALUNOS, LEITOR_EXERCICIOS, LEITOR_TREINOS
+from core.serializers import (
+    AlunoListSerializer,
+    ExercicioListSerializer,
+    TreinoListSerializer,
+)
+from treinos.models import Exercicio, Treino
+
+LISTAGENS = {
+    "exercicios": (Exercicio, ExercicioListSerializer, LEITOR_EXERCICIOS),
+    "treinos": (Treino, TreinoListSerializer, LEITOR_TREINOS),
+    "alunos": (Aluno, AlunoListSerializer, LEITOR_ALUNOS),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o serializer e o leitor rápido das listagens da API: tempo por "
+        "1.000 linhas (consulta + montagem + JSON) e igualdade do JSON gerado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--linhas",
+            type=int,
+            default=1000,
+            help="Linhas lidas de cada listagem (padrão: 1000)",
+        )
+        parser.add_argument(
+            "--repeticoes",
+            type=int,
+            default=5,
+            help="Execuções de cada caminho; vale a mais rápida (padrão: 5)",
+        )
+        parser.add_argument(
+            "--listagem",
+            choices=sorted(LISTAGENS),
+            action="append",
+            help="Mede só esta listagem (pode repetir)",
+        )
+
+    def handle(self, *args, **options):
+        renderizar = JSONRenderer().render
+
+        for nome in options["listagem"] or LISTAGENS:
+            modelo, serializer_class, leitor = LISTAGENS[nome]
+            queryset = modelo.objects.all()
+            preparar = getattr(serializer_class, "preparar_queryset", None)
+            if preparar:
+                queryset = preparar(queryset)
+            queryset = queryset.order_by("pk")[: options["linhas"]]
+
+            def serializer():
+                return renderizar(serializer_class(queryset.all(), many=True).data)
+
+            def rapido():
+                return renderizar(leitor.montar(queryset.values(*leitor.caminhos())))
+
+            json_serializer = serializer()
+            if json_serializer != rapido():
+                raise CommandError(f"{nome}: o leitor rápido gerou um JSON diferente")
+
+            total = queryset.count()
+            if not total:
+                self.stdout.write(self.style.WARNING(f"{nome}: nenhuma linha"))
+                continue
+
+            tempo_serializer = self._medir(serializer, options["repeticoes"])
+            tempo_rapido = self._medir(rapido, options["repeticoes"])
+
+            ms_serializer = tempo_serializer / total * 1_000_000
+            ms_rapido = tempo_rapido / total * 1_000_000
+            self.stdout.write(
+                f"{nome}: {total} linhas, JSON idêntico ({len(json_serializer)} bytes)\n"
+                f"  serializer:    {ms_serializer:8.1f} ms / 1.000 linhas "
+                f"({total / tempo_serializer:,.0f} linhas/s)\n"
+                f"  leitor rápido: {ms_rapido:8.1f} ms / 1.000 linhas "
+                f"({total / tempo_rapido:,.0f} linhas/s)\n"
+                f"  {tempo_serializer / tempo_rapido:.1f}x mais rápido"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark concluído."))
+
+    @staticmethod
+    def _medir(funcao, repeticoes):
+        melhor = None
+        for _ in range(max(repeticoes, 1)):
+            inicio = time.perf_counter()
+            funcao()
+            duracao = time.perf_counter() - inicio
+            melhor = duracao if melhor is None else min(melhor, duracao)
+        return melhor
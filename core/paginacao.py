@@ -0,0 +1,37 @@
+"""
+Paginação por cursor (keyset) das listagens da API.
+
+Cada página é buscada com um filtro na posição do último registro da página
+anterior (ex.: data_criacao < X) em vez de OFFSET, então a página 1000 custa o
+mesmo que a primeira e nenhuma resposta carrega mais que `max_page_size`
+linhas. Não há COUNT(*) da listagem inteira.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacaoCursor(CursorPagination):
+    """
+    Cursor ordenado pela `ordenacao_cursor` do viewset, por exemplo
+    ("-data_criacao", "-id"). O primeiro campo é a posição do cursor e pode
+    atravessar relações (ex.: "-user__date_joined"); o id desempata.
+
+    O tamanho da página vem de PAGE_SIZE e pode ser pedido com ?page_size=.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-id",)
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, "ordenacao_cursor", self.ordering))
+
+    def _get_position_from_instance(self, instance, ordering):
+        campo = ordering[0].lstrip("-")
+        if isinstance(instance, dict):
+            # Linhas de values(): a chave é o caminho inteiro
+            return str(instance[campo])
+        valor = instance
+        for parte in campo.split("__"):
+            valor = getattr(valor, parte)
+        return str(valor)
@@ -1,11 +1,114 @@
+from datetime import date
+
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.contrib.auth import get_user_model
 from academias.models import Academia, PersonalTrainer, Aluno
-from treinos.models import Exercicio, Treino, ItemTreino
+from treinos.models import (
+    Exercicio,
+    ItemModeloTreino,
+    ItemTreino,
+    ModeloTreino,
+    SessaoTreino,
+    Treino,
+)
+from treinos.historico_carga import registrar_cargas_da_ficha
+from treinos.itens import sincronizar_itens, sincronizar_itens_modelo
+from treinos.sessoes import itens_do_treino, registrar_series
+from .agregacoes import contagem_relacionada
 
 User = get_user_model()
 
 
+def nomes_do_parametro(request, nome):
+    """Nomes separados por vírgula em ?nome=; None se o parâmetro não veio."""
+    if request is None or nome not in request.query_params:
+        return None
+    return {
+        parte.strip()
+        for parte in request.query_params[nome].split(",")
+        if parte.strip()
+    }
+
+
+def _pedido(nome, nomes):
+    """Se o campo entra na resposta; `nomes` None quer dizer todos."""
+    return nomes is None or nome in nomes
+
+
+def _completo(nome, campos, expandidos):
+    """Se o campo aninhado entra na resposta por completo (não só o id)."""
+    return _pedido(nome, campos) and _pedido(nome, expandidos)
+
+
+class CamposDinamicosMixin:
+    """
+    Campos sob demanda nos serializers de leitura:
+
+    * ``?fields=a,b`` renderiza só os campos pedidos;
+    * ``?expand=x,y`` renderiza completos só os campos de `campos_aninhados`
+      pedidos; os outros voltam como id (ou lista de ids).
+
+    Sem os parâmetros a resposta é a completa; nomes que o serializer não
+    tem são ignorados nos dois parâmetros. Vale só para leituras e só
+    para o serializer raiz da resposta. O `preparar_queryset(queryset, campos, expandidos)` de cada
+    serializer recebe a mesma seleção (ver `selecao`) e só carrega, anota e
+    pré-busca o que vai ser renderizado. Sem a anotação, cada contagem cai
+    para um COUNT por objeto.
+    """
+
+    campos_aninhados = ()
+
+    @classmethod
+    def selecao(cls, request):
+        """
+        Retorna (campos renderizados, aninhados renderizados por completo);
+        None em qualquer posição quer dizer todos.
+        """
+        campos = nomes_do_parametro(request, "fields")
+        expandidos = nomes_do_parametro(request, "expand")
+        if expandidos is not None:
+            expandidos &= set(cls.campos_aninhados)
+            if campos is not None:
+                expandidos &= campos
+        return campos, expandidos
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        if not self._e_raiz():
+            return fields
+
+        campos, expandidos = self.selecao(request)
+        if campos is not None:
+            fields = {nome: campo for nome, campo in fields.items() if nome in campos}
+        if expandidos is not None:
+            for nome in self.campos_aninhados:
+                if nome in fields and nome not in expandidos:
+                    fields[nome] = self._campo_de_id(nome, fields[nome])
+        return fields
+
+    def _e_raiz(self):
+        pai = self.parent
+        if isinstance(pai, serializers.ListSerializer):
+            pai = pai.parent
+        return pai is None
+
+    @staticmethod
+    def _campo_de_id(nome, campo):
+        # O id vem da própria linha (ou da pré-busca, se for uma lista)
+        kwargs = {"source": campo.source} if campo.source not in (None, nome) else {}
+        return serializers.PrimaryKeyRelatedField(
+            many=isinstance(campo, serializers.ListSerializer),
+            read_only=True,
+            **kwargs,
+        )
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer para o modelo de usuário"""
 
@@ -37,7 +140,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
         return obj.get_full_name()
 
 
-class AcademiaSerializer(serializers.ModelSerializer):
+class AcademiaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Academia"""
 
     total_alunos = serializers.SerializerMethodField()
@@ -57,14 +160,33 @@ class AcademiaSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "data_criacao"]
 
+    @staticmethod
+    def preparar_queryset(queryset, campos=None, expandidos=None):
+        """Anota as contagens lidas pelo serializer, em uma única query"""
+        if _pedido("total_alunos", campos):
+            queryset = queryset.annotate(
+                total_alunos=contagem_relacionada(Aluno.objects.all(), "academia")
+            )
+        if _pedido("total_personais", campos):
+            queryset = queryset.annotate(
+                total_personais=contagem_relacionada(
+                    User.objects.filter(user_type="PERSONAL"), "academia"
+                )
+            )
+        return queryset
+
     def get_total_alunos(self, obj):
+        if hasattr(obj, "total_alunos"):
+            return obj.total_alunos
         return obj.alunos.count()
 
     def get_total_personais(self, obj):
+        if hasattr(obj, "total_personais"):
+            return obj.total_personais
         return User.objects.filter(academia=obj, user_type="PERSONAL").count()
 
 
-class PersonalTrainerSerializer(serializers.ModelSerializer):
+class PersonalTrainerSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo PersonalTrainer"""
 
     id = serializers.IntegerField(source="user.id", read_only=True)
@@ -87,16 +209,40 @@ class PersonalTrainerSerializer(serializers.ModelSerializer):
             "total_treinos",
         ]
 
+    campos_aninhados = ("user",)
+
     def get_nome(self, obj):
         return obj.user.get_full_name()
 
     def get_email(self, obj):
         return obj.user.email
 
+    @staticmethod
+    def preparar_queryset(queryset, campos=None, expandidos=None):
+        """Carrega o usuário e anota as contagens lidas pelo serializer"""
+        queryset = queryset.select_related("user")
+        if _pedido("total_alunos", campos):
+            queryset = queryset.annotate(
+                total_alunos=contagem_relacionada(
+                    Aluno.objects.all(), "personal_responsavel"
+                )
+            )
+        if _pedido("total_treinos", campos):
+            queryset = queryset.annotate(
+                total_treinos=contagem_relacionada(
+                    Treino.objects.all(), "personal_criador"
+                )
+            )
+        return queryset
+
     def get_total_alunos(self, obj):
+        if hasattr(obj, "total_alunos"):
+            return obj.total_alunos
         return obj.alunos.count()
 
     def get_total_treinos(self, obj):
+        if hasattr(obj, "total_treinos"):
+            return obj.total_treinos
         return obj.treinos_criados.count()
 
 
@@ -170,7 +316,19 @@ class PersonalTrainerCreateUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class AlunoListSerializer(serializers.ModelSerializer):
+def calcular_idade(data_nascimento):
+    """Idade em anos completos na data de hoje, ou None sem a data."""
+    if not data_nascimento:
+        return None
+    today = date.today()
+    return (
+        today.year
+        - data_nascimento.year
+        - ((today.month, today.day) < (data_nascimento.month, data_nascimento.day))
+    )
+
+
+class AlunoListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para listagem de alunos"""
 
     id = serializers.IntegerField(source="user.id", read_only=True)
@@ -197,6 +355,20 @@ class AlunoListSerializer(serializers.ModelSerializer):
             "idade",
         ]
 
+    campos_aninhados = ("user",)
+
+    @staticmethod
+    def preparar_queryset(queryset, campos=None, expandidos=None):
+        """Carrega usuário e academia e anota o total de treinos"""
+        queryset = queryset.select_related("user")
+        if _pedido("academia_nome", campos):
+            queryset = queryset.select_related("academia")
+        if _pedido("total_treinos", campos):
+            queryset = queryset.annotate(
+                total_treinos=contagem_relacionada(Treino.objects.all(), "aluno")
+            )
+        return queryset
+
     def get_nome(self, obj):
         return obj.user.get_full_name()
 
@@ -207,25 +379,15 @@ class AlunoListSerializer(serializers.ModelSerializer):
         return obj.academia.nome_fantasia if obj.academia else None
 
     def get_total_treinos(self, obj):
+        if hasattr(obj, "total_treinos"):
+            return obj.total_treinos
         return obj.treinos.count()
 
     def get_idade(self, obj):
-        if obj.data_nascimento:
-            from datetime import date
-
-            today = date.today()
-            return (
-                today.year
-                - obj.data_nascimento.year
-                - (
-                    (today.month, today.day)
-                    < (obj.data_nascimento.month, obj.data_nascimento.day)
-                )
-            )
-        return None
+        return calcular_idade(obj.data_nascimento)
 
 
-class AlunoDetailSerializer(serializers.ModelSerializer):
+class AlunoDetailSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer detalhado para alunos"""
 
     user = UserDetailSerializer(read_only=True)
@@ -244,7 +406,41 @@ class AlunoDetailSerializer(serializers.ModelSerializer):
             "total_treinos",
         ]
 
+    campos_aninhados = ("user", "personal_responsavel", "academia")
+
+    @staticmethod
+    def preparar_queryset(queryset, campos=None, expandidos=None):
+        """
+        Carrega só os registros aninhados que serão renderizados, já com as
+        contagens que os serializers deles leem, e anota o total de treinos
+        """
+        if _completo("user", campos, expandidos):
+            queryset = queryset.select_related("user")
+        if _completo("personal_responsavel", campos, expandidos):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "personal_responsavel",
+                    PersonalTrainerSerializer.preparar_queryset(
+                        PersonalTrainer.objects.all()
+                    ),
+                )
+            )
+        if _completo("academia", campos, expandidos):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "academia",
+                    AcademiaSerializer.preparar_queryset(Academia.objects.all()),
+                )
+            )
+        if _pedido("total_treinos", campos):
+            queryset = queryset.annotate(
+                total_treinos=contagem_relacionada(Treino.objects.all(), "aluno")
+            )
+        return queryset
+
     def get_total_treinos(self, obj):
+        if hasattr(obj, "total_treinos"):
+            return obj.total_treinos
         return obj.treinos.count()
 
 
@@ -320,7 +516,7 @@ class AlunoCreateUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ExercicioSerializer(serializers.ModelSerializer):
+class ExercicioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Exercicio"""
 
     class Meta:
@@ -341,7 +537,7 @@ class ExercicioSerializer(serializers.ModelSerializer):
         ]
 
 
-class ExercicioListSerializer(serializers.ModelSerializer):
+class ExercicioListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer simplificado para listagem de exercícios"""
 
     class Meta:
@@ -349,20 +545,53 @@ class ExercicioListSerializer(serializers.ModelSerializer):
         fields = ["id", "nome", "category", "equipment", "level", "primary_muscles"]
 
 
+class ItensTreinoListSerializer(serializers.ListSerializer):
+    """
+    Lista de itens na escrita de um treino: carrega os exercícios de todos os
+    itens com uma consulta, em vez de uma por item.
+    """
+
+    def to_internal_value(self, data):
+        ids = set()
+        if isinstance(data, list):
+            for item in data:
+                pk = item.get("exercicio_id") if isinstance(item, dict) else None
+                if isinstance(pk, int) or (isinstance(pk, str) and pk.isdigit()):
+                    ids.add(int(pk))
+        self.exercicios = Exercicio.objects.in_bulk(ids)
+        return super().to_internal_value(data)
+
+
+class ExercicioDoItemField(serializers.PrimaryKeyRelatedField):
+    """Exercício de um item, lido dos já carregados pela lista de itens."""
+
+    def to_internal_value(self, data):
+        carregados = getattr(self.parent.parent, "exercicios", None)
+        try:
+            exercicio = carregados.get(int(data)) if carregados else None
+        except (TypeError, ValueError):
+            exercicio = None
+        if exercicio is not None:
+            return exercicio
+        # Não carregado: a consulta (e a mensagem de erro) do campo normal
+        return super().to_internal_value(data)
+
+
 class ItemTreinoSerializer(serializers.ModelSerializer):
     """Serializer para o modelo ItemTreino"""
 
     exercicio = ExercicioListSerializer(read_only=True)
-    exercicio_id = serializers.PrimaryKeyRelatedField(
+    exercicio_id = ExercicioDoItemField(
         queryset=Exercicio.objects.all(), source="exercicio", write_only=True
     )
 
     class Meta:
         model = ItemTreino
         fields = ["id", "exercicio", "exercicio_id", "series", "repeticoes", "carga_kg"]
+        list_serializer_class = ItensTreinoListSerializer
 
 
-class TreinoListSerializer(serializers.ModelSerializer):
+class TreinoListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para listagem de treinos"""
 
     aluno_nome = serializers.SerializerMethodField()
@@ -383,6 +612,21 @@ class TreinoListSerializer(serializers.ModelSerializer):
             "total_exercicios",
         ]
 
+    @staticmethod
+    def preparar_queryset(queryset, campos=None, expandidos=None):
+        """Carrega aluno e personal e anota o total de exercícios"""
+        if _pedido("aluno_nome", campos):
+            queryset = queryset.select_related("aluno__user")
+        if _pedido("personal_nome", campos):
+            queryset = queryset.select_related("personal_criador__user")
+        if _pedido("total_exercicios", campos):
+            queryset = queryset.annotate(
+                total_exercicios=contagem_relacionada(
+                    ItemTreino.objects.all(), "treino"
+                )
+            )
+        return queryset
+
     def get_aluno_nome(self, obj):
         return obj.aluno.user.get_full_name()
 
@@ -392,10 +636,12 @@ class TreinoListSerializer(serializers.ModelSerializer):
         )
 
     def get_total_exercicios(self, obj):
+        if hasattr(obj, "total_exercicios"):
+            return obj.total_exercicios
         return obj.itens.count()
 
 
-class TreinoDetailSerializer(serializers.ModelSerializer):
+class TreinoDetailSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer detalhado para treinos"""
 
     aluno = AlunoListSerializer(read_only=True)
@@ -414,6 +660,37 @@ class TreinoDetailSerializer(serializers.ModelSerializer):
             "itens",
         ]
 
+    campos_aninhados = ("aluno", "personal_criador", "itens")
+
+    @staticmethod
+    def preparar_queryset(queryset, campos=None, expandidos=None):
+        """
+        Carrega só o aluno, o personal e os itens que serão renderizados, já
+        com as contagens que os serializers deles leem
+        """
+        if _completo("aluno", campos, expandidos):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "aluno", AlunoListSerializer.preparar_queryset(Aluno.objects.all())
+                )
+            )
+        if _completo("personal_criador", campos, expandidos):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "personal_criador",
+                    PersonalTrainerSerializer.preparar_queryset(
+                        PersonalTrainer.objects.all()
+                    ),
+                )
+            )
+        if _completo("itens", campos, expandidos):
+            queryset = queryset.prefetch_related("itens__exercicio")
+        elif _pedido("itens", campos):
+            queryset = queryset.prefetch_related(
+                Prefetch("itens", ItemTreino.objects.only("id", "treino_id"))
+            )
+        return queryset
+
 
 class TreinoCreateSerializer(serializers.ModelSerializer):
     """Serializer para criação de treinos"""
@@ -424,6 +701,25 @@ class TreinoCreateSerializer(serializers.ModelSerializer):
         model = Treino
         fields = ["nome_treino", "aluno", "ativo", "itens"]
 
+    def validate_itens(self, value):
+        # Os itens são casados pelo exercício, que é único no treino
+        exercicios = [item["exercicio"].pk for item in value]
+        repetidos = sorted({pk for pk in exercicios if exercicios.count(pk) > 1})
+        if repetidos:
+            raise serializers.ValidationError(
+                f"Exercícios repetidos no treino: {repetidos}"
+            )
+        return value
+
+    def to_representation(self, instance):
+        # Os itens com os exercícios em uma consulta, não uma por item
+        prefetch_related_objects(
+            [instance],
+            Prefetch("itens", ItemTreino.objects.select_related("exercicio")),
+        )
+        return super().to_representation(instance)
+
+    @transaction.atomic
     def create(self, validated_data):
         itens_data = validated_data.pop("itens")
         request = self.context.get("request")
@@ -436,13 +732,22 @@ class TreinoCreateSerializer(serializers.ModelSerializer):
             except PersonalTrainer.DoesNotExist:
                 pass
 
+        # O save do treino agenda o resumo diário para o commit, quando os
+        # itens já estão no banco, e invalida os escopos de cache
         treino = Treino.objects.create(**validated_data)
 
-        for item_data in itens_data:
-            ItemTreino.objects.create(treino=treino, **item_data)
+        # Um INSERT para todos os itens; bulk_create não dispara os signals
+        # dos itens, então as cargas entram no histórico aqui
+        itens = ItemTreino.objects.bulk_create(
+            ItemTreino(treino=treino, **item_data) for item_data in itens_data
+        )
+        registrar_cargas_da_ficha(
+            (treino.aluno_id, item.exercicio_id, item.carga_kg) for item in itens
+        )
 
         return treino
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         itens_data = validated_data.pop("itens", None)
 
@@ -452,10 +757,230 @@ class TreinoCreateSerializer(serializers.ModelSerializer):
         instance.save()
 
         if itens_data is not None:
-            # Remove os itens antigos e cria os novos
-            instance.itens.all().delete()
-            for item_data in itens_data:
-                ItemTreino.objects.create(treino=instance, **item_data)
+            # Só os itens que mudaram são gravados; os demais mantêm o id
+            sincronizar_itens(instance, itens_data, parcial=self.partial)
+
+        return instance
+
+
+class ItemModeloTreinoSerializer(serializers.ModelSerializer):
+    """Serializer para os itens de um modelo de treino"""
+
+    exercicio = ExercicioListSerializer(read_only=True)
+    exercicio_id = serializers.PrimaryKeyRelatedField(
+        queryset=Exercicio.objects.all(), source="exercicio", write_only=True
+    )
+
+    class Meta:
+        model = ItemModeloTreino
+        fields = [
+            "id",
+            "exercicio",
+            "exercicio_id",
+            "series",
+            "repeticoes",
+            "carga_kg",
+            "observacoes",
+        ]
+
+
+class ModeloTreinoSerializer(serializers.ModelSerializer):
+    """Serializer para os modelos de treino, com os itens"""
+
+    itens = ItemModeloTreinoSerializer(many=True)
+    personal_nome = serializers.CharField(
+        source="personal_criador.user.get_full_name", read_only=True
+    )
+
+    class Meta:
+        model = ModeloTreino
+        fields = [
+            "id",
+            "nome",
+            "descricao",
+            "personal_criador",
+            "personal_nome",
+            "data_criacao",
+            "itens",
+        ]
+        read_only_fields = ["data_criacao"]
+        extra_kwargs = {"personal_criador": {"required": False}}
+
+    @staticmethod
+    def preparar_queryset(queryset):
+        return queryset.select_related("personal_criador__user").prefetch_related(
+            Prefetch(
+                "itens", queryset=ItemModeloTreino.objects.select_related("exercicio")
+            )
+        )
+
+    def validate(self, attrs):
+        request = self.context.get("request")
+        # O personal só cria modelos para si mesmo
+        if request and request.user.user_type == "PERSONAL":
+            try:
+                attrs["personal_criador"] = PersonalTrainer.objects.select_related(
+                    "user"
+                ).get(user=request.user)
+            except PersonalTrainer.DoesNotExist:
+                raise serializers.ValidationError(
+                    {"personal_criador": "Usuário sem perfil de personal."}
+                )
+            return attrs
+
+        personal = attrs.get("personal_criador")
+        if not self.instance and not personal:
+            raise serializers.ValidationError(
+                {"personal_criador": "Informe o personal dono do modelo."}
+            )
+        if (
+            personal
+            and request
+            and request.user.user_type == "ADMIN"
+            and personal.user.academia_id != request.user.academia_id
+        ):
+            raise serializers.ValidationError(
+                {"personal_criador": "Personal de outra academia."}
+            )
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        itens_data = validated_data.pop("itens")
+        modelo = ModeloTreino.objects.create(**validated_data)
+        ItemModeloTreino.objects.bulk_create(
+            ItemModeloTreino(modelo=modelo, **item_data) for item_data in itens_data
+        )
+        return modelo
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        itens_data = validated_data.pop("itens", None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
+
+        if itens_data is not None:
+            # Casados pelo exercício: só os itens que mudaram são gravados
+            sincronizar_itens_modelo(instance, itens_data, parcial=self.partial)
+        return instance
+
+
+class AtribuirModeloSerializer(serializers.Serializer):
+    """Alunos que recebem uma cópia do modelo de treino"""
+
+    alunos = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
+    nome_treino = serializers.CharField(max_length=50, required=False)
+    ativo = serializers.BooleanField(default=True)
+
+    def validate_alunos(self, value):
+        # Uma consulta para a lista toda, em vez de uma por aluno
+        ids = list(dict.fromkeys(value))
+        visiveis = set(
+            self.context["alunos"].filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        invalidos = [aluno_id for aluno_id in ids if aluno_id not in visiveis]
+        if invalidos:
+            raise serializers.ValidationError(
+                f"Alunos não encontrados ou fora do seu acesso: {invalidos}"
+            )
+        return ids
+
+
+class SerieRealizadaSerializer(serializers.Serializer):
+    """Serializer para uma série enviada pelo aplicativo durante a sessão"""
+
+    item = serializers.IntegerField()
+    numero = serializers.IntegerField(min_value=1, max_value=100)
+    repeticoes = serializers.IntegerField(min_value=0)
+    carga_kg = serializers.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=0,
+        required=False,
+        allow_null=True,
+    )
+    realizada_em = serializers.DateTimeField(required=False)
+
+
+def validar_itens_das_series(series, itens):
+    """Garante que todas as séries apontam para itens do treino da sessão"""
+    invalidos = {serie["item"] for serie in series} - itens.keys()
+    if invalidos:
+        raise serializers.ValidationError(
+            f"Itens que não pertencem ao treino: {sorted(invalidos)}"
+        )
+    return series
+
+
+class LoteSeriesSerializer(serializers.Serializer):
+    """Serializer para um lote de séries de uma sessão já iniciada"""
+
+    series = SerieRealizadaSerializer(many=True, allow_empty=False)
+
+    def validate_series(self, value):
+        return validar_itens_das_series(value, self.context["itens"])
+
+
+class SessaoTreinoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Serializer para sessões de treino, com as séries opcionais do início"""
+
+    duracao_minutos = serializers.IntegerField(read_only=True)
+    series = SerieRealizadaSerializer(many=True, write_only=True, required=False)
+
+    class Meta:
+        model = SessaoTreino
+        fields = ["id", "treino", "aluno", "inicio", "fim", "duracao_minutos", "series"]
+        read_only_fields = ["id", "aluno"]
+
+    def validate_treino(self, value):
+        user = self.context["request"].user
+
+        if user.user_type == "ALUNO" and value.aluno_id != user.pk:
+            raise serializers.ValidationError("Treino de outro aluno.")
+        if user.user_type == "PERSONAL" and value.personal_criador_id != user.pk:
+            raise serializers.ValidationError("Treino criado por outro personal.")
+        if user.user_type == "ADMIN" and value.aluno.academia_id != user.academia_id:
+            raise serializers.ValidationError("Treino de outra academia.")
+
+        return value
+
+    def validate(self, attrs):
+        inicio = attrs.get("inicio", getattr(self.instance, "inicio", None))
+        fim = attrs.get("fim", getattr(self.instance, "fim", None))
+        if inicio and fim and fim < inicio:
+            raise serializers.ValidationError(
+                {"fim": "O fim da sessão não pode ser antes do início."}
+            )
+
+        if attrs.get("series"):
+            treino = attrs.get("treino") or self.instance.treino
+            self._itens = itens_do_treino(treino.pk)
+            validar_itens_das_series(attrs["series"], self._itens)
+
+        return attrs
+
+    def create(self, validated_data):
+        series = validated_data.pop("series", [])
+        validated_data["aluno_id"] = validated_data["treino"].aluno_id
+
+        with transaction.atomic():
+            sessao = SessaoTreino.objects.create(**validated_data)
+            if series:
+                registrar_series(sessao, series, self._itens)
+
+        return sessao
+
+    def update(self, instance, validated_data):
+        series = validated_data.pop("series", [])
+        validated_data.pop("treino", None)
+
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if series:
+                registrar_series(instance, series, self._itens)
 
         return instance
 
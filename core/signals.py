@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from academias.models import Academia, Aluno, PersonalTrainer
+from treinos.pendencias import agendar_no_commit
+from treinos.models import Exercicio, ItemTreino, SessaoTreino, Treino
+from .cache_relatorios import (
+    ESCOPO_CATALOGO,
+    ESCOPO_GLOBAL,
+    escopo_academia,
+    escopo_aluno,
+    escopo_personal,
+    escopos_dos_alunos,
+    escopos_dos_treinos,
+    invalidar_escopos,
+)
+
+
+def invalidar_no_commit(escopos):
+    """
+    Invalida `escopos` quando a transação atual fizer commit (fora de uma
+    transação, na hora). Antes do commit outra requisição ainda lê as linhas
+    antigas e as guardaria no cache sob a versão nova.
+    """
+    agendar_no_commit("cache_escopos", filter(None, escopos), invalidar_escopos)
+
+
+def _apenas_login(update_fields):
+    # O login atualiza só last_login, o que não muda nenhum relatório.
+    return bool(update_fields) and set(update_fields) <= {"last_login"}
+
+
+def _escopos_usuario(user):
+    escopos = set()
+    if user.academia_id:
+        escopos.add(escopo_academia(user.academia_id))
+    # O nome aparece nas listas de quem se relaciona com o usuário.
+    if user.user_type == "PERSONAL":
+        escopos.add(escopo_personal(user.pk))
+        escopos |= escopos_dos_alunos({"personal_responsavel_id": user.pk})
+        escopos |= escopos_dos_treinos({"personal_criador_id": user.pk})
+    elif user.user_type == "ALUNO":
+        escopos |= escopos_dos_alunos({"pk": user.pk})
+        escopos |= escopos_dos_treinos({"aluno_id": user.pk})
+    return escopos
+
+
+# Antes de salvar, guarda os escopos do registro no banco para que uma troca
+# de aluno, personal ou academia também invalide o escopo anterior.
+
+
+@receiver(pre_save, sender=Treino)
+def guardar_escopos_treino(sender, instance, raw=False, **kwargs):
+    instance._escopos_cache = set()
+    if instance.pk and not raw:
+        instance._escopos_cache = escopos_dos_treinos({"pk": instance.pk})
+
+
+@receiver(pre_save, sender=Aluno)
+def guardar_escopos_aluno(sender, instance, raw=False, **kwargs):
+    instance._escopos_cache = set()
+    if instance.pk and not raw:
+        instance._escopos_cache = escopos_dos_alunos({"pk": instance.pk})
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def guardar_escopos_usuario(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._escopos_cache = set()
+    if instance.pk and not raw and not _apenas_login(update_fields):
+        anterior = sender.objects.filter(pk=instance.pk).first()
+        if anterior:
+            instance._escopos_cache = _escopos_usuario(anterior)
+
+
+@receiver(post_save, sender=Treino)
+@receiver(post_delete, sender=Treino)
+def invalidar_cache_treino(sender, instance, **kwargs):
+    escopos = getattr(instance, "_escopos_cache", set())
+    escopos.add(escopo_aluno(instance.aluno_id))
+    if instance.personal_criador_id:
+        escopos.add(escopo_personal(instance.personal_criador_id))
+    escopos |= escopos_dos_alunos({"pk": instance.aluno_id})
+    invalidar_no_commit(escopos | {ESCOPO_GLOBAL})
+
+
+@receiver(post_save, sender=ItemTreino)
+@receiver(post_delete, sender=ItemTreino)
+def invalidar_cache_item(sender, instance, **kwargs):
+    # No commit, uma vez para todos os itens da transação. Na exclusão em
+    # cascata o treino já não existe; o signal dele invalida os escopos.
+    agendar_no_commit("cache_itens", [instance.treino_id], _invalidar_treinos)
+
+
+def _invalidar_treinos(treino_ids):
+    # Já roda no commit
+    escopos = escopos_dos_treinos({"pk__in": treino_ids})
+    invalidar_escopos(escopos | {ESCOPO_GLOBAL})
+
+
+@receiver(post_save, sender=SessaoTreino)
+@receiver(post_delete, sender=SessaoTreino)
+def invalidar_cache_sessao(sender, instance, **kwargs):
+    # Sessões alimentam os contadores do aluno e o histórico de carga, que
+    # também entra nos relatórios do personal dele. Os escopos são buscados
+    # no commit, uma vez para todas as sessões da transação.
+    agendar_no_commit("cache_sessoes", [instance.aluno_id], _invalidar_alunos)
+
+
+def _invalidar_alunos(aluno_ids):
+    # Já roda no commit; o aluno pode ter sido excluído junto com as sessões
+    escopos = {escopo_aluno(aluno_id) for aluno_id in aluno_ids}
+    invalidar_escopos(escopos | escopos_dos_alunos({"pk__in": aluno_ids}))
+
+
+@receiver(post_save, sender=Aluno)
+@receiver(post_delete, sender=Aluno)
+def invalidar_cache_aluno(sender, instance, **kwargs):
+    escopos = getattr(instance, "_escopos_cache", set())
+    escopos.add(escopo_aluno(instance.pk))
+    if instance.personal_responsavel_id:
+        escopos.add(escopo_personal(instance.personal_responsavel_id))
+    if instance.academia_id:
+        escopos.add(escopo_academia(instance.academia_id))
+    invalidar_no_commit(escopos | {ESCOPO_GLOBAL})
+
+
+@receiver(post_save, sender=PersonalTrainer)
+@receiver(post_delete, sender=PersonalTrainer)
+def invalidar_cache_personal(sender, instance, **kwargs):
+    escopos = {escopo_personal(instance.pk)}
+    academia_id = (
+        get_user_model()
+        .objects.filter(pk=instance.pk)
+        .values_list("academia_id", flat=True)
+        .first()
+    )
+    if academia_id:
+        escopos.add(escopo_academia(academia_id))
+    invalidar_no_commit(escopos | {ESCOPO_GLOBAL})
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidar_cache_usuario(sender, instance, update_fields=None, **kwargs):
+    if _apenas_login(update_fields):
+        return
+    escopos = getattr(instance, "_escopos_cache", set())
+    escopos |= _escopos_usuario(instance)
+    invalidar_no_commit(escopos | {ESCOPO_GLOBAL})
+
+
+@receiver(post_save, sender=Academia)
+@receiver(post_delete, sender=Academia)
+def invalidar_cache_academia(sender, instance, **kwargs):
+    # O nome da academia aparece nas listas de alunos dos personais.
+    personais = (
+        Aluno.objects.filter(academia_id=instance.pk)
+        .exclude(personal_responsavel=None)
+        .values_list("personal_responsavel_id", flat=True)
+        .distinct()
+    )
+    escopos = {escopo_personal(personal_id) for personal_id in personais}
+    escopos.add(escopo_academia(instance.pk))
+    invalidar_no_commit(escopos | {ESCOPO_GLOBAL})
+
+
+@receiver(post_save, sender=Exercicio)
+@receiver(post_delete, sender=Exercicio)
+def invalidar_cache_exercicio(sender, instance, **kwargs):
+    # Com a versão nova antes do commit, outro processo remontaria o catálogo
+    # com as linhas antigas e o serviria até IDADE_MAXIMA
+    invalidar_no_commit({ESCOPO_CATALOGO})
@@ -0,0 +1,128 @@
+"""
+Exercícios parecidos, para substituir um exercício (aparelho ocupado etc.).
+
+A semelhança entre dois exercícios é o Jaccard ponderado das suas
+características: cada músculo primário, músculo secundário, equipamento,
+mecânica e nível vale o peso de PESOS, e a nota é o peso do que os dois têm
+em comum dividido pelo peso do que os dois têm juntos (1 para exercícios
+iguais). Só entram exercícios que trabalham ao menos um músculo em comum.
+
+O `IndiceSimilares` é montado junto com o catálogo de cada versão (ver
+core/catalogo.py) com uma lista invertida por característica. A linha de um
+exercício (os outros, do mais parecido ao menos) soma os pesos só nas listas
+das características dele, sem comparar todos os pares, e fica guardada no
+índice: como o catálogo é remontado quando muda, as linhas nunca ficam velhas
+e as consultas seguintes são uma leitura. Com filtros por faceta a linha é
+calculada só entre os exercícios que os atendem, sem ser guardada.
+"""
+
+import heapq
+from collections import defaultdict
+
+from .busca import LIMITE_MAXIMO
+from .facetas import normalizar
+
+# campo de Exercicio -> peso de cada valor do campo
+PESOS = {
+    "primary_muscles": 3.0,
+    "secondary_muscles": 1.0,
+    "equipment": 2.0,
+    "mechanic": 1.0,
+    "level": 0.5,
+}
+
+CAMPOS_MUSCULOS = ("primary_muscles", "secondary_muscles")
+
+# Quantos vizinhos cada linha guarda (o ?limite= máximo da API)
+TAMANHO_LINHA = LIMITE_MAXIMO
+
+
+def _caracteristicas(campos):
+    caracteristicas = set()
+    for campo in PESOS:
+        valor = campos.get(campo)
+        if not valor:
+            continue
+        for texto in [valor] if isinstance(valor, str) else valor:
+            normalizado = normalizar(texto)
+            if normalizado:
+                caracteristicas.add((campo, normalizado))
+    return caracteristicas
+
+
+class IndiceSimilares:
+    """
+    Semelhança entre os `documentos`, pares (chave, {campo: valor}) com os
+    campos de PESOS.
+    """
+
+    def __init__(self, documentos):
+        self.chaves = []
+        self.posicao_de = {}
+        self.caracteristicas = []
+        self.pesos = []
+        # característica -> posições dos documentos que a têm
+        self.listas = defaultdict(list)
+        # músculo (primário ou secundário) -> posições
+        self.por_musculo = defaultdict(set)
+
+        for posicao, (chave, campos) in enumerate(documentos):
+            caracteristicas = _caracteristicas(campos)
+            self.chaves.append(chave)
+            self.posicao_de[chave] = posicao
+            self.caracteristicas.append(caracteristicas)
+            self.pesos.append(sum(PESOS[campo] for campo, _ in caracteristicas))
+            for campo, valor in caracteristicas:
+                self.listas[(campo, valor)].append(posicao)
+                if campo in CAMPOS_MUSCULOS:
+                    self.por_musculo[valor].add(posicao)
+
+        # posição -> [(nota, chave)] dos mais parecidos, montada na 1ª leitura
+        self.linhas = {}
+
+    def _linha(self, posicao, permitidas=None):
+        caracteristicas = self.caracteristicas[posicao]
+        # Candidatos: os que têm algum músculo em comum, primário ou não
+        comum = {}
+        for campo, valor in caracteristicas:
+            if campo in CAMPOS_MUSCULOS:
+                comum.update(dict.fromkeys(self.por_musculo[valor], 0.0))
+        if permitidas is not None:
+            comum = {outra: 0.0 for outra in comum if outra in permitidas}
+        for campo, valor in caracteristicas:
+            peso = PESOS[campo]
+            for outra in self.listas[(campo, valor)]:
+                if outra in comum:
+                    comum[outra] += peso
+        comum.pop(posicao, None)
+
+        peso = self.pesos[posicao]
+        notas = (
+            (em_comum / (peso + self.pesos[outra] - em_comum), outra)
+            for outra, em_comum in comum.items()
+        )
+        melhores = heapq.nsmallest(
+            TAMANHO_LINHA, notas, key=lambda par: (-par[0], par[1])
+        )
+        return [(round(nota, 4), self.chaves[outra]) for nota, outra in melhores]
+
+    def similares(self, chave, permitidas=None):
+        """
+        [(nota, chave)] dos exercícios mais parecidos com `chave` (até
+        TAMANHO_LINHA), ou None se a chave não está no índice. Com
+        `permitidas` (um conjunto de chaves), só esses exercícios concorrem.
+        """
+        posicao = self.posicao_de.get(chave)
+        if posicao is None:
+            return None
+        if permitidas is not None:
+            # Filtrar a linha guardada depois de cortada perderia vizinhos
+            # que só ficaram de fora por causa do corte; sem guardar, pois
+            # cada combinação de filtros dá outra linha
+            posicoes = {self.posicao_de[outra] for outra in permitidas}
+            return self._linha(posicao, posicoes)
+        linha = self.linhas.get(posicao)
+        if linha is None:
+            # Duas threads podem montar a mesma linha; o resultado é o mesmo
+            linha = self.linhas[posicao] = self._linha(posicao)
+        return linha
@@ -0,0 +1,120 @@
+"""
+Geração de relatórios em segundo plano.
+
+Relatórios pesados podem ser enfileirados em um pool local de threads; o
+cliente recebe o id da tarefa e consulta o andamento depois. Pedidos iguais
+(mesma chave de cache) enquanto a tarefa está na fila ou em execução são
+anexados a ela em vez de gerar o relatório de novo.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+
+class TarefaRelatorio:
+    """Estado de uma geração de relatório em segundo plano."""
+
+    def __init__(self, chave, usuario_id):
+        self.id = uuid.uuid4()
+        self.chave = chave
+        self.usuarios = {usuario_id}
+        self.status = PENDENTE
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.concluida_em = None
+
+    @property
+    def finalizada(self):
+        return self.status in (CONCLUIDA, ERRO)
+
+    def como_dict(self):
+        return {
+            "tarefa_id": str(self.id),
+            "status": self.status,
+            "erro": self.erro,
+        }
+
+
+_lock = threading.Lock()
+_executor = None
+_tarefas = {}
+_em_andamento = {}
+
+
+def _obter_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RELATORIOS_WORKERS,
+            thread_name_prefix="relatorios",
+        )
+    return _executor
+
+
+def _descartar_expiradas():
+    # Chamada com _lock adquirido.
+    limite = time.time() - settings.RELATORIOS_TAREFAS_TTL
+    expiradas = [
+        tarefa_id
+        for tarefa_id, tarefa in _tarefas.items()
+        if tarefa.finalizada and tarefa.concluida_em < limite
+    ]
+    for tarefa_id in expiradas:
+        del _tarefas[tarefa_id]
+
+
+def _executar(tarefa, gerar):
+    tarefa.status = EXECUTANDO
+    try:
+        tarefa.resultado = gerar()
+        tarefa.status = CONCLUIDA
+    except Exception as e:
+        tarefa.erro = str(e)
+        tarefa.status = ERRO
+    finally:
+        tarefa.concluida_em = time.time()
+        with _lock:
+            _em_andamento.pop(tarefa.chave, None)
+        # Cada thread do pool abre as próprias conexões com o banco.
+        connections.close_all()
+
+
+def enfileirar(chave, usuario_id, gerar):
+    """
+    Enfileira `gerar` para a chave dada, ou anexa o usuário à tarefa que já
+    está gerando o mesmo relatório. Retorna a tarefa.
+    """
+    with _lock:
+        _descartar_expiradas()
+
+        tarefa = _tarefas.get(_em_andamento.get(chave))
+        if tarefa is not None:
+            tarefa.usuarios.add(usuario_id)
+            return tarefa
+
+        tarefa = TarefaRelatorio(chave, usuario_id)
+        _tarefas[tarefa.id] = tarefa
+        _em_andamento[chave] = tarefa.id
+
+    _obter_executor().submit(_executar, tarefa, gerar)
+    return tarefa
+
+
+def obter_tarefa(tarefa_id, usuario_id):
+    """Retorna a tarefa se ela existir e pertencer ao usuário, senão None."""
+    with _lock:
+        tarefa = _tarefas.get(tarefa_id)
+    if tarefa is None or usuario_id not in tarefa.usuarios:
+        return None
+    return tarefa
@@ -1,3 +1,2175 @@
-from django.test import TestCase
+"""
+Orçamento de queries por rota.
 
-# Create your tests here.
+Popula a base com 10, 100 e 1000 registros de cada tipo (academias,
+personais, alunos, treinos e sessões) e acessa todas as rotas de
+core/api_urls.py e Athlos/urls.py (exceto o Django admin) com o perfil de cada
+papel que pode vê-las. Para cada rota o número de queries SQL não pode passar
+do orçamento nem crescer com o tamanho da base: um N+1 em um serializer, em
+um template ou em um laço de relatório quebra este teste.
+
+As escritas de treinos pela API (ESCRITAS_TREINO) são medidas também com
+fichas de 1, 10 e 30 itens, e o número de queries não pode crescer com eles.
+
+Rotas novas precisam entrar em ROTAS, senão o teste de cobertura falha.
+
+As demais classes testam o comportamento por trás desses números: resumos
+diários e itens mantidos pelas escritas, ETags e cache dos relatórios, busca,
+facetas, autocompletar e similares do catálogo, a importação de alunos, a
+leitura rápida das listagens, os lotes de séries das sessões, os KPIs do
+aluno, os relatórios gerados em segundo plano, os campos sob demanda
+(?fields= e ?expand=), a exportação dos treinos e o progresso de carga do
+relatório do personal.
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from academias.models import Academia, Aluno, PersonalTrainer
+from treinos.contadores import recalcular_contador
+from treinos.historico_carga import reconstruir_historico, series_de_carga
+from treinos.models import (
+    Exercicio,
+    HistoricoCarga,
+    ItemModeloTreino,
+    ItemTreino,
+    ModeloTreino,
+    ResumoDiario,
+    ResumoDiarioCategoria,
+    SerieRealizada,
+    SessaoTreino,
+    Treino,
+)
+from treinos.resumos import reconstruir_resumos
+from .cache_relatorios import (
+    ESCOPO_CATALOGO,
+    ESCOPO_GLOBAL,
+    _chave_versao,
+    chave_relatorio,
+    escopo_aluno,
+    invalidar_escopos,
+    obter_ou_gerar,
+    verificar_cache_compartilhado,
+    versao_escopo,
+)
+from . import importacao
+from .catalogo import descartar_catalogo
+from .exportacao import (
+    COLUNAS_ITEM,
+    COLUNAS_TREINO,
+    GERADORES,
+    TAMANHO_LOTE,
+    linhas_ndjson,
+)
+from .importacao import MINIMO_PARA_POOL, hashear_senhas
+from .leitura_rapida import LEITOR_ALUNOS, LEITOR_EXERCICIOS, LEITOR_TREINOS
+from .serializers import (
+    AlunoDetailSerializer,
+    AlunoListSerializer,
+    ExercicioListSerializer,
+    TreinoListSerializer,
+)
+from .api_views import RelatorioAdminView
+from .tarefas_relatorios import (
+    CONCLUIDA,
+    ERRO,
+    EXECUTANDO,
+    PENDENTE,
+    enfileirar,
+    obter_tarefa,
+)
+
+User = get_user_model()
+
+TAMANHOS = (10, 100, 1000)
+SENHA = "senha-de-teste"
+
+ADMIN_SISTEMA = "ADMIN_SISTEMA"
+ADMIN = "ADMIN"
+PERSONAL = "PERSONAL"
+ALUNO = "ALUNO"
+TODOS = (ADMIN_SISTEMA, ADMIN, PERSONAL, ALUNO)
+
+# nome da rota -> (papéis que acessam, orçamento de queries por requisição)
+ROTAS = {
+    # API: autenticação
+    "token_obtain_pair": ((ALUNO,), 2),
+    "token_refresh": ((ALUNO,), 2),
+    "user_me": (TODOS, 1),
+    # API: dashboards
+    "dashboard_composto": (TODOS, 10),
+    "dashboard_personal": ((PERSONAL,), 8),
+    "dashboard_aluno": ((ALUNO,), 6),
+    "dashboard_academia": ((ADMIN_SISTEMA, ADMIN), 5),
+    "dashboard_admin": ((ADMIN_SISTEMA,), 10),
+    # API: relatórios
+    "relatorio_personal": ((PERSONAL,), 14),
+    "relatorio_aluno": ((ALUNO,), 11),
+    "relatorio_academia": ((ADMIN,), 10),
+    "relatorio_admin": ((ADMIN_SISTEMA,), 16),
+    "relatorio_evolucao_carga": ((ALUNO, PERSONAL), 3),
+    "relatorio_cache": ((ADMIN_SISTEMA,), 1),
+    "relatorio_tarefa": ((ADMIN_SISTEMA,), 1),
+    "relatorio_tarefa_resultado": ((ADMIN_SISTEMA,), 1),
+    # API: viewsets
+    "api-root": ((ALUNO,), 1),
+    "academia-list": ((ADMIN_SISTEMA, ADMIN, PERSONAL), 2),
+    "academia-detail": ((ADMIN_SISTEMA, ADMIN), 2),
+    "personaltrainer-list": ((ADMIN_SISTEMA, ADMIN), 2),
+    "personaltrainer-detail": ((ADMIN_SISTEMA, ADMIN), 2),
+    "aluno-list": (TODOS, 3),
+    "aluno-detail": ((ADMIN_SISTEMA, PERSONAL, ALUNO), 8),
+    "aluno-importar": ((ADMIN_SISTEMA, ADMIN, PERSONAL), 8),
+    "exercicio-list": ((ALUNO,), 2),
+    "exercicio-detail": ((ALUNO,), 2),
+    "exercicio-categorias": ((ALUNO,), 2),
+    "exercicio-por-categoria": ((ALUNO,), 2),
+    "exercicio-facetas": ((ALUNO,), 2),
+    "exercicio-autocompletar": ((ALUNO,), 2),
+    "exercicio-similares": ((ALUNO,), 2),
+    "treino-list": (TODOS, 3),
+    "treino-detail": ((ADMIN_SISTEMA, PERSONAL, ALUNO), 9),
+    "treino-exportar": (TODOS, 4),
+    "modelotreino-list": ((ADMIN_SISTEMA, ADMIN, PERSONAL), 3),
+    "modelotreino-detail": ((ADMIN_SISTEMA, ADMIN, PERSONAL), 3),
+    "modelotreino-atribuir": ((ADMIN_SISTEMA, PERSONAL), 19),
+    "sessaotreino-list": (TODOS, 2),
+    "sessaotreino-detail": ((ALUNO,), 2),
+    "sessaotreino-series": ((ALUNO,), 6),
+    # Páginas HTML
+    "home": ((ALUNO,), 3),
+    "login": ((ALUNO,), 3),
+    "logout": ((ALUNO,), 5),
+    "dashboard": (TODOS, 3),
+    "admin_dashboard": ((ADMIN_SISTEMA, ADMIN), 7),
+    "personal_dashboard": ((PERSONAL,), 10),
+    "aluno_dashboard": ((ALUNO,), 10),
+    "academia_list": ((ADMIN_SISTEMA, PERSONAL), 4),
+    "academia_create": ((ADMIN_SISTEMA,), 3),
+    "academia_detail": ((ADMIN_SISTEMA,), 4),
+    "academia_edit": ((ADMIN_SISTEMA,), 4),
+    "treino_list": (TODOS, 5),
+    "treino_create": ((PERSONAL,), 6),
+    "treino_detail": ((ADMIN_SISTEMA, PERSONAL, ALUNO), 7),
+    "treino_edit": ((PERSONAL,), 12),
+    "aluno_list": ((ADMIN_SISTEMA, PERSONAL), 5),
+    "aluno_create": ((ADMIN_SISTEMA, PERSONAL), 5),
+    "aluno_detail": ((ADMIN_SISTEMA, PERSONAL), 11),
+    "aluno_edit": ((ADMIN_SISTEMA, PERSONAL), 8),
+    "aluno_delete": ((PERSONAL,), 6),
+}
+
+# Escritas de treinos pela API: método -> (rota, orçamento de queries). Medidas
+# com fichas de ITENS_POR_TREINO itens; o número de queries não pode crescer
+# com os itens (os signals por item são juntados no commit)
+ESCRITAS_TREINO = {
+    "post": ("treino-list", 20),
+    "put": ("treino-detail", 31),
+    "delete": ("treino-detail", 23),
+}
+ITENS_POR_TREINO = (1, 10, 30)
+
+# Lotes de séries registrados em uma sessão pela API: séries por lote e
+# orçamento de queries do POST, que não pode crescer com elas
+ITENS_POR_LOTE = (1, 10, 50)
+ORCAMENTO_LOTE_SERIES = 10
+
+# Rotas que só aceitam POST
+ROTAS_POST = {
+    "token_obtain_pair",
+    "token_refresh",
+    "aluno-importar",
+    "modelotreino-atribuir",
+    "sessaotreino-series",
+}
+
+
+def rotas_registradas():
+    """Nomes de todas as rotas do projeto, exceto as do Django admin."""
+    nomes = set()
+
+    def percorrer(padroes):
+        for padrao in padroes:
+            if isinstance(padrao, URLResolver):
+                if padrao.app_name != "admin":
+                    percorrer(padrao.url_patterns)
+            elif padrao.name:
+                nomes.add(padrao.name)
+
+    percorrer(get_resolver().url_patterns)
+    return nomes
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class OrcamentoQueriesTest(TestCase):
+    """Número de queries por rota, constante em 10, 100 e 1000 registros."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.academia = Academia.objects.create(
+            nome_fantasia="Academia Principal",
+            cnpj="00.000.000/0001-00",
+            endereco="Rua A, 1",
+            telefone="1199999999",
+        )
+        cls.usuarios = {
+            ADMIN_SISTEMA: cls.criar_usuario("sistema", ADMIN_SISTEMA),
+            ADMIN: cls.criar_usuario("admin", ADMIN, cls.academia),
+            PERSONAL: cls.criar_usuario("personal", PERSONAL, cls.academia),
+            ALUNO: cls.criar_usuario("aluno", ALUNO, cls.academia),
+        }
+        cls.personal = PersonalTrainer.objects.get(user=cls.usuarios[PERSONAL])
+        cls.aluno = Aluno.objects.get(user=cls.usuarios[ALUNO])
+        cls.aluno.personal_responsavel = cls.personal
+        cls.aluno.academia = cls.academia
+        cls.aluno.save()
+
+        cls.exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                category=["strength", "cardio", "stretching"][i % 3],
+                level="beginner",
+                primary_muscles=["chest"],
+                secondary_muscles=[],
+                instructions=["Executar o movimento"],
+                images=[],
+            )
+            for i in range(12)
+        )
+        cls.modelo = ModeloTreino.objects.create(
+            personal_criador=cls.personal, nome="Modelo A"
+        )
+        ItemModeloTreino.objects.bulk_create(
+            ItemModeloTreino(
+                modelo=cls.modelo, exercicio=exercicio, series=3, repeticoes="12"
+            )
+            for exercicio in cls.exercicios[:4]
+        )
+
+    @staticmethod
+    def criar_usuario(nome, tipo, academia=None):
+        return User.objects.create_user(
+            username=nome,
+            email=f"{nome}@athlos.test",
+            password=SENHA,
+            first_name=nome.title(),
+            last_name="Teste",
+            user_type=tipo,
+            academia=academia,
+        )
+
+    # ==========================================
+    # DADOS
+    # ==========================================
+
+    def crescer(self, tamanho):
+        """Completa a base até `tamanho` registros de cada tipo."""
+        inicio = Academia.objects.count()
+        Academia.objects.bulk_create(
+            Academia(
+                nome_fantasia=f"Academia {i}",
+                cnpj=f"cnpj-{i}",
+                endereco="Rua B, 2",
+                telefone="1188888888",
+            )
+            for i in range(inicio, tamanho)
+        )
+
+        inicio = PersonalTrainer.objects.count()
+        novos = User.objects.bulk_create(
+            User(
+                username=f"personal{i}",
+                email=f"personal{i}@athlos.test",
+                first_name=f"Personal {i}",
+                user_type=PERSONAL,
+                academia=self.academia,
+                password="!",
+            )
+            for i in range(inicio, tamanho)
+        )
+        PersonalTrainer.objects.bulk_create(
+            PersonalTrainer(user=user, cref=f"CREF-T{user.pk}") for user in novos
+        )
+
+        # Alunos do personal principal, cada um com um treino de três itens.
+        inicio = Aluno.objects.count()
+        novos = User.objects.bulk_create(
+            User(
+                username=f"aluno{i}",
+                email=f"aluno{i}@athlos.test",
+                first_name=f"Aluno {i}",
+                user_type=ALUNO,
+                academia=self.academia,
+                password="!",
+            )
+            for i in range(inicio, tamanho)
+        )
+        alunos = Aluno.objects.bulk_create(
+            Aluno(
+                user=user,
+                personal_responsavel=self.personal,
+                academia=self.academia,
+                data_nascimento=timezone.localdate() - timedelta(days=9000),
+            )
+            for user in novos
+        )
+        self.criar_treinos(alunos)
+
+        # Treinos e sessões do aluno principal.
+        faltam = tamanho - self.aluno.treinos.count()
+        self.criar_treinos([self.aluno] * max(faltam, 0))
+        self.criar_sessoes(tamanho - self.aluno.sessoes.count())
+
+        reconstruir_resumos()
+        reconstruir_historico()
+        recalcular_contador(self.aluno.pk)
+
+    def criar_treinos(self, alunos):
+        treinos = Treino.objects.bulk_create(
+            Treino(
+                aluno=aluno,
+                personal_criador=self.personal,
+                nome_treino=f"Treino {i}",
+                ativo=i % 2 == 0,
+            )
+            for i, aluno in enumerate(alunos)
+        )
+        ItemTreino.objects.bulk_create(
+            ItemTreino(
+                treino=treino,
+                exercicio=self.exercicios[(i + j) % len(self.exercicios)],
+                series=3,
+                repeticoes="10",
+                carga_kg=20 + j,
+            )
+            for i, treino in enumerate(treinos)
+            for j in range(3)
+        )
+
+    def criar_sessoes(self, quantidade):
+        if quantidade <= 0:
+            return
+        treino = self.aluno.treinos.first()
+        agora = timezone.now()
+        sessoes = SessaoTreino.objects.bulk_create(
+            SessaoTreino(
+                treino=treino,
+                aluno=self.aluno,
+                inicio=agora - timedelta(days=i),
+                fim=agora - timedelta(days=i) + timedelta(minutes=50),
+            )
+            for i in range(quantidade)
+        )
+        SerieRealizada.objects.bulk_create(
+            SerieRealizada(
+                sessao=sessao,
+                exercicio=self.exercicios[0],
+                numero=numero,
+                repeticoes=10,
+                carga_kg=30,
+                realizada_em=sessao.inicio,
+            )
+            for sessao in sessoes
+            for numero in (1, 2)
+        )
+
+    # ==========================================
+    # REQUISIÇÕES
+    # ==========================================
+
+    def argumentos(self, nome):
+        """kwargs de reverse() para as rotas com parâmetros."""
+        treino = self.aluno.treinos.order_by("pk").first()
+        argumentos = {
+            "academia-detail": {"pk": self.academia.pk},
+            "academia_detail": {"pk": self.academia.pk},
+            "academia_edit": {"pk": self.academia.pk},
+            "personaltrainer-detail": {"pk": self.personal.pk},
+            "aluno-detail": {"pk": self.aluno.pk},
+            "aluno_detail": {"pk": self.aluno.pk},
+            "aluno_edit": {"pk": self.aluno.pk},
+            "aluno_delete": {"pk": self.aluno.pk},
+            "exercicio-detail": {"pk": self.exercicios[0].pk},
+            "exercicio-similares": {"pk": self.exercicios[0].pk},
+            "modelotreino-detail": {"pk": self.modelo.pk},
+            "modelotreino-atribuir": {"pk": self.modelo.pk},
+            "treino-detail": {"pk": treino.pk},
+            "treino_detail": {"pk": treino.pk},
+            "treino_edit": {"pk": treino.pk},
+            "sessaotreino-detail": {"pk": self.aluno.sessoes.first().pk},
+            "sessaotreino-series": {"pk": self.aluno.sessoes.first().pk},
+            "relatorio_tarefa": {"tarefa_id": self.tarefa.id},
+            "relatorio_tarefa_resultado": {"tarefa_id": self.tarefa.id},
+        }
+        return argumentos.get(nome, {})
+
+    def corpo(self, nome, user):
+        if nome == "token_obtain_pair":
+            return {"email": user.email, "password": SENHA}
+        if nome == "token_refresh":
+            return {"refresh": str(RefreshToken.for_user(user))}
+        if nome == "aluno-importar":
+            # E-mails novos a cada chamada, senão a importação recusa as linhas
+            inicio = User.objects.count()
+            return [
+                {"email": f"importado{inicio + i}@athlos.test", "password": SENHA}
+                for i in range(5)
+            ]
+        if nome == "modelotreino-atribuir":
+            # Só o aluno principal, cujos treinos crescer() já completa
+            return {"alunos": [self.aluno.pk]}
+        if nome == "sessaotreino-series":
+            itens = self.aluno.sessoes.first().treino.itens.all()
+            return {
+                "series": [
+                    {"item": item.pk, "numero": numero, "repeticoes": 10}
+                    for item in itens
+                    for numero in range(1, 6)
+                ]
+            }
+        return None
+
+    def contar_queries(self, nome, papel):
+        user = self.usuarios[papel]
+        url = reverse(nome, kwargs=self.argumentos(nome))
+        if nome == "relatorio_evolucao_carga" and papel != ALUNO:
+            url += f"?aluno_id={self.aluno.pk}"
+        corpo = self.corpo(nome, user)
+
+        if url.startswith("/api/"):
+            cliente = APIClient()
+            if nome not in ("token_obtain_pair", "token_refresh"):
+                cliente.force_authenticate(user)
+        else:
+            cliente = Client()
+            cliente.force_login(user)
+
+        # Sem cache: mede a geração completa de cada resposta.
+        cache.clear()
+        descartar_catalogo()
+        # Conta também o que roda no commit (resumos, contadores)
+        with (
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            if nome in ROTAS_POST:
+                resposta = cliente.post(url, corpo, format="json")
+            else:
+                resposta = cliente.get(url)
+            if resposta.streaming:
+                # As queries da exportação rodam enquanto o corpo é lido
+                b"".join(resposta.streaming_content)
+
+        self.assertLess(
+            resposta.status_code,
+            400,
+            f"{nome} ({papel}) respondeu {resposta.status_code}",
+        )
+        return len(queries)
+
+    def contar_escrita(self, metodo, itens):
+        """Queries de uma escrita de treino com uma ficha de `itens` itens."""
+        rota, _ = ESCRITAS_TREINO[metodo]
+        # Cargas novas a cada chamada: o histórico de carga sempre ganha linhas
+        carga = 20 + itens
+
+        def corpo(exercicios, carga):
+            return {
+                "nome_treino": "Treino medido",
+                "aluno": self.aluno.pk,
+                "ativo": True,
+                "itens": [
+                    {
+                        "exercicio_id": exercicio.pk,
+                        "series": 3,
+                        "repeticoes": "10",
+                        "carga_kg": carga,
+                    }
+                    for exercicio in exercicios
+                ],
+            }
+
+        ficha = self.exercicios_da_ficha[:itens]
+        removido, incluido = self.exercicios_da_ficha[-2:]
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuarios[PERSONAL])
+
+        kwargs = {}
+        dados = corpo(ficha, carga)
+        if metodo != "post":
+            with self.captureOnCommitCallbacks(execute=True):
+                cliente.post(
+                    reverse("treino-list"),
+                    corpo([*ficha, removido], carga),
+                    format="json",
+                )
+            kwargs = {"pk": Treino.objects.latest("pk").pk}
+            # Todos os itens mudam, um sai e outro entra
+            dados = corpo([*ficha, incluido], carga + 1)
+
+        cache.clear()
+        with (
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            resposta = getattr(cliente, metodo)(
+                reverse(rota, kwargs=kwargs), dados, format="json"
+            )
+        self.assertLess(
+            resposta.status_code,
+            400,
+            f"{metodo} {rota} ({itens} itens) respondeu {resposta.status_code}",
+        )
+        return len(queries)
+
+    def esperar_tarefa(self):
+        self.tarefa = enfileirar(
+            "orcamento-queries", self.usuarios[ADMIN_SISTEMA].pk, lambda: {"ok": True}
+        )
+        for _ in range(100):
+            if self.tarefa.finalizada:
+                break
+            time.sleep(0.01)
+
+    # ==========================================
+    # TESTES
+    # ==========================================
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        self.assertEqual(rotas_registradas() - set(ROTAS), set())
+
+    def test_queries_constantes_por_tamanho_da_base(self):
+        self.esperar_tarefa()
+
+        contagens = {}
+        for tamanho in TAMANHOS:
+            self.crescer(tamanho)
+            for nome, (papeis, _) in ROTAS.items():
+                for papel in papeis:
+                    contagens.setdefault((nome, papel), []).append(
+                        self.contar_queries(nome, papel)
+                    )
+
+        for (nome, papel), valores in contagens.items():
+            orcamento = ROTAS[nome][1]
+            with self.subTest(rota=nome, papel=papel):
+                self.assertLessEqual(
+                    max(valores),
+                    orcamento,
+                    f"{nome} ({papel}) passou do orçamento: {valores}",
+                )
+                self.assertEqual(
+                    len(set(valores)),
+                    1,
+                    f"{nome} ({papel}) cresce com a base: "
+                    f"{dict(zip(TAMANHOS, valores))}",
+                )
+
+    def test_escritas_de_treino_nao_crescem_com_os_itens(self):
+        self.crescer(TAMANHOS[0])
+        # Exercícios para a maior ficha e mais dois para a troca do PUT
+        inicio = len(self.exercicios)
+        self.exercicios_da_ficha = self.exercicios + Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                category=["strength", "cardio", "stretching"][i % 3],
+                level="beginner",
+                primary_muscles=["chest"],
+                secondary_muscles=[],
+                instructions=["Executar o movimento"],
+                images=[],
+            )
+            for i in range(inicio, max(ITENS_POR_TREINO) + 2)
+        )
+
+        for metodo, (rota, orcamento) in ESCRITAS_TREINO.items():
+            valores = [self.contar_escrita(metodo, itens) for itens in ITENS_POR_TREINO]
+            with self.subTest(metodo=metodo, rota=rota):
+                self.assertLessEqual(
+                    max(valores),
+                    orcamento,
+                    f"{metodo} {rota} passou do orçamento: {valores}",
+                )
+                self.assertEqual(
+                    len(set(valores)),
+                    1,
+                    f"{metodo} {rota} cresce com os itens: "
+                    f"{dict(zip(ITENS_POR_TREINO, valores))}",
+                )
+
+
+class VersaoEscopoTest(TestCase):
+    """Versões dos escopos de cache, que formam as chaves e os ETags."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = OrcamentoQueriesTest.criar_usuario("aluno", ALUNO)
+
+    def setUp(self):
+        cache.clear()
+        descartar_catalogo()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user)
+
+    def test_etag_antigo_nao_volta_depois_de_despejo(self):
+        url = reverse("exercicio-list")
+        antigo = self.cliente.get(url)["ETag"]
+        invalidar_escopos([ESCOPO_CATALOGO])
+        atual = self.cliente.get(url)["ETag"]
+        self.assertNotEqual(antigo, atual)
+
+        # Entrada da versão despejada do cache: a versão não pode recomeçar
+        cache.delete(_chave_versao(ESCOPO_CATALOGO))
+        for etag in (antigo, atual):
+            resposta = self.cliente.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 200)
+
+    def test_workers_veem_as_mesmas_versoes(self):
+        # Uma conexão de cache por worker, como em processos separados
+        worker_a = caches.create_connection("default")
+        worker_b = caches.create_connection("default")
+        with mock.patch("core.cache_relatorios.cache", worker_b):
+            versao = versao_escopo(ESCOPO_GLOBAL)
+        with mock.patch("core.cache_relatorios.cache", worker_a):
+            invalidar_escopos([ESCOPO_GLOBAL])
+            nova = versao_escopo(ESCOPO_GLOBAL)
+        with mock.patch("core.cache_relatorios.cache", worker_b):
+            self.assertNotEqual(versao_escopo(ESCOPO_GLOBAL), versao)
+            self.assertEqual(versao_escopo(ESCOPO_GLOBAL), nova)
+
+    def test_cache_do_processo_recusado(self):
+        local = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with override_settings(CACHES=local):
+            erros = verificar_cache_compartilhado(None)
+            self.assertEqual([erro.id for erro in erros], ["core.E001"])
+            with self.settings(RELATORIOS_PROCESSO_UNICO=True):
+                self.assertEqual(verificar_cache_compartilhado(None), [])
+        self.assertEqual(verificar_cache_compartilhado(None), [])
+
+
+class RelatorioCacheTest(TestCase):
+    """Cache e ETag dos dashboards e relatórios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        cls.user_aluno = criar_usuario("aluno", ALUNO)
+        cls.personal = PersonalTrainer.objects.get(user=cls.user_personal)
+        cls.aluno = Aluno.objects.get(user=cls.user_aluno)
+        cls.aluno.personal_responsavel = cls.personal
+        cls.aluno.save()
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_aluno)
+
+    def test_304_ate_os_dados_mudarem(self):
+        url = reverse("dashboard_aluno")
+        etag = self.cliente.get(url)["ETag"]
+        self.assertEqual(
+            self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Treino.objects.create(
+                aluno=self.aluno, personal_criador=self.personal, nome_treino="Novo"
+            )
+            # Antes do commit a versão não muda: quem lesse agora veria as
+            # linhas antigas e as guardaria sob a versão nova
+            self.assertEqual(
+                self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+            )
+        resposta = self.cliente.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta["ETag"], etag)
+
+    def test_payload_antigo_nao_volta_depois_de_despejo(self):
+        escopo = escopo_aluno(self.aluno.pk)
+        chave = chave_relatorio("Teste", ALUNO, escopo, {})
+        obter_ou_gerar(chave, lambda: "antigo")
+        invalidar_escopos([escopo])
+        cache.delete(_chave_versao(escopo))
+
+        chave_nova = chave_relatorio("Teste", ALUNO, escopo, {})
+        self.assertNotEqual(chave_nova, chave)
+        self.assertEqual(obter_ou_gerar(chave_nova, lambda: "novo"), "novo")
+
+    def test_edicao_do_personal_invalida_os_alunos(self):
+        Treino.objects.bulk_create(
+            Treino(aluno=self.aluno, personal_criador=self.personal, nome_treino="T")
+            for _ in range(20)
+        )
+        escopo = escopo_aluno(self.aluno.pk)
+        versao = versao_escopo(escopo)
+        self.user_personal.first_name = "Outro"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_personal.save()
+        self.assertNotEqual(versao_escopo(escopo), versao)
+
+
+class CatalogoBuscaTest(TestCase):
+    """Busca, facetas e autocompletar do catálogo de exercícios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = OrcamentoQueriesTest.criar_usuario("aluno", ALUNO)
+        dados = (
+            ("Supino Reto", "barra", ["peito"]),
+            ("Supino Inclinado com Halteres", "halteres", ["peito"]),
+            ("Agachamento Livre", "barra", ["quadríceps"]),
+            ("Rosca Direta", "barra", ["bíceps"]),
+        )
+        cls.exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=nome,
+                equipment=equipamento,
+                primary_muscles=musculos,
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for nome, equipamento, musculos in dados
+        )
+
+    def setUp(self):
+        cache.clear()
+        descartar_catalogo()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user)
+
+    def nomes(self, rota, **parametros):
+        resposta = self.cliente.get(reverse(rota), parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return [exercicio["nome"] for exercicio in resposta.json()]
+
+    def test_busca_sem_acentos_e_com_facetas(self):
+        self.assertEqual(
+            sorted(self.nomes("exercicio-list", q="SUPÍNO")),
+            ["Supino Inclinado com Halteres", "Supino Reto"],
+        )
+        self.assertEqual(
+            self.nomes("exercicio-list", q="supino", equipamento="halteres"),
+            ["Supino Inclinado com Halteres"],
+        )
+        self.assertEqual(
+            self.nomes("exercicio-list", musculo="quadriceps,biceps"),
+            ["Agachamento Livre", "Rosca Direta"],
+        )
+
+    def test_catalogo_muda_no_commit(self):
+        versao = versao_escopo(ESCOPO_CATALOGO)
+        self.assertEqual(self.nomes("exercicio-list", q="remada"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Exercicio.objects.create(
+                nome="Remada Curvada",
+                primary_muscles=["costas"],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            # Remontado agora, o catálogo seria o antigo sob a versão nova
+            self.assertEqual(versao_escopo(ESCOPO_CATALOGO), versao)
+        self.assertNotEqual(versao_escopo(ESCOPO_CATALOGO), versao)
+        self.assertEqual(self.nomes("exercicio-list", q="remada"), ["Remada Curvada"])
+
+    def test_contagens_com_os_filtros_das_outras_facetas(self):
+        resposta = self.cliente.get(
+            reverse("exercicio-facetas"), {"equipamento": "barra"}
+        )
+        self.assertEqual(resposta.status_code, 200)
+        contagens = resposta.json()
+        self.assertEqual(contagens["total"], 3)
+        # O equipamento conta sem o próprio filtro; o músculo, com ele
+        self.assertEqual(
+            contagens["facetas"]["equipamento"], {"barra": 3, "halteres": 1}
+        )
+        self.assertEqual(
+            contagens["facetas"]["musculo"],
+            {"bíceps": 1, "peito": 1, "quadríceps": 1},
+        )
+
+    def test_autocompletar(self):
+        # Os nomes mais curtos primeiro
+        self.assertEqual(
+            self.nomes("exercicio-autocompletar", q="sup"),
+            ["Supino Reto", "Supino Inclinado com Halteres"],
+        )
+        # Também a partir de uma palavra do meio do nome
+        self.assertEqual(
+            self.nomes("exercicio-autocompletar", q="dir"), ["Rosca Direta"]
+        )
+        self.assertEqual(len(self.nomes("exercicio-autocompletar", q="s", limite=1)), 1)
+        resposta = self.cliente.get(reverse("exercicio-autocompletar"), {"limite": 500})
+        self.assertEqual(resposta.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportacaoAlunosTest(TestCase):
+    """Importação de alunos em lote: tudo ou nada, com os erros por linha."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        cls.personal = PersonalTrainer.objects.get(user=cls.user_personal)
+        criar_usuario("aluno", ALUNO)
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_personal)
+
+    def importar(self, linhas):
+        return self.cliente.post(reverse("aluno-importar"), linhas, format="json")
+
+    def test_erros_por_linha_e_nada_gravado(self):
+        total = User.objects.count()
+        resposta = self.importar(
+            [
+                {"email": "novo@athlos.test", "password": SENHA},
+                {"email": "nao-e-email"},
+                {"email": "aluno@athlos.test"},
+                {"email": "novo@athlos.test"},
+                {"email": "outro@athlos.test", "personal_responsavel": 999999},
+            ]
+        )
+        self.assertEqual(resposta.status_code, 400)
+        erros = {linha["linha"]: linha["erros"] for linha in resposta.json()["linhas"]}
+        self.assertEqual(sorted(erros), [2, 3, 4, 5])
+        self.assertEqual(list(erros[2]), ["email"])
+        self.assertEqual(erros[3]["email"][0]["code"], "unique")
+        self.assertIn("linha 1", erros[4]["email"][0]["message"])
+        # O personal não escolhe outro responsável
+        self.assertIn("personal_responsavel", erros[5])
+        self.assertEqual(User.objects.count(), total)
+
+    def test_pool_da_api_limitado_e_reutilizado(self):
+        senhas = [f"senha{i}" for i in range(MINIMO_PARA_POOL)]
+        pool = mock.Mock()
+        pool.map.side_effect = lambda funcao, valores, chunksize: map(funcao, valores)
+        with (
+            mock.patch.object(importacao, "_pool", None),
+            mock.patch.object(importacao, "_novo_pool", return_value=pool) as novo,
+        ):
+            for _ in range(2):
+                hashes = hashear_senhas(senhas)
+            novo.assert_called_once_with(settings.IMPORTACAO_PROCESSOS)
+        self.assertEqual(pool.map.call_count, 2)
+        self.assertTrue(check_password("senha3", hashes[3]))
+
+        # Com um processo, o hash roda aqui mesmo
+        with (
+            self.settings(IMPORTACAO_PROCESSOS=1),
+            mock.patch.object(importacao, "_novo_pool") as novo,
+        ):
+            self.assertEqual(len(hashear_senhas(senhas)), len(senhas))
+            novo.assert_not_called()
+
+    def test_importa_todas_as_linhas(self):
+        resposta = self.importar(
+            [
+                {"email": f"importado{i}@athlos.test", "password": SENHA}
+                for i in range(3)
+            ]
+        )
+        self.assertEqual(resposta.status_code, 201, resposta.content)
+        self.assertEqual(resposta.json()["criados"], 3)
+        alunos = Aluno.objects.filter(pk__in=resposta.json()["ids"])
+        self.assertEqual(alunos.count(), 3)
+        self.assertTrue(
+            all(aluno.personal_responsavel_id == self.personal.pk for aluno in alunos)
+        )
+        user = User.objects.get(email="importado0@athlos.test")
+        self.assertTrue(user.check_password(SENHA))
+
+
+class SimilaresTest(TestCase):
+    """Exercícios parecidos, com e sem filtros por faceta."""
+
+    EQUIPAMENTOS = ("barra", "halteres", "cabo", "maquina")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = OrcamentoQueriesTest.criar_usuario("aluno", ALUNO)
+        cls.exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                equipment=cls.EQUIPAMENTOS[i % 4],
+                mechanic="composto",
+                primary_muscles=["peito"],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for i in range(120)
+        )
+
+    def setUp(self):
+        cache.clear()
+        descartar_catalogo()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user)
+
+    def similares(self, **parametros):
+        url = reverse("exercicio-similares", kwargs={"pk": self.exercicios[0].pk})
+        resposta = self.cliente.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return [item["exercicio"] for item in resposta.json()]
+
+    def test_mais_parecidos_primeiro(self):
+        exercicios = self.similares(limite=5)
+        self.assertEqual(len(exercicios), 5)
+        self.assertTrue(all(e["equipment"] == "barra" for e in exercicios))
+
+    def test_filtro_conta_todos_os_que_atendem(self):
+        # 30 exercícios por equipamento; o próprio exercício é de barra
+        for equipamento, atendem in (("barra", 29), ("halteres", 30)):
+            for limite in (10, 50):
+                with self.subTest(equipamento=equipamento, limite=limite):
+                    exercicios = self.similares(limite=limite, equipamento=equipamento)
+                    self.assertEqual(len(exercicios), min(limite, atendem))
+                    self.assertTrue(
+                        all(e["equipment"] == equipamento for e in exercicios)
+                    )
+
+
+class ResumoDiarioTest(TestCase):
+    """Resumos diários e itens mantidos pelas escritas de treinos da API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        cls.personal = PersonalTrainer.objects.get(user=cls.user_personal)
+        cls.aluno = Aluno.objects.get(user=criar_usuario("aluno", ALUNO))
+        cls.aluno.personal_responsavel = cls.personal
+        cls.aluno.save()
+        cls.exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                category=["forca", "cardio"][i % 2],
+                primary_muscles=[],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for i in range(3)
+        )
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_personal)
+
+    def escrever(self, metodo, url, corpo=None):
+        # Os resumos são recalculados no commit
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = getattr(self.cliente, metodo)(url, corpo, format="json")
+        self.assertLess(resposta.status_code, 400, resposta.content)
+        return resposta
+
+    def resumo(self):
+        return (
+            ResumoDiario.objects.filter(aluno=self.aluno)
+            .values("total_treinos", "treinos_ativos", "total_itens", "total_series")
+            .first()
+        )
+
+    def categorias(self):
+        return dict(
+            ResumoDiarioCategoria.objects.filter(aluno=self.aluno).values_list(
+                "categoria", "total_series"
+            )
+        )
+
+    def test_criar_editar_excluir(self):
+        corpo = {
+            "nome_treino": "Treino A",
+            "aluno": self.aluno.pk,
+            "ativo": True,
+            "itens": [
+                {"exercicio_id": exercicio.pk, "series": series, "repeticoes": "10"}
+                for exercicio, series in zip(self.exercicios, (3, 4, 5))
+            ],
+        }
+        self.escrever("post", reverse("treino-list"), corpo)
+        self.assertEqual(
+            self.resumo(),
+            {
+                "total_treinos": 1,
+                "treinos_ativos": 1,
+                "total_itens": 3,
+                "total_series": 12,
+            },
+        )
+        self.assertEqual(self.categorias(), {"forca": 8, "cardio": 4})
+
+        treino = Treino.objects.get(aluno=self.aluno)
+        corpo["ativo"] = False
+        corpo["itens"] = corpo["itens"][:2]
+        corpo["itens"][0]["series"] = 6
+        self.escrever("put", reverse("treino-detail", kwargs={"pk": treino.pk}), corpo)
+        self.assertEqual(
+            self.resumo(),
+            {
+                "total_treinos": 1,
+                "treinos_ativos": 0,
+                "total_itens": 2,
+                "total_series": 10,
+            },
+        )
+        self.assertEqual(self.categorias(), {"forca": 6, "cardio": 4})
+
+        self.escrever("delete", reverse("treino-detail", kwargs={"pk": treino.pk}))
+        self.assertIsNone(self.resumo())
+        self.assertEqual(self.categorias(), {})
+
+    def test_put_mantem_ids_e_limpa_opcionais(self):
+        treino = Treino.objects.create(
+            aluno=self.aluno, personal_criador=self.personal, nome_treino="Treino B"
+        )
+        itens = ItemTreino.objects.bulk_create(
+            ItemTreino(
+                treino=treino,
+                exercicio=exercicio,
+                series=3,
+                repeticoes="10",
+                carga_kg=20,
+                observacoes="Devagar",
+            )
+            for exercicio in self.exercicios
+        )
+        sessao = SessaoTreino.objects.create(
+            treino=treino, aluno=self.aluno, inicio=timezone.now()
+        )
+        serie = SerieRealizada.objects.create(
+            sessao=sessao,
+            item=itens[2],
+            exercicio=self.exercicios[2],
+            numero=1,
+            repeticoes=10,
+            realizada_em=timezone.now(),
+        )
+
+        url = reverse("treino-detail", kwargs={"pk": treino.pk})
+        corpo = {
+            "nome_treino": "Treino B",
+            "aluno": self.aluno.pk,
+            "itens": [
+                {"exercicio_id": exercicio.pk, "series": 3, "repeticoes": "10"}
+                for exercicio in self.exercicios[:2]
+            ],
+        }
+        self.escrever("put", url, corpo)
+
+        restantes = {item.pk: item for item in treino.itens.all()}
+        self.assertEqual(set(restantes), {itens[0].pk, itens[1].pk})
+        # PUT: o que não veio no item volta ao padrão
+        for item in restantes.values():
+            self.assertIsNone(item.carga_kg)
+            self.assertIsNone(item.observacoes)
+        # A série do item removido fica, sem o item
+        serie.refresh_from_db()
+        self.assertIsNone(serie.item_id)
+
+        ItemTreino.objects.filter(treino=treino).update(carga_kg=30)
+        corpo["itens"][0]["series"] = 5
+        self.escrever("patch", url, {"itens": corpo["itens"]})
+        # PATCH: os campos ausentes ficam como estão
+        self.assertEqual(
+            sorted(treino.itens.values_list("series", "carga_kg")),
+            [(3, 30), (5, 30)],
+        )
+
+
+@override_settings(TIME_ZONE="America/Sao_Paulo")
+class SeriesDeCargaTest(TestCase):
+    """Período da evolução de carga, em dias do fuso local."""
+
+    def test_periodo_inclui_o_dia_final_inteiro(self):
+        aluno = Aluno.objects.get(
+            user=OrcamentoQueriesTest.criar_usuario("aluno", ALUNO)
+        )
+        exercicio = Exercicio.objects.create(
+            nome="Supino",
+            primary_muscles=[],
+            secondary_muscles=[],
+            instructions=[],
+            images=[],
+        )
+        # 23h30 do dia 10 em São Paulo já é dia 11 em UTC
+        horarios = (
+            datetime(2026, 3, 1, 0, 0),
+            datetime(2026, 3, 10, 23, 30),
+            datetime(2026, 3, 11, 0, 0),
+            datetime(2026, 2, 28, 23, 59),
+        )
+        HistoricoCarga.objects.bulk_create(
+            HistoricoCarga(
+                aluno=aluno,
+                exercicio=exercicio,
+                origem=HistoricoCarga.ORIGEM_FICHA,
+                carga_kg=20,
+                registrado_em=timezone.make_aware(horario),
+            )
+            for horario in horarios
+        )
+
+        _, series = series_de_carga(
+            aluno.pk, inicio=date(2026, 3, 1), fim=date(2026, 3, 10)
+        )
+        self.assertEqual(sum(ponto["registros"] for ponto in series[0]["pontos"]), 2)
+
+
+class FiltroTreinoTest(TestCase):
+    """Filtros da listagem de treinos pela query string."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        personal = PersonalTrainer.objects.get(user=cls.user_personal)
+        aluno = Aluno.objects.get(user=criar_usuario("aluno", ALUNO))
+        Treino.objects.bulk_create(
+            Treino(
+                aluno=aluno, personal_criador=personal, nome_treino=nome, ativo=ativo
+            )
+            for nome, ativo in (("A", True), ("B", False))
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_personal)
+
+    def test_ativo(self):
+        url = reverse("treino-list")
+        for valor, nomes in (("true", ["A"]), ("0", ["B"]), ("", ["A", "B"])):
+            with self.subTest(ativo=valor):
+                resposta = self.cliente.get(url, {"ativo": valor})
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(
+                    sorted(
+                        treino["nome_treino"] for treino in resposta.json()["results"]
+                    ),
+                    nomes,
+                )
+        # Um valor desconhecido não vira "sem filtro"
+        resposta = self.cliente.get(url, {"ativo": "talvez"})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn("ativo", resposta.json())
+
+
+class ModeloTreinoTest(TestCase):
+    """Modelos de treino gravados pela API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_personal = OrcamentoQueriesTest.criar_usuario("personal", PERSONAL)
+        cls.exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                primary_muscles=[],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for i in range(3)
+        )
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_personal)
+
+    def itens(self, exercicios, **campos):
+        return [
+            {"exercicio_id": exercicio.pk, "series": 3, "repeticoes": "12", **campos}
+            for exercicio in exercicios
+        ]
+
+    def test_put_casa_os_itens_pelo_exercicio(self):
+        resposta = self.cliente.post(
+            reverse("modelotreino-list"),
+            {
+                "nome": "Modelo",
+                "itens": self.itens(self.exercicios[:2], observacoes="Lento"),
+            },
+            format="json",
+        )
+        self.assertEqual(resposta.status_code, 201, resposta.content)
+        self.assertEqual(resposta.json()["personal_nome"], "Personal Teste")
+        modelo = ModeloTreino.objects.get(pk=resposta.json()["id"])
+        self.assertEqual(modelo.personal_criador.user, self.user_personal)
+        mantido = modelo.itens.get(exercicio=self.exercicios[0])
+
+        corpo = {"nome": "Modelo", "itens": self.itens(self.exercicios[::2], series=4)}
+        resposta = self.cliente.put(
+            reverse("modelotreino-detail", kwargs={"pk": modelo.pk}),
+            corpo,
+            format="json",
+        )
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        itens = {item.exercicio_id: item for item in modelo.itens.all()}
+        self.assertEqual(set(itens), {self.exercicios[0].pk, self.exercicios[2].pk})
+        self.assertEqual(itens[self.exercicios[0].pk].pk, mantido.pk)
+        self.assertEqual(itens[self.exercicios[0].pk].series, 4)
+        # PUT: as observações que não vieram voltam ao padrão
+        self.assertIsNone(itens[self.exercicios[0].pk].observacoes)
+
+    def test_personal_sem_perfil(self):
+        PersonalTrainer.objects.filter(user=self.user_personal).delete()
+        resposta = self.cliente.post(
+            reverse("modelotreino-list"),
+            {"nome": "Modelo", "itens": self.itens(self.exercicios[:1])},
+            format="json",
+        )
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn("personal_criador", resposta.json())
+
+
+class PaginacaoCursorTest(TestCase):
+    """Páginas por cursor das listagens da API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        personal = PersonalTrainer.objects.get(user=cls.user_personal)
+        aluno = Aluno.objects.get(user=criar_usuario("aluno", ALUNO))
+        treinos = Treino.objects.bulk_create(
+            Treino(aluno=aluno, personal_criador=personal, nome_treino=f"T{i}")
+            for i in range(250)
+        )
+        # Metade com a mesma data: o id desempata
+        Treino.objects.filter(pk__in=[t.pk for t in treinos[::2]]).update(
+            data_criacao=timezone.now() - timedelta(days=1)
+        )
+        cls.ordem = list(
+            Treino.objects.order_by("-data_criacao", "-id").values_list("pk", flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_personal)
+
+    def pagina(self, url, parametros=None):
+        resposta = self.cliente.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_primeira_pagina_e_seguintes(self):
+        pagina = self.pagina(reverse("treino-list"))
+        self.assertEqual(len(pagina["results"]), 50)
+        self.assertIsNone(pagina["previous"])
+        self.assertNotIn("count", pagina)
+
+        ids = [treino["id"] for treino in pagina["results"]]
+        segunda = self.pagina(pagina["next"])
+        ids += [treino["id"] for treino in segunda["results"]]
+        self.assertEqual(ids, self.ordem[:100])
+        anterior = self.pagina(segunda["previous"])
+        self.assertEqual([t["id"] for t in anterior["results"]], self.ordem[:50])
+
+    def test_ordem_estavel_com_datas_iguais(self):
+        # Páginas pequenas cortam o grupo de datas iguais várias vezes
+        ids = []
+        pagina = self.pagina(reverse("treino-list"), {"page_size": 7})
+        while True:
+            ids += [treino["id"] for treino in pagina["results"]]
+            if not pagina["next"]:
+                break
+            pagina = self.pagina(pagina["next"])
+        self.assertEqual(ids, self.ordem)
+
+    def test_page_size_limitado(self):
+        pagina = self.pagina(reverse("treino-list"), {"page_size": 1000})
+        self.assertEqual(len(pagina["results"]), 200)
+        self.assertIsNotNone(pagina["next"])
+
+
+class LeituraRapidaTest(TestCase):
+    """O leitor rápido gera o mesmo JSON que o serializer, byte a byte."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        academia = Academia.objects.create(
+            nome_fantasia="Academia", cnpj="1", endereco="Rua", telefone="1"
+        )
+        personal = PersonalTrainer.objects.get(
+            user=criar_usuario("personal", PERSONAL, academia)
+        )
+        completo = Aluno.objects.get(user=criar_usuario("aluno", ALUNO, academia))
+        completo.personal_responsavel = personal
+        completo.academia = academia
+        completo.data_nascimento = date(1990, 5, 17)
+        completo.save()
+        # Sem personal, academia nem data de nascimento
+        sem_vinculos = Aluno.objects.get(user=criar_usuario("avulso", ALUNO))
+
+        exercicios = Exercicio.objects.bulk_create(
+            [
+                Exercicio(
+                    nome="Supino",
+                    category="strength",
+                    equipment="barbell",
+                    level="beginner",
+                    primary_muscles=["chest"],
+                    secondary_muscles=["triceps"],
+                    instructions=["Empurrar"],
+                    images=[],
+                ),
+                # Campos opcionais vazios
+                Exercicio(
+                    nome="Prancha",
+                    primary_muscles=[],
+                    secondary_muscles=[],
+                    instructions=[],
+                    images=[],
+                ),
+            ]
+        )
+        com_itens = Treino.objects.create(
+            aluno=completo, personal_criador=personal, nome_treino="Com itens"
+        )
+        ItemTreino.objects.bulk_create(
+            ItemTreino(treino=com_itens, exercicio=exercicio, series=3, repeticoes="10")
+            for exercicio in exercicios
+        )
+        # Sem itens e sem personal criador
+        Treino.objects.create(aluno=sem_vinculos, nome_treino="Vazio", ativo=False)
+
+    def assertMesmoJson(self, modelo, serializer_class, leitor):
+        renderizar = JSONRenderer().render
+        queryset = modelo.objects.order_by("pk")
+        preparar = getattr(serializer_class, "preparar_queryset", None)
+        if preparar:
+            queryset = preparar(queryset)
+        esperado = renderizar(serializer_class(queryset, many=True).data)
+        self.assertGreater(len(json.loads(esperado)), 1)
+        self.assertEqual(
+            renderizar(leitor.montar(queryset.values(*leitor.caminhos()))), esperado
+        )
+
+    def test_exercicios(self):
+        self.assertMesmoJson(Exercicio, ExercicioListSerializer, LEITOR_EXERCICIOS)
+
+    def test_treinos(self):
+        self.assertMesmoJson(Treino, TreinoListSerializer, LEITOR_TREINOS)
+
+    def test_alunos(self):
+        self.assertMesmoJson(Aluno, AlunoListSerializer, LEITOR_ALUNOS)
+
+
+class SessaoTreinoApiTest(TestCase):
+    """Sessões e lotes de séries pela API: acesso, validação e queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_aluno = criar_usuario("aluno", ALUNO)
+        cls.user_outro = criar_usuario("outro", ALUNO)
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        cls.user_rival = criar_usuario("rival", PERSONAL)
+        personal = PersonalTrainer.objects.get(user=cls.user_personal)
+
+        exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                primary_muscles=[],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for i in range(max(ITENS_POR_LOTE))
+        )
+        cls.treino = Treino.objects.create(
+            aluno=Aluno.objects.get(user=cls.user_aluno),
+            personal_criador=personal,
+            nome_treino="Ficha",
+        )
+        cls.itens = ItemTreino.objects.bulk_create(
+            ItemTreino(
+                treino=cls.treino, exercicio=exercicio, series=3, repeticoes="10"
+            )
+            for exercicio in exercicios
+        )
+        outro_treino = Treino.objects.create(
+            aluno=Aluno.objects.get(user=cls.user_outro),
+            personal_criador=personal,
+            nome_treino="Ficha do outro",
+        )
+        cls.item_alheio = ItemTreino.objects.create(
+            treino=outro_treino, exercicio=exercicios[0], series=3, repeticoes="10"
+        )
+
+    def cliente(self, user):
+        cliente = APIClient()
+        cliente.force_authenticate(user)
+        return cliente
+
+    def series(self, itens, carga=20):
+        return [
+            {"item": item.pk, "numero": 1, "repeticoes": 10, "carga_kg": carga}
+            for item in itens
+        ]
+
+    def nova_sessao(self, user=None, **campos):
+        return self.cliente(user or self.user_aluno).post(
+            reverse("sessaotreino-list"),
+            {"treino": self.treino.pk, "inicio": timezone.now(), **campos},
+            format="json",
+        )
+
+    def test_sessao_com_series_gera_pontos_de_carga(self):
+        resposta = self.nova_sessao(series=self.series(self.itens[:2], carga=35))
+        self.assertEqual(resposta.status_code, 201, resposta.content)
+        sessao = SessaoTreino.objects.get(pk=resposta.json()["id"])
+        self.assertEqual(sessao.aluno.user, self.user_aluno)
+        self.assertEqual(sessao.series.count(), 2)
+        self.assertEqual(
+            set(
+                HistoricoCarga.objects.filter(sessao=sessao).values_list(
+                    "exercicio_id", "origem", "carga_kg"
+                )
+            ),
+            {
+                (item.exercicio_id, HistoricoCarga.ORIGEM_SESSAO, Decimal(35))
+                for item in self.itens[:2]
+            },
+        )
+
+    def test_treino_de_outro_dono(self):
+        for user in (self.user_outro, self.user_rival):
+            with self.subTest(user=user.username):
+                resposta = self.nova_sessao(user)
+                self.assertEqual(resposta.status_code, 400, resposta.content)
+                self.assertIn("treino", resposta.json())
+        self.assertFalse(SessaoTreino.objects.exists())
+
+    def test_lote_em_sessao_de_outro_aluno(self):
+        sessao = self.nova_sessao().json()["id"]
+        resposta = self.cliente(self.user_outro).post(
+            reverse("sessaotreino-series", kwargs={"pk": sessao}),
+            {"series": self.series(self.itens[:1])},
+            format="json",
+        )
+        self.assertEqual(resposta.status_code, 404)
+        self.assertFalse(SerieRealizada.objects.exists())
+
+    def test_item_de_outro_treino(self):
+        series = self.series([self.itens[0], self.item_alheio])
+        resposta = self.nova_sessao(series=series)
+        self.assertEqual(resposta.status_code, 400, resposta.content)
+        self.assertFalse(SessaoTreino.objects.exists())
+
+        sessao = self.nova_sessao().json()["id"]
+        resposta = self.cliente(self.user_aluno).post(
+            reverse("sessaotreino-series", kwargs={"pk": sessao}),
+            {"series": series},
+            format="json",
+        )
+        self.assertEqual(resposta.status_code, 400, resposta.content)
+        self.assertIn(str(self.item_alheio.pk), resposta.json()["series"][0])
+        self.assertFalse(SerieRealizada.objects.exists())
+        self.assertFalse(HistoricoCarga.objects.filter(sessao_id=sessao).exists())
+
+    def test_queries_do_lote_nao_crescem_com_as_series(self):
+        cliente = self.cliente(self.user_aluno)
+        contagens = []
+        for tamanho in ITENS_POR_LOTE:
+            sessao = self.nova_sessao().json()["id"]
+            with CaptureQueriesContext(connection) as queries:
+                resposta = cliente.post(
+                    reverse("sessaotreino-series", kwargs={"pk": sessao}),
+                    {"series": self.series(self.itens[:tamanho])},
+                    format="json",
+                )
+            self.assertEqual(resposta.status_code, 201, resposta.content)
+            self.assertEqual(resposta.json(), {"registradas": tamanho})
+            contagens.append(len(queries))
+
+        self.assertLessEqual(max(contagens), ORCAMENTO_LOTE_SERIES)
+        self.assertEqual(len(set(contagens)), 1, dict(zip(ITENS_POR_LOTE, contagens)))
+
+
+class DashboardKpisAlunoTest(TestCase):
+    """KPIs do aluno lidos dos contadores, como vistos no dia da consulta."""
+
+    # Uma quarta-feira: a semana dela começa na segunda, dia 12
+    HOJE = date(2026, 10, 14)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_aluno = OrcamentoQueriesTest.criar_usuario("aluno", ALUNO)
+        cls.aluno = Aluno.objects.get(user=cls.user_aluno)
+        treino = Treino.objects.create(aluno=cls.aluno, nome_treino="Ficha")
+        inicio = timezone.make_aware(datetime(2026, 10, 1, 18))
+        with mock.patch("django.utils.timezone.localdate", return_value=cls.HOJE):
+            for dia, minutos in ((1, 30), (13, 45), (14, 45)):
+                inicio = inicio.replace(day=dia)
+                SessaoTreino.objects.create(
+                    treino=treino,
+                    aluno=cls.aluno,
+                    inicio=inicio,
+                    fim=inicio + timedelta(minutes=minutos),
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_aluno)
+
+    def kpis(self, dia, **cabecalhos):
+        with mock.patch("django.utils.timezone.localdate", return_value=dia):
+            resposta = self.cliente.get(
+                reverse("dashboard_composto"), {"widgets": "kpis"}, **cabecalhos
+            )
+        self.assertEqual(resposta.status_code, 200)
+        return resposta["ETag"], resposta.json()["kpis"]
+
+    def test_kpis_do_dia(self):
+        _, kpis = self.kpis(self.HOJE)
+        self.assertEqual(kpis["sequencia_dias"], 2)
+        self.assertEqual(kpis["maior_sequencia"], 2)
+        self.assertEqual(kpis["tempo_total_minutos"], 120)
+        self.assertEqual(kpis["minutos_semana"], 90)
+        self.assertEqual(kpis["meta_semanal_atual"], 2)
+
+        with mock.patch("django.utils.timezone.localdate", return_value=self.HOJE):
+            achatado = self.cliente.get(reverse("dashboard_aluno")).json()
+        self.assertEqual({nome: achatado[nome] for nome in kpis}, kpis)
+
+    def test_virada_do_dia_e_da_semana_sem_escritas(self):
+        etag, _ = self.kpis(self.HOJE)
+
+        # Sem treinar por dois dias a sequência some, mesmo com o ETag antigo
+        etag_depois, kpis = self.kpis(
+            self.HOJE + timedelta(days=2), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertNotEqual(etag_depois, etag)
+        self.assertEqual(kpis["sequencia_dias"], 0)
+        self.assertEqual(kpis["maior_sequencia"], 2)
+        self.assertEqual(kpis["meta_semanal_atual"], 2)
+
+        _, kpis = self.kpis(self.HOJE + timedelta(days=5))
+        self.assertEqual(kpis["meta_semanal_atual"], 0)
+        self.assertEqual(kpis["minutos_semana"], 0)
+        self.assertEqual(kpis["tempo_total_minutos"], 120)
+
+
+@override_settings(RELATORIOS_TAREFAS_TTL=600)
+class TarefaRelatorioTest(TestCase):
+    """Relatórios pedidos com ?async=1 e as tarefas que os geram."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_admin = criar_usuario("admin", ADMIN_SISTEMA)
+        cls.user_outro_admin = criar_usuario("outro", ADMIN_SISTEMA)
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+
+    def setUp(self):
+        cache.clear()
+        self.liberar = threading.Event()
+        self.geracoes = []
+
+        def montar_dados(view, request):
+            self.geracoes.append(request.query_params.get("periodo"))
+            if not self.liberar.wait(5):
+                raise TimeoutError("geração não liberada")
+            if request.query_params.get("periodo") == "semana":
+                raise ValueError("falha na geração")
+            return {"periodo": request.query_params.get("periodo")}
+
+        gerar = mock.patch.object(RelatorioAdminView, "montar_dados", montar_dados)
+        gerar.start()
+        self.addCleanup(gerar.stop)
+        # Não deixa a thread do pool presa se o teste falhar antes de liberar
+        self.addCleanup(self.liberar.set)
+
+    def cliente(self, user=None):
+        cliente = APIClient()
+        cliente.force_authenticate(user or self.user_admin)
+        return cliente
+
+    def pedir(self, user=None, periodo="ano"):
+        return self.cliente(user).get(
+            reverse("relatorio_admin"), {"periodo": periodo, "async": "1"}
+        )
+
+    def consultar(self, tarefa_id, user=None, resultado=False):
+        rota = "relatorio_tarefa_resultado" if resultado else "relatorio_tarefa"
+        return self.cliente(user).get(reverse(rota, kwargs={"tarefa_id": tarefa_id}))
+
+    def esperar(self, tarefa_id):
+        tarefa = obter_tarefa(uuid.UUID(tarefa_id), self.user_admin.pk)
+        for _ in range(500):
+            if tarefa.finalizada:
+                return tarefa
+            time.sleep(0.01)
+        self.fail(f"tarefa {tarefa_id} não terminou")
+
+    def test_tarefa_ate_o_resultado(self):
+        resposta = self.pedir()
+        self.assertEqual(resposta.status_code, 202)
+        tarefa = resposta.json()
+        self.assertEqual(set(tarefa), {"tarefa_id", "status", "erro"})
+        self.assertIn(tarefa["status"], (PENDENTE, EXECUTANDO))
+        tarefa_id = tarefa["tarefa_id"]
+
+        andamento = self.consultar(tarefa_id)
+        self.assertEqual(andamento.status_code, 200)
+        self.assertIn(andamento.json()["status"], (PENDENTE, EXECUTANDO))
+        self.assertEqual(self.consultar(tarefa_id, resultado=True).status_code, 202)
+
+        self.liberar.set()
+        self.esperar(tarefa_id)
+        self.assertEqual(self.consultar(tarefa_id).json()["status"], CONCLUIDA)
+        resultado = self.consultar(tarefa_id, resultado=True)
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(resultado.json(), {"periodo": "ano"})
+
+        # Com o relatório no cache, o próximo pedido já volta pronto
+        resposta = self.pedir()
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), {"periodo": "ano"})
+        self.assertEqual(self.geracoes, ["ano"])
+
+    def test_pedidos_iguais_anexados_a_mesma_tarefa(self):
+        tarefa_id = self.pedir().json()["tarefa_id"]
+        self.assertEqual(self.pedir().json()["tarefa_id"], tarefa_id)
+        # Outro usuário com a mesma chave entra na tarefa e pode consultá-la
+        self.assertEqual(
+            self.pedir(self.user_outro_admin).json()["tarefa_id"], tarefa_id
+        )
+        self.assertEqual(
+            self.consultar(tarefa_id, self.user_outro_admin).status_code, 200
+        )
+        outra = self.pedir(periodo="mes").json()["tarefa_id"]
+        self.assertNotEqual(outra, tarefa_id)
+
+        self.liberar.set()
+        self.esperar(tarefa_id)
+        self.esperar(outra)
+        self.assertEqual(sorted(self.geracoes), ["ano", "mes"])
+
+    def test_tarefa_de_outro_usuario(self):
+        tarefa_id = self.pedir().json()["tarefa_id"]
+        self.liberar.set()
+        self.esperar(tarefa_id)
+
+        for resultado in (False, True):
+            resposta = self.consultar(tarefa_id, self.user_personal, resultado)
+            self.assertEqual(resposta.status_code, 404)
+        self.assertEqual(self.consultar(str(uuid.uuid4())).status_code, 404)
+
+    def test_erro_na_geracao(self):
+        tarefa_id = self.pedir(periodo="semana").json()["tarefa_id"]
+        self.liberar.set()
+        self.esperar(tarefa_id)
+
+        andamento = self.consultar(tarefa_id).json()
+        self.assertEqual(andamento["status"], ERRO)
+        self.assertEqual(andamento["erro"], "falha na geração")
+        self.assertEqual(self.consultar(tarefa_id, resultado=True).status_code, 500)
+
+    def test_tarefas_finalizadas_expiram_depois_do_ttl(self):
+        self.liberar.set()
+        expirada = self.pedir().json()["tarefa_id"]
+        recente = self.pedir(periodo="mes").json()["tarefa_id"]
+        self.esperar(expirada).concluida_em -= 601
+        self.esperar(recente).concluida_em -= 599
+
+        # As expiradas são descartadas quando a próxima tarefa entra na fila
+        self.esperar(self.pedir(periodo="trimestre").json()["tarefa_id"])
+        self.assertEqual(self.consultar(expirada).status_code, 404)
+        self.assertEqual(self.consultar(recente).status_code, 200)
+
+
+class CamposDinamicosTest(TestCase):
+    """?fields= e ?expand= nas leituras e o que cada seleção carrega."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_admin = criar_usuario("admin", ADMIN_SISTEMA)
+        academia = Academia.objects.create(
+            nome_fantasia="Academia", cnpj="1", endereco="Rua", telefone="1"
+        )
+        personal = PersonalTrainer.objects.get(
+            user=criar_usuario("personal", PERSONAL, academia)
+        )
+        exercicio = Exercicio.objects.create(
+            nome="Supino",
+            primary_muscles=[],
+            secondary_muscles=[],
+            instructions=[],
+            images=[],
+        )
+        for i in range(4):
+            aluno = Aluno.objects.get(user=criar_usuario(f"aluno{i}", ALUNO, academia))
+            aluno.personal_responsavel = personal
+            aluno.academia = academia
+            aluno.save()
+            treino = Treino.objects.create(
+                aluno=aluno, personal_criador=personal, nome_treino=f"Treino {i}"
+            )
+            ItemTreino.objects.create(
+                treino=treino, exercicio=exercicio, series=3, repeticoes="10"
+            )
+        cls.aluno, cls.personal, cls.academia = aluno, personal, academia
+        cls.treino = treino
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_admin)
+
+    def ler(self, rota, parametros, **kwargs):
+        resposta = self.cliente.get(reverse(rota, kwargs=kwargs), parametros)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        dados = resposta.json()
+        return dados["results"] if "results" in dados else dados
+
+    def test_fields_ignora_nomes_desconhecidos(self):
+        detalhe = self.ler(
+            "aluno-detail", {"fields": "objetivo, inexistente"}, pk=self.aluno.pk
+        )
+        self.assertEqual(list(detalhe), ["objetivo"])
+        self.assertEqual(
+            self.ler("aluno-detail", {"fields": "inexistente"}, pk=self.aluno.pk), {}
+        )
+        # Listagem pelo leitor rápido e pelo serializer (com ?expand=)
+        for parametros in (
+            {"fields": "id,nome,inexistente"},
+            {"fields": "id,nome,inexistente", "expand": "inexistente"},
+        ):
+            with self.subTest(**parametros):
+                for linha in self.ler("aluno-list", parametros):
+                    self.assertEqual(list(linha), ["id", "nome"])
+
+    def test_expand_renderiza_so_os_aninhados_pedidos(self):
+        detalhe = self.ler(
+            "aluno-detail", {"expand": "personal_responsavel"}, pk=self.aluno.pk
+        )
+        self.assertEqual(detalhe["user"], self.aluno.pk)
+        self.assertEqual(detalhe["academia"], self.academia.pk)
+        self.assertEqual(detalhe["personal_responsavel"]["id"], self.personal.pk)
+        self.assertEqual(detalhe["personal_responsavel"]["total_alunos"], 4)
+        self.assertEqual(
+            detalhe["personal_responsavel"]["user"]["id"], self.personal.pk
+        )
+
+        # Sem ?expand= tudo vem completo; com ?fields= só expande o que foi pedido
+        self.assertEqual(
+            self.ler("aluno-detail", {}, pk=self.aluno.pk)["academia"]["total_alunos"],
+            4,
+        )
+        detalhe = self.ler(
+            "aluno-detail",
+            {"fields": "user", "expand": "user,academia"},
+            pk=self.aluno.pk,
+        )
+        self.assertEqual(list(detalhe), ["user"])
+        self.assertEqual(detalhe["user"]["email"], self.aluno.user.email)
+
+    def test_expand_de_listas_e_do_nivel_de_baixo(self):
+        detalhe = self.ler("treino-detail", {"expand": "aluno"}, pk=self.treino.pk)
+        self.assertEqual(detalhe["personal_criador"], self.personal.pk)
+        self.assertEqual(detalhe["itens"], [self.treino.itens.get().pk])
+        # Os aninhados do aluno seguem completos: ?expand= vale só na raiz
+        self.assertEqual(detalhe["aluno"]["user"]["id"], self.aluno.pk)
+        self.assertEqual(detalhe["aluno"]["total_treinos"], 1)
+
+        detalhe = self.ler("treino-detail", {"expand": "itens"}, pk=self.treino.pk)
+        self.assertEqual(detalhe["itens"][0]["exercicio"]["nome"], "Supino")
+        self.assertEqual(detalhe["aluno"], self.aluno.pk)
+
+    def test_campos_omitidos_nao_sao_anotados(self):
+        def queries(parametros):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.ler("aluno-list", parametros)
+            return [query["sql"] for query in capturadas.captured_queries]
+
+        for parametros in ({}, {"expand": "user"}):
+            with self.subTest(**parametros):
+                completas = queries(parametros)
+                self.assertTrue(any("COUNT(" in sql for sql in completas))
+                enxutas = queries({"fields": "id,user,objetivo", **parametros})
+                self.assertFalse(any("COUNT(" in sql for sql in enxutas))
+                self.assertLessEqual(len(enxutas), len(completas))
+
+        sem_totais = queries({"fields": "id,objetivo", "expand": "academia"})
+        self.assertFalse(any("treinos_treino" in sql for sql in sem_totais))
+
+    def test_sem_anotacao_conta_por_objeto(self):
+        serializer = AlunoDetailSerializer()
+        alunos = list(Aluno.objects.all())
+        with self.assertNumQueries(len(alunos)):
+            totais = [serializer.get_total_treinos(aluno) for aluno in alunos]
+        self.assertEqual(totais, [1] * len(alunos))
+
+        alunos = list(AlunoDetailSerializer.preparar_queryset(Aluno.objects.all()))
+        with self.assertNumQueries(0):
+            totais = [serializer.get_total_treinos(aluno) for aluno in alunos]
+        self.assertEqual(totais, [1] * len(alunos))
+
+
+class ExportacaoTreinosTest(TestCase):
+    """Exportação dos treinos em streaming, pela API e pelo comando."""
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        academias = Academia.objects.bulk_create(
+            Academia(nome_fantasia=nome, cnpj=nome, endereco="Rua", telefone="1")
+            for nome in ("A", "B")
+        )
+        cls.users = {
+            "sistema": criar_usuario("sistema", ADMIN_SISTEMA),
+            "admin": criar_usuario("admin", ADMIN, academias[0]),
+            "personal": criar_usuario("personal", PERSONAL, academias[0]),
+            "rival": criar_usuario("rival", PERSONAL, academias[1]),
+            "aluno": criar_usuario("aluno", ALUNO, academias[0]),
+            "outro": criar_usuario("outro", ALUNO, academias[1]),
+        }
+        personal = PersonalTrainer.objects.get(user=cls.users["personal"])
+        rival = PersonalTrainer.objects.get(user=cls.users["rival"])
+        aluno = Aluno.objects.get(user=cls.users["aluno"])
+        outro = Aluno.objects.get(user=cls.users["outro"])
+        for dono, academia in ((aluno, academias[0]), (outro, academias[1])):
+            dono.academia = academia
+            dono.save()
+
+        supino, corrida = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=nome,
+                category=categoria,
+                primary_muscles=[],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for nome, categoria in (("Supino", "strength"), ("Corrida", "cardio"))
+        )
+        cls.com_itens = Treino.objects.create(
+            aluno=aluno, personal_criador=personal, nome_treino="Com itens"
+        )
+        ItemTreino.objects.create(
+            treino=cls.com_itens,
+            exercicio=supino,
+            series=3,
+            repeticoes="10",
+            carga_kg=42,
+            observacoes="Lento, na descida",
+        )
+        ItemTreino.objects.create(
+            treino=cls.com_itens, exercicio=corrida, series=1, repeticoes="20min"
+        )
+        cls.sem_itens = Treino.objects.create(
+            aluno=aluno, nome_treino="Sem itens", ativo=False
+        )
+        cls.alheio = Treino.objects.create(
+            aluno=outro, personal_criador=rival, nome_treino="Alheio"
+        )
+        ItemTreino.objects.create(
+            treino=cls.alheio, exercicio=supino, series=4, repeticoes="8"
+        )
+
+    def exportar(self, usuario="sistema", **parametros):
+        cliente = APIClient()
+        cliente.force_authenticate(self.users[usuario])
+        resposta = cliente.get(reverse("treino-exportar"), parametros)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        return resposta, b"".join(resposta.streaming_content).decode()
+
+    def treinos_ndjson(self, usuario="sistema", **parametros):
+        _, conteudo = self.exportar(usuario, **parametros)
+        return [json.loads(linha) for linha in conteudo.splitlines()]
+
+    def test_ndjson_um_treino_por_linha(self):
+        resposta, conteudo = self.exportar(formato="ndjson")
+        self.assertEqual(resposta["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="treinos.ndjson"', resposta["Content-Disposition"])
+        self.assertTrue(conteudo.endswith("\n"))
+
+        treinos = [json.loads(linha) for linha in conteudo.splitlines()]
+        self.assertEqual(
+            [treino["treino_id"] for treino in treinos],
+            [self.com_itens.pk, self.sem_itens.pk, self.alheio.pk],
+        )
+        com_itens, sem_itens, _ = treinos
+        self.assertEqual(list(com_itens), [*COLUNAS_TREINO, "itens"])
+        self.assertEqual(com_itens["aluno_email"], "aluno@athlos.test")
+        self.assertEqual(com_itens["academia_id"], self.users["admin"].academia_id)
+        self.assertEqual(
+            [(item["exercicio"], item["categoria"]) for item in com_itens["itens"]],
+            [("Supino", "strength"), ("Corrida", "cardio")],
+        )
+        self.assertEqual(com_itens["itens"][0]["carga_kg"], 42)
+        self.assertIsNone(com_itens["itens"][1]["carga_kg"])
+        self.assertEqual(sem_itens["itens"], [])
+        self.assertIsNone(sem_itens["personal_id"])
+        self.assertIsNone(sem_itens["personal_nome"])
+        self.assertIs(sem_itens["ativo"], False)
+
+    def test_csv_uma_linha_por_item(self):
+        resposta, conteudo = self.exportar(formato="csv")
+        self.assertEqual(resposta["Content-Type"], "text/csv; charset=utf-8")
+
+        cabecalho, *linhas = csv.reader(io.StringIO(conteudo))
+        self.assertEqual(cabecalho, [*COLUNAS_TREINO, *COLUNAS_ITEM])
+        linhas = [dict(zip(cabecalho, linha)) for linha in linhas]
+        self.assertEqual(
+            [(linha["treino_id"], linha["exercicio"]) for linha in linhas],
+            [
+                (str(self.com_itens.pk), "Supino"),
+                (str(self.com_itens.pk), "Corrida"),
+                (str(self.sem_itens.pk), ""),
+                (str(self.alheio.pk), "Supino"),
+            ],
+        )
+        supino, corrida, sem_itens, _ = linhas
+        self.assertEqual(supino["observacoes"], "Lento, na descida")
+        self.assertEqual(supino["carga_kg"], "42")
+        self.assertEqual(supino["ativo"], "1")
+        self.assertEqual(corrida["carga_kg"], "")
+        self.assertEqual(sem_itens["ativo"], "0")
+        self.assertEqual(sem_itens["personal_id"], "")
+        self.assertEqual(sem_itens["item_id"], "")
+
+    def test_exportacao_limitada_ao_papel(self):
+        esperados = {
+            "sistema": [self.com_itens, self.sem_itens, self.alheio],
+            "admin": [self.com_itens, self.sem_itens],
+            "personal": [self.com_itens],
+            "rival": [self.alheio],
+            "aluno": [self.com_itens, self.sem_itens],
+            "outro": [self.alheio],
+        }
+        for usuario, treinos in esperados.items():
+            with self.subTest(usuario=usuario):
+                self.assertEqual(
+                    [linha["treino_id"] for linha in self.treinos_ndjson(usuario)],
+                    [treino.pk for treino in treinos],
+                )
+        # Os filtros da listagem valem dentro do que o papel vê
+        self.assertEqual(
+            [linha["treino_id"] for linha in self.treinos_ndjson("aluno", ativo="0")],
+            [self.sem_itens.pk],
+        )
+
+    def test_formato_invalido(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.users["sistema"])
+        resposta = cliente.get(reverse("treino-exportar"), {"formato": "xml"})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.json()["disponiveis"], ["csv", "ndjson"])
+
+    def test_uma_consulta_de_itens_por_lote(self):
+        for tamanho_lote, lotes in ((1, 3), (2, 2), (3, 1), (TAMANHO_LOTE, 1)):
+            with self.subTest(tamanho_lote=tamanho_lote):
+                with CaptureQueriesContext(connection) as queries:
+                    linhas = list(linhas_ndjson(Treino.objects.all(), tamanho_lote))
+                self.assertEqual(len(linhas), 3)
+                consultas_de_itens = [
+                    query
+                    for query in queries.captured_queries
+                    if 'FROM "treinos_itemtreino"' in query["sql"]
+                ]
+                self.assertEqual(len(consultas_de_itens), lotes)
+                self.assertEqual(len(queries), lotes + 1)
+
+    def test_comando_igual_a_api(self):
+        for formato in GERADORES:
+            with self.subTest(formato=formato):
+                saida = io.StringIO()
+                call_command(
+                    "exportar_treinos",
+                    formato=formato,
+                    usuario="personal@athlos.test",
+                    lote=1,
+                    stdout=saida,
+                )
+                _, conteudo = self.exportar("personal", formato=formato)
+                self.assertEqual(saida.getvalue(), conteudo)
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "treinos.csv")
+            saida = io.StringIO()
+            call_command("exportar_treinos", formato="csv", saida=caminho, stdout=saida)
+            with open(caminho, encoding="utf-8", newline="") as arquivo:
+                self.assertEqual(arquivo.read(), self.exportar(formato="csv")[1])
+        self.assertIn("5 linha(s) exportada(s)", saida.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("exportar_treinos", usuario="ninguem@athlos.test")
+
+
+@override_settings(TIME_ZONE="America/Sao_Paulo")
+class ProgressoCargaPersonalTest(TestCase):
+    """Progresso de carga do relatório do personal, do histórico de carga."""
+
+    # Uma quarta-feira; as quatro semanas do relatório começam em 21/09
+    HOJE = date(2026, 10, 14)
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario = OrcamentoQueriesTest.criar_usuario
+        cls.user_personal = criar_usuario("personal", PERSONAL)
+        personal = PersonalTrainer.objects.get(user=cls.user_personal)
+        cls.user_aluno = criar_usuario("aluno", ALUNO)
+        cls.alunos = []
+        for user in (cls.user_aluno, criar_usuario("colega", ALUNO)):
+            aluno = Aluno.objects.get(user=user)
+            aluno.personal_responsavel = personal
+            aluno.save()
+            cls.alunos.append(aluno)
+        # Aluno de outro personal
+        alheio = Aluno.objects.get(user=criar_usuario("alheio", ALUNO))
+
+        agachamento, supino, remada, rosca = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=nome,
+                primary_muscles=[],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for nome in ("Agachamento livre", "Supino", "Remada", "Rosca")
+        )
+        aluno, colega = cls.alunos
+        pontos = [
+            (aluno, agachamento, 999, datetime(2026, 9, 20, 12)),
+            (aluno, agachamento, 40, datetime(2026, 9, 22, 12)),
+            (aluno, agachamento, 50, datetime(2026, 9, 23, 12)),
+            (aluno, agachamento, 60, datetime(2026, 10, 13, 12)),
+            (colega, supino, 30, datetime(2026, 9, 28, 0, 30)),
+            # Domingo à noite: ainda é a semana de 28/09 no fuso local
+            (colega, supino, 40, datetime(2026, 10, 4, 23, 30)),
+            (aluno, remada, 20, datetime(2026, 10, 5, 12)),
+            (aluno, remada, 30, datetime(2026, 10, 12, 12)),
+            (aluno, rosca, 10, datetime(2026, 10, 6, 12)),
+            (alheio, supino, 999, datetime(2026, 10, 13, 12)),
+        ]
+        HistoricoCarga.objects.bulk_create(
+            HistoricoCarga(
+                aluno=dono,
+                exercicio=exercicio,
+                origem=HistoricoCarga.ORIGEM_FICHA,
+                carga_kg=carga,
+                registrado_em=timezone.make_aware(quando),
+            )
+            for dono, exercicio, carga, quando in pontos
+        )
+        cls.treino = Treino.objects.create(
+            aluno=aluno, personal_criador=personal, nome_treino="Ficha"
+        )
+        cls.item = ItemTreino.objects.create(
+            treino=cls.treino, exercicio=rosca, series=3, repeticoes="10"
+        )
+
+    def setUp(self):
+        cache.clear()
+        hoje = mock.patch("django.utils.timezone.localdate", return_value=self.HOJE)
+        hoje.start()
+        self.addCleanup(hoje.stop)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.user_personal)
+
+    def relatorio(self, **parametros):
+        resposta = self.cliente.get(reverse("relatorio_personal"), parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_media_semanal_dos_exercicios_mais_registrados(self):
+        with CaptureQueriesContext(connection) as queries:
+            progresso = self.relatorio().json()["progresso_carga"]
+        self.assertEqual(
+            progresso,
+            [
+                {"semana": "Sem 1", "Agachament": 45.0, "Supino": None, "Remada": None},
+                {"semana": "Sem 2", "Agachament": None, "Supino": 35.0, "Remada": None},
+                {"semana": "Sem 3", "Agachament": None, "Supino": None, "Remada": 20.0},
+                {"semana": "Sem 4", "Agachament": 60.0, "Supino": None, "Remada": 30.0},
+            ],
+        )
+        # Uma consulta ao histórico, no lugar de uma média por semana
+        historico = [
+            query
+            for query in queries.captured_queries
+            if "treinos_historicocarga" in query["sql"]
+        ]
+        self.assertEqual(len(historico), 1)
+
+    def test_filtro_por_aluno(self):
+        progresso = self.relatorio(aluno_id=self.alunos[1].pk).json()["progresso_carga"]
+        self.assertEqual(
+            [semana.get("Supino") for semana in progresso], [None, 35.0, None, None]
+        )
+        self.assertEqual(
+            {chave for semana in progresso for chave in semana}, {"semana", "Supino"}
+        )
+
+    def test_series_da_sessao_invalidam_o_relatorio(self):
+        etag = self.relatorio()["ETag"]
+
+        aluno = APIClient()
+        aluno.force_authenticate(self.user_aluno)
+        with self.captureOnCommitCallbacks(execute=True):
+            sessao = aluno.post(
+                reverse("sessaotreino-list"),
+                {"treino": self.treino.pk, "inicio": timezone.now()},
+                format="json",
+            ).json()["id"]
+        self.assertNotEqual(self.relatorio()["ETag"], etag)
+        etag = self.relatorio()["ETag"]
+
+        resposta = aluno.post(
+            reverse("sessaotreino-series", kwargs={"pk": sessao}),
+            {
+                "series": [
+                    {
+                        "item": self.item.pk,
+                        "numero": 1,
+                        "repeticoes": 10,
+                        "carga_kg": 15,
+                    }
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(resposta.status_code, 201)
+        resposta = self.cliente.get(
+            reverse("relatorio_personal"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resposta.status_code, 200)
@@ -2,11 +2,13 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from academias.models import Academia, Aluno, PersonalTrainer
 from academias.forms import AcademiaForm, AlunoForm
 from treinos.models import Treino
-from treinos.forms import TreinoForm, ItemTreinoFormSet
+from treinos.forms import TreinoForm, ItemTreinoFormSet, itens_do_formset
+from treinos.itens import sincronizar_itens
 from django.shortcuts import get_object_or_404
 
 
@@ -83,8 +85,10 @@ def personal_dashboard(request):
 
     try:
         personal = request.user.personaltrainer
-        alunos = personal.alunos.all()
-        treinos = Treino.objects.filter(personal_criador=personal)
+        alunos = personal.alunos.select_related("user")
+        treinos = Treino.objects.filter(personal_criador=personal).select_related(
+            "aluno__user"
+        )
         academias = Academia.objects.all()
 
         context = {
@@ -112,7 +116,11 @@ def aluno_dashboard(request):
 
     try:
         aluno = request.user.aluno
-        treinos = Treino.objects.filter(aluno=aluno)
+        treinos = (
+            Treino.objects.filter(aluno=aluno)
+            .select_related("personal_criador__user")
+            .prefetch_related("itens__exercicio")
+        )
 
         context = {
             "aluno": aluno,
@@ -232,7 +240,12 @@ def treino_list(request):
 
 @login_required
 def treino_detail(request, pk):
-    treino = get_object_or_404(Treino, pk=pk)
+    treino = get_object_or_404(
+        Treino.objects.select_related(
+            "aluno__user", "personal_criador__user"
+        ).prefetch_related("itens__exercicio"),
+        pk=pk,
+    )
 
     # Simple access control: aluno, personal criador or admin can view
     user = request.user
@@ -271,9 +284,11 @@ def treino_create(request):
         formset = ItemTreinoFormSet(request.POST)
 
         if form.is_valid() and formset.is_valid():
-            treino = form.save()
-            formset.instance = treino
-            formset.save()
+            # Em uma transação, o resumo diário é recalculado uma vez só
+            with transaction.atomic():
+                treino = form.save()
+                formset.instance = treino
+                formset.save()
             messages.success(request, "Treino criado com sucesso.")
             return redirect("treino_detail", pk=treino.pk)
     else:
@@ -306,8 +321,11 @@ def treino_edit(request, pk):
         formset = ItemTreinoFormSet(request.POST, instance=treino)
 
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
+            with transaction.atomic():
+                form.save()
+                # Grava só os itens que mudaram, casando-os pelo exercício
+                # O formulário não tem observações: as do item ficam
+                sincronizar_itens(treino, itens_do_formset(formset), parcial=True)
             messages.success(request, "Treino atualizado com sucesso.")
             return redirect("treino_detail", pk=treino.pk)
     else:
@@ -337,6 +355,7 @@ def aluno_list(request):
         messages.error(request, "Acesso negado.")
         return redirect("dashboard")
 
+    alunos = alunos.select_related("user")
     return render(request, "core/alunos/aluno_list.html", {"alunos": alunos})
 
 
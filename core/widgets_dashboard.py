@@ -0,0 +1,343 @@
+"""
+Widgets dos dashboards.
+
+Cada widget é uma função registrada para um tipo de usuário que recebe o
+contexto do dashboard e retorna os seus dados. O contexto resolve o perfil
+uma vez e guarda os querysets e agregados usados por mais de um widget, de
+modo que pedir vários widgets juntos não repete consultas.
+
+As views de dashboard por papel montam todos os widgets do papel; a view
+composta (/api/dashboard/?widgets=...) monta só os pedidos.
+"""
+
+from functools import cached_property
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Sum
+
+from academias.models import Academia, Aluno, PersonalTrainer
+from treinos.contadores import valores_atuais
+from treinos.models import ContadorAluno, ItemTreino, ResumoDiario, Treino
+from .agregacoes import contagem_por_mes, meses_recentes, soma_por_mes
+from .cache_relatorios import (
+    ESCOPO_GLOBAL,
+    escopo_academia,
+    escopo_aluno,
+    escopo_personal,
+)
+from .serializers import (
+    AcademiaSerializer,
+    AlunoListSerializer,
+    PersonalTrainerSerializer,
+    TreinoListSerializer,
+)
+
+User = get_user_model()
+
+# papel -> {nome do widget: função}
+_WIDGETS = {}
+
+
+def widget(papel, nome):
+    """Registra a função decorada como o widget `nome` do `papel`."""
+
+    def registrar(funcao):
+        _WIDGETS.setdefault(papel, {})[nome] = funcao
+        return funcao
+
+    return registrar
+
+
+def widgets_do_papel(papel):
+    """Nomes dos widgets disponíveis para o papel, na ordem de registro."""
+    return list(_WIDGETS.get(papel, {}))
+
+
+def montar_widgets(contexto, nomes=None):
+    """Monta os widgets `nomes` (todos do papel, se None) para o contexto."""
+    registrados = _WIDGETS[contexto.papel]
+    if nomes is None:
+        nomes = registrados
+    return {nome: registrados[nome](contexto) for nome in nomes}
+
+
+def achatar(dados):
+    """
+    Formato das views de dashboard por papel: os campos de "kpis" ficam no
+    nível de cima e os demais widgets ficam sob o próprio nome.
+    """
+    resultado = dict(dados.get("kpis", {}))
+    resultado.update((nome, valor) for nome, valor in dados.items() if nome != "kpis")
+    return resultado
+
+
+# ==========================================
+# CONTEXTOS
+# ==========================================
+
+
+class ContextoDashboard:
+    """Estado compartilhado entre os widgets de uma mesma requisição."""
+
+    papel = None
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def meses(self):
+        return meses_recentes(6)
+
+
+class ContextoPersonal(ContextoDashboard):
+    papel = "PERSONAL"
+
+    def __init__(self, user, personal):
+        super().__init__(user)
+        self.personal = personal
+
+    @property
+    def escopo(self):
+        return escopo_personal(self.personal.pk)
+
+    @cached_property
+    def alunos(self):
+        return Aluno.objects.filter(personal_responsavel=self.personal)
+
+    @cached_property
+    def treinos(self):
+        return Treino.objects.filter(personal_criador=self.personal)
+
+    @cached_property
+    def resumos(self):
+        return ResumoDiario.objects.filter(personal=self.personal)
+
+    @cached_property
+    def totais(self):
+        return self.resumos.aggregate(
+            treinos=Sum("total_treinos"), ativos=Sum("treinos_ativos")
+        )
+
+
+class ContextoAluno(ContextoDashboard):
+    papel = "ALUNO"
+
+    def __init__(self, user, aluno):
+        super().__init__(user)
+        self.aluno = aluno
+
+    @property
+    def escopo(self):
+        return escopo_aluno(self.aluno.pk)
+
+    @cached_property
+    def treinos(self):
+        return Treino.objects.filter(aluno=self.aluno)
+
+    @cached_property
+    def contador(self):
+        return valores_atuais(ContadorAluno.objects.filter(aluno=self.aluno).first())
+
+
+class ContextoAcademia(ContextoDashboard):
+    """Admin de academia, ou admin do sistema vendo todas as academias."""
+
+    papel = "ADMIN"
+
+    def __init__(self, user):
+        super().__init__(user)
+        self.academia_id = user.academia_id if user.user_type == "ADMIN" else None
+
+    @property
+    def escopo(self):
+        if self.academia_id:
+            return escopo_academia(self.academia_id)
+        return ESCOPO_GLOBAL
+
+    @cached_property
+    def alunos(self):
+        if self.academia_id:
+            return Aluno.objects.filter(academia_id=self.academia_id)
+        return Aluno.objects.all()
+
+    @cached_property
+    def personais(self):
+        if self.academia_id:
+            return PersonalTrainer.objects.filter(user__academia_id=self.academia_id)
+        return PersonalTrainer.objects.all()
+
+    @cached_property
+    def treinos(self):
+        if self.academia_id:
+            return Treino.objects.filter(aluno__academia_id=self.academia_id)
+        return Treino.objects.all()
+
+
+class ContextoAdmin(ContextoDashboard):
+    papel = "ADMIN_SISTEMA"
+    escopo = ESCOPO_GLOBAL
+
+
+def contexto_do_usuario(user):
+    """
+    Retorna o contexto do dashboard do usuário, ou None quando o perfil de
+    personal/aluno não existe.
+    """
+    if user.user_type == "PERSONAL":
+        personal = PersonalTrainer.objects.filter(user=user).first()
+        return personal and ContextoPersonal(user, personal)
+    if user.user_type == "ALUNO":
+        aluno = Aluno.objects.filter(user=user).first()
+        return aluno and ContextoAluno(user, aluno)
+    if user.user_type == "ADMIN":
+        return ContextoAcademia(user)
+    if user.user_type == "ADMIN_SISTEMA":
+        return ContextoAdmin(user)
+    return None
+
+
+# ==========================================
+# PERSONAL
+# ==========================================
+
+
+@widget("PERSONAL", "kpis")
+def kpis_personal(ctx):
+    academias = Academia.objects.filter(
+        alunos__personal_responsavel=ctx.personal
+    ).distinct()
+    total_treinos = ctx.totais["treinos"] or 0
+    return {
+        "total_alunos": ctx.alunos.count(),
+        "total_academias": academias.count(),
+        "total_treinos": total_treinos,
+        "taxa_atividade": round(
+            ((ctx.totais["ativos"] or 0) / max(total_treinos, 1)) * 100, 1
+        ),
+    }
+
+
+@widget("PERSONAL", "treinos_por_mes")
+def treinos_por_mes_personal(ctx):
+    totais_mes = soma_por_mes(ctx.resumos, "dia", "total_treinos", ctx.meses)
+    return [
+        {"mes": mes.strftime("%b"), "treinos": totais_mes[i]}
+        for i, mes in enumerate(ctx.meses)
+    ]
+
+
+@widget("PERSONAL", "top_exercicios")
+def top_exercicios_personal(ctx):
+    return list(
+        ItemTreino.objects.filter(treino__in=ctx.treinos)
+        .values("exercicio__nome")
+        .annotate(total=Count("id"))
+        .order_by("-total")[:5]
+    )
+
+
+@widget("PERSONAL", "alunos_recentes")
+def alunos_recentes_personal(ctx):
+    alunos = AlunoListSerializer.preparar_queryset(ctx.alunos).order_by(
+        "-user__date_joined"
+    )[:5]
+    return AlunoListSerializer(alunos, many=True).data
+
+
+# ==========================================
+# ALUNO
+# ==========================================
+
+
+@widget("ALUNO", "kpis")
+def kpis_aluno(ctx):
+    return {
+        "total_treinos": ctx.treinos.count(),
+        "treinos_ativos": ctx.treinos.filter(ativo=True).count(),
+        "sequencia_dias": ctx.contador["sequencia_dias"],
+        "maior_sequencia": ctx.contador["maior_sequencia"],
+        "tempo_total_minutos": ctx.contador["minutos_totais"],
+        "minutos_semana": ctx.contador["minutos_semana"],
+        "meta_semanal_atual": ctx.contador["sessoes_semana"],
+        "meta_semanal_total": 5,
+    }
+
+
+@widget("ALUNO", "treinos")
+def treinos_recentes_aluno(ctx):
+    treinos = TreinoListSerializer.preparar_queryset(ctx.treinos)
+    return TreinoListSerializer(treinos.order_by("-data_criacao")[:5], many=True).data
+
+
+# ==========================================
+# ACADEMIA
+# ==========================================
+
+
+@widget("ADMIN", "kpis")
+def kpis_academia(ctx):
+    return {
+        "total_alunos": ctx.alunos.count(),
+        "total_personais": ctx.personais.count(),
+        "total_treinos": ctx.treinos.count(),
+        "taxa_retencao": 95.0,  # Implementar cálculo real
+    }
+
+
+@widget("ADMIN", "personais")
+def personais_academia(ctx):
+    personais = PersonalTrainerSerializer.preparar_queryset(ctx.personais)[:5]
+    return PersonalTrainerSerializer(personais, many=True).data
+
+
+# ==========================================
+# ADMIN DO SISTEMA
+# ==========================================
+
+
+@widget("ADMIN_SISTEMA", "kpis")
+def kpis_admin(ctx):
+    return {
+        "total_usuarios": User.objects.count(),
+        "total_academias": Academia.objects.count(),
+        "total_personais": PersonalTrainer.objects.count(),
+        "total_alunos": Aluno.objects.count(),
+        "total_treinos": Treino.objects.count(),
+    }
+
+
+@widget("ADMIN_SISTEMA", "crescimento_usuarios")
+def crescimento_usuarios_admin(ctx):
+    alunos_por_mes = contagem_por_mes(
+        Aluno.objects.all(), "user__date_joined", ctx.meses
+    )
+    personais_por_mes = contagem_por_mes(
+        PersonalTrainer.objects.all(), "user__date_joined", ctx.meses
+    )
+    return [
+        {
+            "mes": mes.strftime("%b"),
+            "alunos": alunos_por_mes[i],
+            "personais": personais_por_mes[i],
+        }
+        for i, mes in enumerate(ctx.meses)
+    ]
+
+
+@widget("ADMIN_SISTEMA", "volume_treinos")
+def volume_treinos_admin(ctx):
+    treinos_por_mes = soma_por_mes(
+        ResumoDiario.objects.all(), "dia", "total_treinos", ctx.meses
+    )
+    return [
+        {"mes": mes.strftime("%b"), "treinos": treinos_por_mes[i]}
+        for i, mes in enumerate(ctx.meses)
+    ]
+
+
+@widget("ADMIN_SISTEMA", "top_academias")
+def top_academias_admin(ctx):
+    top_academias = AcademiaSerializer.preparar_queryset(
+        Academia.objects.annotate(num_alunos=Count("alunos"))
+    ).order_by("-num_alunos")[:5]
+    return AcademiaSerializer(top_academias, many=True).data
@@ -55,6 +55,35 @@ api.interceptors.response.use(
     }
 );
 
+// Listagens paginadas por cursor (alunos, treinos, academias, personais, sessões)
+export interface Pagina<T = any> {
+    next: string | null;
+    previous: string | null;
+    results: T[];
+}
+
+// Busca uma página; `cursor` é o link next/previous devolvido pela página anterior
+export const getPagina = async <T = any>(url: string, cursor?: string | null): Promise<Pagina<T>> => {
+    const response = await api.get(cursor || url);
+    return response.data;
+};
+
+// Maior página aceita pela API (max_page_size de core/paginacao.py)
+const TAMANHO_MAXIMO_PAGINA = 200;
+
+// Todas as linhas de uma listagem, seguindo `next` até o fim (tabelas e <select>s)
+export const getTodas = async <T = any>(url: string): Promise<T[]> => {
+    const separador = url.includes('?') ? '&' : '?';
+    // O link `next` mantém o page_size da primeira página
+    let pagina = await getPagina<T>(`${url}${separador}page_size=${TAMANHO_MAXIMO_PAGINA}`);
+    const resultados = [...pagina.results];
+    while (pagina.next) {
+        pagina = await getPagina<T>(url, pagina.next);
+        resultados.push(...pagina.results);
+    }
+    return resultados;
+};
+
 // Auth
 export const authAPI = {
     login: async (email: string, password: string) => {
@@ -74,8 +103,7 @@ export const authAPI = {
 // Academias
 export const academiaAPI = {
     list: async () => {
-        const response = await api.get('/academias/');
-        return response.data;
+        return getTodas('/academias/');
     },
     get: async (id: number | string) => {
         const response = await api.get(`/academias/${id}/`);
@@ -103,8 +131,7 @@ export const alunoAPI = {
         if (params?.personal) searchParams.append('personal', params.personal.toString());
         if (params?.academia) searchParams.append('academia', params.academia.toString());
         if (searchParams.toString()) url += `?${searchParams.toString()}`;
-        const response = await api.get(url);
-        return response.data;
+        return getTodas(url);
     },
     get: async (id: number | string) => {
         const response = await api.get(`/alunos/${id}/`);
@@ -122,6 +149,12 @@ export const alunoAPI = {
         const response = await api.delete(`/alunos/${id}/`);
         return response.data;
     },
+    importar: async (arquivo: File) => {
+        const formData = new FormData();
+        formData.append('arquivo', arquivo);
+        const response = await api.post('/alunos/importar/', formData);
+        return response.data;
+    },
 };
 
 // Treinos
@@ -131,8 +164,7 @@ export const treinoAPI = {
         if (params?.aluno) {
             url += `?aluno=${params.aluno}`;
         }
-        const response = await api.get(url);
-        return response.data;
+        return getTodas(url);
     },
     get: async (id: number | string) => {
         const response = await api.get(`/treinos/${id}/`);
@@ -152,6 +184,33 @@ export const treinoAPI = {
     },
 };
 
+// Modelos de treino
+export const modeloTreinoAPI = {
+    list: async () => {
+        return getTodas('/modelos-treino/');
+    },
+    get: async (id: number | string) => {
+        const response = await api.get(`/modelos-treino/${id}/`);
+        return response.data;
+    },
+    create: async (data: any) => {
+        const response = await api.post('/modelos-treino/', data);
+        return response.data;
+    },
+    update: async (id: number | string, data: any) => {
+        const response = await api.put(`/modelos-treino/${id}/`, data);
+        return response.data;
+    },
+    delete: async (id: number | string) => {
+        const response = await api.delete(`/modelos-treino/${id}/`);
+        return response.data;
+    },
+    atribuir: async (id: number | string, data: { alunos: number[]; nome_treino?: string; ativo?: boolean }) => {
+        const response = await api.post(`/modelos-treino/${id}/atribuir/`, data);
+        return response.data;
+    },
+};
+
 // Exercícios
 export const exercicioAPI = {
     list: async () => {
@@ -162,8 +221,37 @@ export const exercicioAPI = {
         const response = await api.get(`/exercicios/${id}/`);
         return response.data;
     },
+    buscar: async (q: string, categoria?: string) => {
+        const response = await api.get('/exercicios/', { params: { q, categoria } });
+        return response.data;
+    },
+    // Seletor de exercícios: chamado a cada tecla, devolve os `limite` melhores nomes
+    autocompletar: async (q: string, limite = 10) => {
+        const response = await api.get('/exercicios/autocompletar/', { params: { q, limite } });
+        return response.data;
+    },
+    // Exercícios parecidos para substituir este (filtros: as mesmas facetas da listagem)
+    similares: async (id: number | string, limite = 10, filtros: Record<string, string | string[]> = {}) => {
+        const response = await api.get(`/exercicios/${id}/similares/`, { params: { ...facetasParams(filtros), limite } });
+        return response.data;
+    },
+    // Facetas: musculo, equipamento, nivel, forca, mecanica, categoria (vários valores por vírgula)
+    filtrar: async (filtros: Record<string, string | string[]>, q?: string) => {
+        const response = await api.get('/exercicios/', { params: { ...facetasParams(filtros), q } });
+        return response.data;
+    },
+    // Contagens de cada faceta com os filtros das outras
+    facetas: async (filtros: Record<string, string | string[]> = {}) => {
+        const response = await api.get('/exercicios/facetas/', { params: facetasParams(filtros) });
+        return response.data;
+    },
 };
 
+const facetasParams = (filtros: Record<string, string | string[]>) =>
+    Object.fromEntries(
+        Object.entries(filtros).map(([faceta, valor]) => [faceta, Array.isArray(valor) ? valor.join(',') : valor])
+    );
+
 // Dashboard Stats
 export const dashboardAPI = {
     getPersonalStats: async () => {
@@ -182,6 +270,12 @@ export const dashboardAPI = {
         const response = await api.get('/dashboard/admin/');
         return response.data;
     },
+    // Vários widgets do dashboard do usuário logado em uma única requisição
+    getWidgets: async (widgets?: string[]) => {
+        const params = widgets?.length ? `?widgets=${widgets.join(',')}` : '';
+        const response = await api.get(`/dashboard/${params}`);
+        return response.data;
+    },
 };
 
 // Personal Trainers
@@ -191,8 +285,7 @@ export const personalAPI = {
         if (params?.academia) {
             url += `?academia=${params.academia}`;
         }
-        const response = await api.get(url);
-        return response.data;
+        return getTodas(url);
     },
     get: async (id: number | string) => {
         const response = await api.get(`/personais/${id}/`);
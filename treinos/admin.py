@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Exercicio, Treino, ItemTreino
+from .models import Exercicio, ItemModeloTreino, ItemTreino, ModeloTreino, Treino
 
 
 class ItemTreinoInline(admin.TabularInline):
@@ -7,6 +7,11 @@ class ItemTreinoInline(admin.TabularInline):
     extra = 1
 
 
+class ItemModeloTreinoInline(admin.TabularInline):
+    model = ItemModeloTreino
+    extra = 1
+
+
 @admin.register(Exercicio)
 class ExercicioAdmin(admin.ModelAdmin):
     list_display = ("nome", "level", "equipment", "category")
@@ -38,3 +43,12 @@ class TreinoAdmin(admin.ModelAdmin):
 
     # possibilita editar os Itens de Treino diretamente na página do Treino
     inlines = [ItemTreinoInline]
+
+
+@admin.register(ModeloTreino)
+class ModeloTreinoAdmin(admin.ModelAdmin):
+    list_display = ("nome", "personal_criador", "data_criacao")
+    list_filter = ("personal_criador",)
+    search_fields = ("nome", "descricao")
+    ordering = ("-data_criacao",)
+    inlines = [ItemModeloTreinoInline]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TreinosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'treinos'
+
+    def ready(self):
+        import treinos.signals  # noqa
@@ -0,0 +1,138 @@
+"""
+Contadores correntes por aluno (ContadorAluno).
+
+Cada sessão registrada atualiza os contadores em O(1). Casos que o cálculo
+incremental não cobre (sessão retroativa, sessão excluída ou com data
+alterada) recalculam o contador do aluno a partir do histórico, assim como o
+comando recalcular_contadores.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ContadorAluno, SessaoTreino
+
+
+def dia_da_sessao(sessao):
+    return timezone.localtime(sessao.inicio).date()
+
+
+def inicio_da_semana(dia):
+    """Segunda-feira da semana de `dia`."""
+    return dia - timedelta(days=dia.weekday())
+
+
+def _contador_bloqueado(aluno_id):
+    contador, _ = ContadorAluno.objects.select_for_update().get_or_create(
+        aluno_id=aluno_id
+    )
+    return contador
+
+
+@transaction.atomic
+def registrar_sessao(sessao):
+    """Soma uma nova sessão aos contadores do aluno."""
+    contador = _contador_bloqueado(sessao.aluno_id)
+    dia = dia_da_sessao(sessao)
+
+    if contador.ultimo_dia and dia < contador.ultimo_dia:
+        # Sessão retroativa: pode emendar sequências antigas.
+        return recalcular_contador(sessao.aluno_id)
+
+    if contador.ultimo_dia is None or dia > contador.ultimo_dia + timedelta(days=1):
+        contador.sequencia_atual = 1
+    elif dia == contador.ultimo_dia + timedelta(days=1):
+        contador.sequencia_atual += 1
+    contador.ultimo_dia = dia
+    contador.maior_sequencia = max(contador.maior_sequencia, contador.sequencia_atual)
+
+    semana = inicio_da_semana(dia)
+    if contador.semana_inicio is None or semana > contador.semana_inicio:
+        contador.semana_inicio = semana
+        contador.sessoes_semana = 0
+        contador.minutos_semana = 0
+    if semana == contador.semana_inicio:
+        contador.sessoes_semana += 1
+        contador.minutos_semana += sessao.duracao_minutos
+    contador.minutos_totais += sessao.duracao_minutos
+
+    contador.save()
+    return contador
+
+
+@transaction.atomic
+def ajustar_minutos(sessao, minutos_anteriores):
+    """Aplica a mudança de duração de uma sessão (ex.: quando ela é encerrada)."""
+    diferenca = sessao.duracao_minutos - minutos_anteriores
+    if not diferenca:
+        return
+
+    contador = _contador_bloqueado(sessao.aluno_id)
+    contador.minutos_totais = max(contador.minutos_totais + diferenca, 0)
+    if inicio_da_semana(dia_da_sessao(sessao)) == contador.semana_inicio:
+        contador.minutos_semana = max(contador.minutos_semana + diferenca, 0)
+    contador.save()
+
+
+@transaction.atomic
+def recalcular_contador(aluno_id):
+    """Recalcula o contador de um aluno a partir de todas as suas sessões."""
+    contador = _contador_bloqueado(aluno_id)
+    semana_atual = inicio_da_semana(timezone.localdate())
+
+    dias = set()
+    contador.sessoes_semana = 0
+    contador.minutos_semana = 0
+    contador.minutos_totais = 0
+    for sessao in SessaoTreino.objects.filter(aluno_id=aluno_id).only(
+        "aluno_id", "inicio", "fim"
+    ):
+        dia = dia_da_sessao(sessao)
+        dias.add(dia)
+        contador.minutos_totais += sessao.duracao_minutos
+        if inicio_da_semana(dia) == semana_atual:
+            contador.sessoes_semana += 1
+            contador.minutos_semana += sessao.duracao_minutos
+
+    contador.sequencia_atual = 0
+    contador.maior_sequencia = 0
+    anterior = None
+    for dia in sorted(dias):
+        if anterior and dia == anterior + timedelta(days=1):
+            contador.sequencia_atual += 1
+        else:
+            contador.sequencia_atual = 1
+        contador.maior_sequencia = max(
+            contador.maior_sequencia, contador.sequencia_atual
+        )
+        anterior = dia
+
+    contador.ultimo_dia = anterior
+    contador.semana_inicio = semana_atual
+    contador.save()
+    return contador
+
+
+def valores_atuais(contador, hoje=None):
+    """
+    Valores do contador como vistos hoje: a sequência só continua se o aluno
+    treinou hoje ou ontem, e a semana guardada só vale se for a semana atual.
+    """
+    hoje = hoje or timezone.localdate()
+    if contador is None:
+        contador = ContadorAluno()
+
+    sequencia = contador.sequencia_atual
+    if not contador.ultimo_dia or contador.ultimo_dia < hoje - timedelta(days=1):
+        sequencia = 0
+
+    semana_valida = contador.semana_inicio == inicio_da_semana(hoje)
+    return {
+        "sequencia_dias": sequencia,
+        "maior_sequencia": contador.maior_sequencia,
+        "sessoes_semana": contador.sessoes_semana if semana_valida else 0,
+        "minutos_semana": contador.minutos_semana if semana_valida else 0,
+        "minutos_totais": contador.minutos_totais,
+    }
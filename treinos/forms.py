@@ -28,12 +28,15 @@ class TreinoForm(forms.ModelForm):
         self.request_user = kwargs.pop("request_user", None)
         super().__init__(*args, **kwargs)
 
+        # O rótulo de cada opção usa o nome do usuário
+        self.fields["aluno"].queryset = Aluno.objects.select_related("user")
+
         # Se o usuário logado é PERSONAL, filtrar apenas seus alunos
         if self.request_user and self.request_user.user_type == "PERSONAL":
             try:
                 personal = self.request_user.personaltrainer
                 # Filtrar apenas alunos deste personal
-                self.fields["aluno"].queryset = personal.alunos.all()
+                self.fields["aluno"].queryset = personal.alunos.select_related("user")
             except PersonalTrainer.DoesNotExist:
                 self.fields["aluno"].queryset = Aluno.objects.none()
 
@@ -89,3 +92,15 @@ ItemTreinoFormSet = inlineformset_factory(
     min_num=0,  # Mínimo de formulários obrigatórios
     validate_min=False,
 )
+
+
+def itens_do_formset(formset):
+    """
+    Itens preenchidos e não marcados para exclusão de um ItemTreinoFormSet
+    válido, no formato de `treinos.itens.sincronizar_itens`.
+    """
+    return [
+        {campo: form.cleaned_data[campo] for campo in ItemTreinoForm.Meta.fields}
+        for form in formset.forms
+        if form.cleaned_data.get("exercicio") and not form.cleaned_data.get("DELETE")
+    ]
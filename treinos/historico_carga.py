@@ -0,0 +1,377 @@
+"""
+Histórico de carga por (aluno, exercício) e as séries reduzidas para gráficos.
+
+O histórico é alimentado por dois caminhos:
+
+* ficha: quando a carga de um ItemTreino muda (signals em treinos/signals.py);
+* sessão: a maior carga feita em cada exercício de uma sessão, gravada junto
+  com o lote de séries em treinos/sessoes.py.
+
+As consultas agrupam os pontos no banco por dia, semana ou mês, escolhendo a
+resolução mais fina que caiba no número de pontos pedido, de modo que um
+gráfico de anos de histórico custa uma consulta e poucos pontos.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import HistoricoCarga, ItemTreino, SerieRealizada, Treino
+
+# (nome, função de truncamento, duração aproximada em dias)
+RESOLUCOES = [
+    ("dia", TruncDay, 1),
+    ("semana", TruncWeek, 7),
+    ("mes", TruncMonth, 30.44),
+]
+
+
+def registrar_carga_da_ficha(item, quando=None):
+    """
+    Registra a carga prescrita de um item se ela for diferente da última
+    carga de ficha do aluno no exercício. Retorna o ponto criado ou None.
+    """
+    if item.carga_kg is None:
+        return None
+
+    aluno_id = (
+        Treino.objects.filter(pk=item.treino_id)
+        .values_list("aluno_id", flat=True)
+        .first()
+    )
+    if aluno_id is None:
+        return None
+
+    ultima = (
+        HistoricoCarga.objects.filter(
+            aluno_id=aluno_id,
+            exercicio_id=item.exercicio_id,
+            origem=HistoricoCarga.ORIGEM_FICHA,
+        )
+        .order_by("-registrado_em", "-pk")
+        .values_list("carga_kg", flat=True)
+        .first()
+    )
+    if ultima is not None and ultima == item.carga_kg:
+        return None
+
+    return HistoricoCarga.objects.create(
+        aluno_id=aluno_id,
+        exercicio_id=item.exercicio_id,
+        origem=HistoricoCarga.ORIGEM_FICHA,
+        carga_kg=item.carga_kg,
+        registrado_em=quando or timezone.now(),
+    )
+
+
+def registrar_cargas_da_ficha(cargas, quando=None):
+    """
+    Versão em lote de `registrar_carga_da_ficha`, para itens gravados com
+    bulk_create. `cargas` são tuplas (aluno_id, exercicio_id, carga_kg).
+    Usa duas queries, qualquer que seja o número de itens.
+    """
+    novas = {}
+    for aluno_id, exercicio_id, carga_kg in cargas:
+        if carga_kg is not None:
+            novas[(aluno_id, exercicio_id)] = carga_kg
+    if not novas:
+        return []
+
+    ultimas = {}
+    pontos = (
+        HistoricoCarga.objects.filter(
+            aluno_id__in={aluno_id for aluno_id, _ in novas},
+            exercicio_id__in={exercicio_id for _, exercicio_id in novas},
+            origem=HistoricoCarga.ORIGEM_FICHA,
+        )
+        .order_by("-registrado_em", "-pk")
+        .values_list("aluno_id", "exercicio_id", "carga_kg")
+    )
+    for aluno_id, exercicio_id, carga_kg in pontos:
+        ultimas.setdefault((aluno_id, exercicio_id), carga_kg)
+
+    quando = quando or timezone.now()
+    return HistoricoCarga.objects.bulk_create(
+        HistoricoCarga(
+            aluno_id=aluno_id,
+            exercicio_id=exercicio_id,
+            origem=HistoricoCarga.ORIGEM_FICHA,
+            carga_kg=carga_kg,
+            registrado_em=quando,
+        )
+        for (aluno_id, exercicio_id), carga_kg in novas.items()
+        if ultimas.get((aluno_id, exercicio_id)) != carga_kg
+    )
+
+
+def registrar_cargas_da_sessao(sessao, series):
+    """
+    Atualiza os pontos de sessão com um lote de SerieRealizada já gravado.
+
+    Cada (sessão, exercício) tem um único ponto com a maior carga feita; lotes
+    seguintes da mesma sessão só sobem esse ponto. Usa no máximo três queries
+    por lote, qualquer que seja o tamanho.
+    """
+    maiores = {}
+    for serie in series:
+        if serie.carga_kg is None:
+            continue
+        atual = maiores.get(serie.exercicio_id)
+        if atual is None or serie.carga_kg > atual[0]:
+            maiores[serie.exercicio_id] = (Decimal(serie.carga_kg), serie.realizada_em)
+    if not maiores:
+        return
+
+    existentes = {
+        ponto.exercicio_id: ponto
+        for ponto in HistoricoCarga.objects.filter(
+            sessao_id=sessao.pk, exercicio_id__in=maiores
+        )
+    }
+
+    novos, alterados = [], []
+    for exercicio_id, (carga, quando) in maiores.items():
+        ponto = existentes.get(exercicio_id)
+        if ponto is None:
+            novos.append(
+                HistoricoCarga(
+                    aluno_id=sessao.aluno_id,
+                    exercicio_id=exercicio_id,
+                    sessao_id=sessao.pk,
+                    origem=HistoricoCarga.ORIGEM_SESSAO,
+                    carga_kg=carga,
+                    registrado_em=quando,
+                )
+            )
+        elif carga > ponto.carga_kg:
+            ponto.carga_kg = carga
+            ponto.registrado_em = quando
+            alterados.append(ponto)
+
+    with transaction.atomic():
+        HistoricoCarga.objects.bulk_create(novos)
+        HistoricoCarga.objects.bulk_update(alterados, ["carga_kg", "registrado_em"])
+
+
+@transaction.atomic
+def reconstruir_historico(tamanho_lote=1000):
+    """
+    Apaga e recria todo o histórico a partir das fichas e das séries
+    realizadas. Retorna (pontos de ficha, pontos de sessão).
+    """
+    HistoricoCarga.objects.all().delete()
+
+    # Ficha: um ponto na data do treino sempre que a carga do exercício muda.
+    itens = (
+        ItemTreino.objects.exclude(carga_kg=None)
+        .order_by("treino__aluno_id", "exercicio_id", "treino__data_criacao", "pk")
+        .values_list(
+            "treino__aluno_id", "exercicio_id", "carga_kg", "treino__data_criacao"
+        )
+    )
+    pontos_ficha = []
+    anterior = None
+    for aluno_id, exercicio_id, carga, quando in itens.iterator():
+        if anterior == (aluno_id, exercicio_id, carga):
+            continue
+        anterior = (aluno_id, exercicio_id, carga)
+        pontos_ficha.append(
+            HistoricoCarga(
+                aluno_id=aluno_id,
+                exercicio_id=exercicio_id,
+                origem=HistoricoCarga.ORIGEM_FICHA,
+                carga_kg=carga,
+                registrado_em=quando,
+            )
+        )
+    HistoricoCarga.objects.bulk_create(pontos_ficha, batch_size=tamanho_lote)
+
+    # Sessões: a maior carga de cada exercício em cada sessão.
+    maiores = (
+        SerieRealizada.objects.exclude(carga_kg=None)
+        .values("sessao_id", "sessao__aluno_id", "exercicio_id")
+        .annotate(carga=Max("carga_kg"), quando=Max("realizada_em"))
+        .order_by()
+    )
+    pontos_sessao = [
+        HistoricoCarga(
+            aluno_id=linha["sessao__aluno_id"],
+            exercicio_id=linha["exercicio_id"],
+            sessao_id=linha["sessao_id"],
+            origem=HistoricoCarga.ORIGEM_SESSAO,
+            carga_kg=linha["carga"],
+            registrado_em=linha["quando"],
+        )
+        for linha in maiores
+    ]
+    HistoricoCarga.objects.bulk_create(pontos_sessao, batch_size=tamanho_lote)
+
+    return len(pontos_ficha), len(pontos_sessao)
+
+
+def escolher_resolucao(inicio, fim, max_pontos):
+    """
+    Retorna a resolução mais fina de RESOLUCOES com no máximo `max_pontos`
+    intervalos entre `inicio` e `fim` (datas). Se nem a mensal couber,
+    retorna a mensal; `series_de_carga` junta os meses depois.
+    """
+    dias = (fim - inicio).days + 1
+    for resolucao in RESOLUCOES:
+        if dias / resolucao[2] <= max_pontos:
+            return resolucao
+    return RESOLUCOES[-1]
+
+
+def _reduzir(pontos, inicio, fim, max_pontos):
+    # Junta pontos vizinhos em `max_pontos` faixas de tamanho igual.
+    if len(pontos) <= max_pontos:
+        return pontos
+
+    dias = (fim - inicio).days + 1
+    faixas = {}
+    for ponto in pontos:
+        indice = min((ponto["data"] - inicio).days * max_pontos // dias, max_pontos - 1)
+        faixa = faixas.get(indice)
+        if faixa is None:
+            faixas[indice] = dict(ponto)
+            continue
+        registros = faixa["registros"] + ponto["registros"]
+        faixa["carga_media"] = (
+            faixa["carga_media"] * faixa["registros"]
+            + ponto["carga_media"] * ponto["registros"]
+        ) / registros
+        faixa["carga_max"] = max(faixa["carga_max"], ponto["carga_max"])
+        faixa["registros"] = registros
+    return [faixas[indice] for indice in sorted(faixas)]
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def series_de_carga(
+    aluno_id, exercicio_ids=None, inicio=None, fim=None, max_pontos=52, limite=5
+):
+    """
+    Séries de carga de um aluno, uma por exercício, com até `max_pontos`
+    pontos cada entre as datas `inicio` e `fim` (padrão: o último ano).
+
+    Sem `exercicio_ids`, usa os `limite` exercícios com mais registros no
+    período. Todas as séries usam os mesmos intervalos, para que os gráficos
+    possam alinhá-las. Executa uma única consulta.
+
+    Retorna (resolução, [{"exercicio_id", "exercicio", "pontos"}]), onde cada
+    ponto tem "data", "carga_max", "carga_media" e "registros".
+    """
+    fim = fim or timezone.localdate()
+    inicio = inicio or fim - timedelta(days=365)
+    nome, truncar, _ = escolher_resolucao(inicio, fim, max_pontos)
+
+    # Limites em datetime: registrado_em__date aplicaria DATE() em cada linha
+    # e deixaria de usar o índice
+    pontos = HistoricoCarga.objects.filter(
+        aluno_id=aluno_id,
+        registrado_em__gte=_inicio_do_dia(inicio),
+        registrado_em__lt=_inicio_do_dia(fim + timedelta(days=1)),
+    )
+    if exercicio_ids:
+        pontos = pontos.filter(exercicio_id__in=exercicio_ids)
+
+    linhas = (
+        pontos.annotate(periodo=truncar("registrado_em"))
+        .values("exercicio_id", "exercicio__nome", "periodo")
+        .annotate(
+            carga_max=Max("carga_kg"),
+            carga_media=Avg("carga_kg"),
+            registros=Count("pk"),
+        )
+        .order_by("exercicio_id", "periodo")
+    )
+
+    series = {}
+    for linha in linhas:
+        periodo = linha["periodo"]
+        if hasattr(periodo, "tzinfo"):
+            periodo = timezone.localtime(periodo).date()
+        serie = series.setdefault(
+            linha["exercicio_id"],
+            {
+                "exercicio_id": linha["exercicio_id"],
+                "exercicio": linha["exercicio__nome"],
+                "pontos": [],
+            },
+        )
+        serie["pontos"].append(
+            {
+                "data": max(periodo, inicio),
+                "carga_max": float(linha["carga_max"]),
+                "carga_media": float(linha["carga_media"]),
+                "registros": linha["registros"],
+            }
+        )
+
+    resultado = list(series.values())
+    if not exercicio_ids:
+        resultado.sort(
+            key=lambda s: (-sum(p["registros"] for p in s["pontos"]), s["exercicio_id"])
+        )
+        resultado = resultado[:limite]
+
+    for serie in resultado:
+        serie["pontos"] = _reduzir(serie["pontos"], inicio, fim, max_pontos)
+        for ponto in serie["pontos"]:
+            ponto["carga_media"] = round(ponto["carga_media"], 2)
+
+    return nome, resultado
+
+
+def medias_semanais(pontos, semanas, limite=3):
+    """
+    Carga média por semana dos `limite` exercícios com mais registros em
+    `pontos` (um queryset de HistoricoCarga, de um ou de vários alunos).
+
+    `semanas` são as segundas-feiras das semanas pedidas, da mais antiga à
+    mais recente. Executa uma única consulta.
+
+    Retorna [{"exercicio_id", "exercicio", "medias"}], com uma média (ou None,
+    se não houve registro) por semana, na ordem de `semanas`.
+    """
+    linhas = (
+        pontos.filter(
+            registrado_em__gte=_inicio_do_dia(semanas[0]),
+            registrado_em__lt=_inicio_do_dia(semanas[-1] + timedelta(days=7)),
+        )
+        .annotate(semana=TruncWeek("registrado_em"))
+        .values("exercicio_id", "exercicio__nome", "semana")
+        .annotate(media=Avg("carga_kg"), registros=Count("pk"))
+        .order_by()
+    )
+
+    indices = {semana: i for i, semana in enumerate(semanas)}
+    series = {}
+    for linha in linhas:
+        semana = linha["semana"]
+        if hasattr(semana, "tzinfo"):
+            semana = timezone.localtime(semana).date()
+        serie = series.setdefault(
+            linha["exercicio_id"],
+            {
+                "exercicio_id": linha["exercicio_id"],
+                "exercicio": linha["exercicio__nome"],
+                "medias": [None] * len(semanas),
+                "registros": 0,
+            },
+        )
+        serie["medias"][indices[semana]] = float(linha["media"])
+        serie["registros"] += linha["registros"]
+
+    resultado = sorted(
+        series.values(), key=lambda s: (-s["registros"], s["exercicio_id"])
+    )[:limite]
+    for serie in resultado:
+        del serie["registros"]
+    return resultado
@@ -0,0 +1,142 @@
+"""
+Atualização dos itens de um treino por diferença.
+
+Os itens recebidos (da API ou do formset da página de edição) são casados
+com os do banco pelo exercício, que é único no treino: exercícios novos viram
+INSERTs, exercícios que continuam têm só os campos alterados gravados e os que
+saíram são apagados. Os ids dos itens que continuam são preservados, e o
+número de escritas acompanha o que mudou, não o tamanho do treino.
+
+bulk_create e bulk_update não disparam os signals de treinos/signals.py, então
+o resumo diário do treino (no commit, ver `recalcular_no_commit`) e o
+histórico de carga são atualizados aqui, uma vez por treino. Os escopos de
+cache são invalidados pelo signal do próprio Treino, que é salvo junto nos
+dois caminhos de edição.
+
+Os itens de um ModeloTreino são casados da mesma forma (`comparar_itens`),
+sem resumos nem histórico a atualizar.
+"""
+
+from django.db import transaction
+
+from .historico_carga import registrar_cargas_da_ficha
+from .models import ItemModeloTreino, ItemTreino, SerieRealizada
+from .resumos import recalcular_no_commit
+
+# Campos que entram no resumo diário (o exercício define a categoria)
+CAMPOS_DO_RESUMO = {"series"}
+
+# Campos opcionais e o valor que recebem quando um item chega sem eles
+CAMPOS_OPCIONAIS = {"carga_kg": None, "observacoes": None}
+
+
+def comparar_itens(existentes, itens_data, novo_item, parcial=False):
+    """
+    Casa `itens_data` (dicts com "exercicio", instância ou id, e os demais
+    campos do item) com `existentes` ({exercicio_id: item}) pelo exercício.
+    Os campos opcionais ausentes de um item voltam ao padrão, como se o item
+    fosse recriado; com `parcial`, ficam como estão. `novo_item(exercicio_id,
+    dados)` monta os itens de exercícios que não estavam.
+
+    Retorna (criados, [(item alterado, campos que mudaram)], itens removidos),
+    sem gravar nada.
+    """
+    criados, alterados = [], []
+    recebidos = set()
+
+    for dados in itens_data:
+        dados = dict(dados) if parcial else {**CAMPOS_OPCIONAIS, **dados}
+        exercicio = dados.pop("exercicio")
+        exercicio_id = getattr(exercicio, "pk", exercicio)
+        recebidos.add(exercicio_id)
+
+        item = existentes.get(exercicio_id)
+        if item is None:
+            criados.append(novo_item(exercicio_id, dados))
+            continue
+
+        mudou = {
+            campo for campo, valor in dados.items() if getattr(item, campo) != valor
+        }
+        if mudou:
+            for campo in mudou:
+                setattr(item, campo, dados[campo])
+            alterados.append((item, mudou))
+
+    removidos = [
+        item
+        for exercicio_id, item in existentes.items()
+        if exercicio_id not in recebidos
+    ]
+    return criados, alterados, removidos
+
+
+@transaction.atomic
+def sincronizar_itens(treino, itens_data, parcial=False):
+    """
+    Deixa os itens de `treino` iguais a `itens_data`, como descrito em
+    `comparar_itens`.
+
+    Retorna (criados, alterados, ids removidos).
+    """
+    existentes = {item.exercicio_id: item for item in treino.itens.all()}
+    criados, alterados, removidos = comparar_itens(
+        existentes,
+        itens_data,
+        lambda exercicio_id, dados: ItemTreino(
+            treino=treino, exercicio_id=exercicio_id, **dados
+        ),
+        parcial,
+    )
+    campos_alterados = set().union(*(mudou for _, mudou in alterados))
+    cargas = criados + [item for item, mudou in alterados if "carga_kg" in mudou]
+    alterados = [item for item, _ in alterados]
+    removidos = [item.pk for item in removidos]
+
+    if removidos:
+        # Sem o delete() do Django, que buscaria os itens e mandaria um
+        # post_delete por item: o SET_NULL das séries realizadas é feito aqui
+        # e o resumo e os escopos de cache são atualizados uma vez abaixo
+        # (os escopos pelo save do próprio treino)
+        SerieRealizada.objects.filter(item_id__in=removidos).update(item=None)
+        ItemTreino.objects.filter(pk__in=removidos)._raw_delete(ItemTreino.objects.db)
+    if alterados:
+        ItemTreino.objects.bulk_update(alterados, sorted(campos_alterados))
+    if criados:
+        ItemTreino.objects.bulk_create(criados)
+
+    if criados or removidos or campos_alterados & CAMPOS_DO_RESUMO:
+        # No commit, junto com a célula agendada pelo save do treino
+        recalcular_no_commit(treino_ids=[treino.pk])
+    registrar_cargas_da_ficha(
+        (treino.aluno_id, item.exercicio_id, item.carga_kg) for item in cargas
+    )
+    return criados, alterados, removidos
+
+
+@transaction.atomic
+def sincronizar_itens_modelo(modelo, itens_data, parcial=False):
+    """
+    Deixa os itens de um ModeloTreino iguais a `itens_data`, como em
+    `sincronizar_itens`. Itens de modelo não alimentam resumos nem histórico.
+    """
+    existentes = {item.exercicio_id: item for item in modelo.itens.all()}
+    criados, alterados, removidos = comparar_itens(
+        existentes,
+        itens_data,
+        lambda exercicio_id, dados: ItemModeloTreino(
+            modelo=modelo, exercicio_id=exercicio_id, **dados
+        ),
+        parcial,
+    )
+
+    if removidos:
+        # Nenhuma FK ou signal depende do item: o delete() vira um DELETE só
+        ItemModeloTreino.objects.filter(pk__in=[item.pk for item in removidos]).delete()
+    if alterados:
+        campos = set().union(*(mudou for _, mudou in alterados))
+        ItemModeloTreino.objects.bulk_update(
+            [item for item, _ in alterados], sorted(campos)
+        )
+    if criados:
+        ItemModeloTreino.objects.bulk_create(criados)
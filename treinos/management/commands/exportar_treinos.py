@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.api_views import treinos_visiveis
+from core.exportacao import GERADORES, TAMANHO_LOTE
+from treinos.models import Treino
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta os treinos com os seus itens em NDJSON ou CSV, lendo em lotes "
+        "para manter a memória constante"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--formato",
+            choices=sorted(GERADORES),
+            default="ndjson",
+            help="Formato da exportação (padrão: ndjson)",
+        )
+        parser.add_argument(
+            "--saida",
+            help="Arquivo de saída (padrão: saída padrão)",
+        )
+        parser.add_argument(
+            "--usuario",
+            help="E-mail do usuário cujas regras de acesso limitam a exportação "
+            "(padrão: todos os treinos)",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=TAMANHO_LOTE,
+            help=f"Treinos lidos por consulta (padrão: {TAMANHO_LOTE})",
+        )
+
+    def handle(self, *args, **options):
+        treinos = Treino.objects.all()
+        if options["usuario"]:
+            try:
+                user = User.objects.get(email=options["usuario"])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário {options['usuario']} não encontrado")
+            treinos = treinos_visiveis(user)
+
+        linhas = GERADORES[options["formato"]](treinos, options["lote"])
+
+        if not options["saida"]:
+            for linha in linhas:
+                self.stdout.write(linha, ending="")
+            return
+
+        total = 0
+        with open(options["saida"], "w", encoding="utf-8", newline="") as arquivo:
+            for linha in linhas:
+                arquivo.write(linha)
+                total += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} linha(s) exportada(s) em {options['saida']}.")
+        )
@@ -0,0 +1,71 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacao import ImportacaoInvalida, importar_alunos, ler_arquivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa alunos em lote de um arquivo CSV ou JSON: valida o arquivo "
+        "inteiro, faz o hash das senhas em paralelo e grava tudo em uma transação"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Arquivo .csv ou .json com os alunos")
+        parser.add_argument(
+            "--formato",
+            choices=["csv", "json"],
+            help="Formato do arquivo (padrão: a extensão do arquivo)",
+        )
+        parser.add_argument(
+            "--academia",
+            type=int,
+            help="Academia dos alunos que não informarem uma",
+        )
+        parser.add_argument(
+            "--personal",
+            type=int,
+            help="Personal responsável dos alunos que não informarem um",
+        )
+        parser.add_argument(
+            "--processos",
+            type=int,
+            help="Processos para o hash das senhas (padrão: um por CPU)",
+        )
+
+    def handle(self, *args, **options):
+        caminho = Path(options["arquivo"])
+        if not caminho.is_file():
+            raise CommandError(f"Arquivo {caminho} não encontrado")
+        formato = options["formato"] or caminho.suffix.lstrip(".").lower()
+
+        padroes = {
+            "academia": options["academia"],
+            "personal_responsavel": options["personal"],
+        }
+        inicio = time.perf_counter()
+        try:
+            linhas = ler_arquivo(caminho.read_bytes(), formato)
+            ids = importar_alunos(
+                linhas,
+                padroes={campo: valor for campo, valor in padroes.items() if valor},
+                processos=options["processos"] or os.cpu_count(),
+            )
+        except ImportacaoInvalida as erro:
+            for mensagem in erro.erros.get("arquivo", []):
+                self.stderr.write(mensagem)
+            for linha in erro.erros.get("linhas", []):
+                for campo, erros in linha["erros"].items():
+                    for item in erros:
+                        self.stderr.write(
+                            f"Linha {linha['linha']}, {campo}: {item['message']}"
+                        )
+            raise CommandError("Nenhum aluno importado.")
+
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(ids)} aluno(s) importado(s) em {duracao:.1f}s.")
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from academias.models import Aluno
+from treinos.contadores import recalcular_contador
+
+
+class Command(BaseCommand):
+    help = "Recalcula a partir do histórico de sessões os contadores dos alunos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--aluno",
+            type=int,
+            help="Recalcula apenas o aluno com este id",
+        )
+
+    def handle(self, *args, **options):
+        alunos = Aluno.objects.values_list("pk", flat=True)
+        if options["aluno"]:
+            alunos = alunos.filter(pk=options["aluno"])
+
+        total = 0
+        for aluno_id in list(alunos):
+            recalcular_contador(aluno_id)
+            total += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Contadores recalculados para {total} aluno(s).")
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from treinos.historico_carga import reconstruir_historico
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói do zero o histórico de carga a partir das fichas de treino "
+        "e das séries realizadas"
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconstruindo histórico de carga...")
+        total_ficha, total_sessao = reconstruir_historico()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Histórico reconstruído! {total_ficha} pontos de ficha, "
+                f"{total_sessao} pontos de sessão."
+            )
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from treinos.resumos import reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero os resumos diários de treinos usados nos relatórios"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconstruindo resumos diários...")
+        total_resumos, total_categorias = reconstruir_resumos()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Resumos reconstruídos! {total_resumos} resumos diários, "
+                f"{total_categorias} resumos por categoria."
+            )
+        )
@@ -0,0 +1,54 @@
+"""
+Atribuição de modelos de treino (ModeloTreino) a vários alunos.
+
+Cada aluno recebe uma cópia do modelo como Treino, com os itens copiados para
+ItemTreino. Os treinos e os itens são gravados com um bulk_create cada, em uma
+transação, de modo que atribuir a 100 alunos custa poucos INSERTs em vez de
+um por treino e por item.
+
+bulk_create não dispara os signals de treinos/signals.py, então o que eles
+fariam é feito aqui uma vez para o lote: os resumos diários dos alunos são
+recalculados com consultas agrupadas e as cargas prescritas entram no
+histórico de carga. Os escopos de cache ficam a cargo de quem chama (a view
+da API), como nas outras gravações em lote.
+"""
+
+from django.db import transaction
+
+from .historico_carga import registrar_cargas_da_ficha
+from .models import ItemTreino, Treino
+from .resumos import dia_local, recalcular_dias_dos_alunos
+
+CAMPOS_ITEM = ("exercicio_id", "series", "repeticoes", "carga_kg", "observacoes")
+
+
+@transaction.atomic
+def atribuir_modelo(modelo, aluno_ids, nome_treino=None, ativo=True):
+    """
+    Cria um Treino com os itens de `modelo` para cada aluno de `aluno_ids`.
+    Retorna os treinos criados, na ordem dos alunos.
+    """
+    itens = list(modelo.itens.order_by("pk").values(*CAMPOS_ITEM))
+
+    treinos = Treino.objects.bulk_create(
+        Treino(
+            aluno_id=aluno_id,
+            personal_criador_id=modelo.personal_criador_id,
+            nome_treino=nome_treino or modelo.nome,
+            ativo=ativo,
+        )
+        for aluno_id in aluno_ids
+    )
+    ItemTreino.objects.bulk_create(
+        ItemTreino(treino=treino, **item) for treino in treinos for item in itens
+    )
+
+    recalcular_dias_dos_alunos(
+        aluno_ids, {dia_local(treino.data_criacao) for treino in treinos}
+    )
+    registrar_cargas_da_ficha(
+        (treino.aluno_id, item["exercicio_id"], item["carga_kg"])
+        for treino in treinos
+        for item in itens
+    )
+    return treinos
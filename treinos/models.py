@@ -1,7 +1,7 @@
 from django.db import models
 
 # conexão Aluno e Personal
-from academias.models import Aluno, PersonalTrainer
+from academias.models import Academia, Aluno, PersonalTrainer
 
 class Exercicio(models.Model):
     """
@@ -32,6 +32,11 @@ class Exercicio(models.Model):
     instructions = models.JSONField(verbose_name="Instruções")
     images = models.JSONField(verbose_name="Caminhos das Imagens")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["category"]),
+        ]
+
     def __str__(self):
         return self.nome
     
@@ -66,6 +71,14 @@ class Treino(models.Model):
         through='ItemTreino',
         verbose_name="Exercícios"
     )
+
+    class Meta:
+        indexes = [
+            # ordem da paginação por cursor da API, geral e por personal
+            models.Index(fields=["data_criacao", "id"]),
+            models.Index(fields=["personal_criador", "data_criacao"]),
+            models.Index(fields=["aluno", "data_criacao"]),
+        ]
     
     def __str__(self):
         return f"{self.nome_treino} - {self.aluno.user.get_full_name()}"
@@ -111,3 +124,318 @@ class ItemTreino(models.Model):
 
     def __str__(self):
         return f"{self.exercicio.nome} ({self.series}x{self.repeticoes}) no {self.treino.nome_treino}"
+
+
+class ModeloTreino(models.Model):
+    """
+    Ficha de treino reutilizável de um personal (Ex: "Treino A - Hipertrofia").
+    Não pertence a nenhum aluno: é copiada para os alunos como Treino
+    (ver treinos/modelos.py).
+    """
+    personal_criador = models.ForeignKey(
+        PersonalTrainer,
+        on_delete=models.CASCADE,
+        related_name="modelos_treino"
+    )
+
+    nome = models.CharField(max_length=50, verbose_name="Nome do Modelo (Ex: Treino A)")
+    descricao = models.CharField(max_length=255, blank=True, verbose_name="Descrição")
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Modelo de treino"
+        verbose_name_plural = "Modelos de treino"
+        indexes = [
+            # ordem da paginação por cursor da API
+            models.Index(fields=["data_criacao", "id"]),
+            models.Index(fields=["personal_criador", "data_criacao"]),
+        ]
+
+    def __str__(self):
+        return self.nome
+
+
+class ItemModeloTreino(models.Model):
+    """
+    Linha de um ModeloTreino, com os mesmos campos de ItemTreino.
+    """
+    modelo = models.ForeignKey(
+        ModeloTreino,
+        on_delete=models.CASCADE,
+        related_name="itens"
+    )
+
+    exercicio = models.ForeignKey(
+        Exercicio,
+        on_delete=models.CASCADE,
+        related_name="itens_modelo"
+    )
+
+    series = models.PositiveIntegerField(verbose_name="Séries")
+    repeticoes = models.CharField(
+        max_length=20, verbose_name="Repetições (Ex: 10-12 ou 'Até a falha')"
+    )
+    carga_kg = models.PositiveIntegerField(
+        blank=True, null=True, verbose_name="Carga (kg)"
+    )
+    observacoes = models.CharField(
+        max_length=200, blank=True, null=True, verbose_name="Observações"
+    )
+
+    class Meta:
+        unique_together = ('modelo', 'exercicio')
+
+    def __str__(self):
+        return f"{self.exercicio.nome} ({self.series}x{self.repeticoes}) no {self.modelo.nome}"
+
+
+class SessaoTreino(models.Model):
+    """
+    Uma execução real de um Treino pelo aluno (uma ida à academia).
+    As séries feitas durante a sessão ficam em SerieRealizada.
+    """
+    treino = models.ForeignKey(
+        Treino,
+        on_delete=models.CASCADE,
+        related_name="sessoes"
+    )
+
+    # copiado do treino para consultar o histórico do aluno sem join
+    aluno = models.ForeignKey(
+        Aluno,
+        on_delete=models.CASCADE,
+        related_name="sessoes"
+    )
+
+    inicio = models.DateTimeField(verbose_name="Início")
+    fim = models.DateTimeField(blank=True, null=True, verbose_name="Fim")
+
+    class Meta:
+        verbose_name = "Sessão de treino"
+        verbose_name_plural = "Sessões de treino"
+        indexes = [
+            models.Index(fields=["aluno", "inicio"]),
+            models.Index(fields=["inicio", "id"]),
+        ]
+
+    @property
+    def duracao_minutos(self):
+        if not self.fim:
+            return 0
+        return max(int((self.fim - self.inicio).total_seconds() // 60), 0)
+
+    def __str__(self):
+        return f"{self.treino.nome_treino} em {self.inicio:%d/%m/%Y %H:%M}"
+
+
+class SerieRealizada(models.Model):
+    """
+    Uma série executada de um ItemTreino durante uma sessão,
+    com as repetições e a carga realmente feitas.
+    """
+    sessao = models.ForeignKey(
+        SessaoTreino,
+        on_delete=models.CASCADE,
+        related_name="series"
+    )
+
+    # o item pode sair da ficha depois; o exercício mantém o histórico
+    item = models.ForeignKey(
+        ItemTreino,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="series_realizadas"
+    )
+    exercicio = models.ForeignKey(
+        Exercicio,
+        on_delete=models.CASCADE,
+        related_name="series_realizadas"
+    )
+
+    numero = models.PositiveSmallIntegerField(verbose_name="Número da série")
+    repeticoes = models.PositiveIntegerField(verbose_name="Repetições feitas")
+    carga_kg = models.DecimalField(
+        max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Carga (kg)"
+    )
+    realizada_em = models.DateTimeField(verbose_name="Realizada em")
+
+    class Meta:
+        verbose_name = "Série realizada"
+        verbose_name_plural = "Séries realizadas"
+        indexes = [
+            models.Index(fields=["exercicio", "realizada_em"]),
+        ]
+
+    def __str__(self):
+        return f"{self.exercicio.nome} - série {self.numero}: {self.repeticoes} reps"
+
+
+class HistoricoCarga(models.Model):
+    """
+    Ponto da evolução de carga de um aluno em um exercício.
+    Vem da ficha (carga prescrita no ItemTreino, a cada mudança) ou de uma
+    sessão (maior carga feita no exercício naquela sessão).
+    Ver treinos/historico_carga.py.
+    """
+    ORIGEM_FICHA = "ficha"
+    ORIGEM_SESSAO = "sessao"
+    ORIGENS = [
+        (ORIGEM_FICHA, "Ficha de treino"),
+        (ORIGEM_SESSAO, "Sessão realizada"),
+    ]
+
+    aluno = models.ForeignKey(
+        Aluno,
+        on_delete=models.CASCADE,
+        related_name="historico_carga"
+    )
+    exercicio = models.ForeignKey(
+        Exercicio,
+        on_delete=models.CASCADE,
+        related_name="historico_carga"
+    )
+
+    # só preenchida nos pontos de sessão; some junto com a sessão
+    sessao = models.ForeignKey(
+        SessaoTreino,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="historico_carga"
+    )
+
+    origem = models.CharField(max_length=10, choices=ORIGENS, verbose_name="Origem")
+    carga_kg = models.DecimalField(max_digits=6, decimal_places=2, verbose_name="Carga (kg)")
+    registrado_em = models.DateTimeField(verbose_name="Registrado em")
+
+    class Meta:
+        verbose_name = "Histórico de carga"
+        verbose_name_plural = "Históricos de carga"
+        indexes = [
+            models.Index(fields=["aluno", "exercicio", "registrado_em"]),
+            models.Index(fields=["aluno", "registrado_em"]),
+        ]
+
+    def __str__(self):
+        return f"{self.exercicio.nome}: {self.carga_kg} kg em {self.registrado_em:%d/%m/%Y}"
+
+
+class ContadorAluno(models.Model):
+    """
+    Contadores correntes do aluno (sequência de dias, semana atual),
+    atualizados a cada sessão registrada para que o dashboard não precise
+    varrer o histórico. Ver treinos/contadores.py.
+    """
+    aluno = models.OneToOneField(
+        Aluno,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="contador"
+    )
+
+    sequencia_atual = models.PositiveIntegerField(default=0, verbose_name="Sequência atual (dias)")
+    maior_sequencia = models.PositiveIntegerField(default=0, verbose_name="Maior sequência (dias)")
+    ultimo_dia = models.DateField(blank=True, null=True, verbose_name="Último dia treinado")
+
+    semana_inicio = models.DateField(blank=True, null=True, verbose_name="Início da semana contada")
+    sessoes_semana = models.PositiveIntegerField(default=0, verbose_name="Sessões na semana")
+    minutos_semana = models.PositiveIntegerField(default=0, verbose_name="Minutos na semana")
+    minutos_totais = models.PositiveIntegerField(default=0, verbose_name="Minutos no total")
+
+    class Meta:
+        verbose_name = "Contador do aluno"
+        verbose_name_plural = "Contadores dos alunos"
+
+    def __str__(self):
+        return f"Aluno {self.aluno_id}: {self.sequencia_atual} dia(s) seguidos"
+
+
+class ResumoDiario(models.Model):
+    """
+    Fato diário de atividade de treinos.
+    Cada linha soma os treinos criados em um dia para um par (aluno, personal),
+    com a academia do aluno copiada para permitir recortes por academia
+    sem join. Mantido pelos signals em treinos/signals.py.
+    """
+    dia = models.DateField(verbose_name="Dia")
+    aluno = models.ForeignKey(
+        Aluno,
+        on_delete=models.CASCADE,
+        related_name="resumos_diarios"
+    )
+    personal = models.ForeignKey(
+        PersonalTrainer,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="resumos_diarios"
+    )
+    academia = models.ForeignKey(
+        Academia,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="resumos_diarios"
+    )
+
+    total_treinos = models.PositiveIntegerField(default=0, verbose_name="Treinos")
+    treinos_ativos = models.PositiveIntegerField(default=0, verbose_name="Treinos ativos")
+    total_itens = models.PositiveIntegerField(default=0, verbose_name="Exercícios")
+    total_series = models.PositiveIntegerField(default=0, verbose_name="Séries")
+
+    class Meta:
+        verbose_name = "Resumo diário"
+        verbose_name_plural = "Resumos diários"
+        indexes = [
+            models.Index(fields=["dia"]),
+            models.Index(fields=["academia", "dia"]),
+            models.Index(fields=["personal", "dia"]),
+            models.Index(fields=["aluno", "dia"]),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} - aluno {self.aluno_id}: {self.total_treinos} treino(s)"
+
+
+class ResumoDiarioCategoria(models.Model):
+    """
+    Contagem diária de exercícios por categoria, no mesmo recorte de ResumoDiario.
+    """
+    dia = models.DateField(verbose_name="Dia")
+    aluno = models.ForeignKey(
+        Aluno,
+        on_delete=models.CASCADE,
+        related_name="resumos_categoria"
+    )
+    personal = models.ForeignKey(
+        PersonalTrainer,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="resumos_categoria"
+    )
+    academia = models.ForeignKey(
+        Academia,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="resumos_categoria"
+    )
+    categoria = models.CharField(max_length=50, blank=True, null=True, verbose_name="Categoria")
+
+    total_itens = models.PositiveIntegerField(default=0, verbose_name="Exercícios")
+    total_series = models.PositiveIntegerField(default=0, verbose_name="Séries")
+
+    class Meta:
+        verbose_name = "Resumo diário por categoria"
+        verbose_name_plural = "Resumos diários por categoria"
+        indexes = [
+            models.Index(fields=["dia"]),
+            models.Index(fields=["academia", "dia"]),
+            models.Index(fields=["personal", "dia"]),
+            models.Index(fields=["aluno", "dia"]),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} - {self.categoria}: {self.total_itens} exercício(s)"
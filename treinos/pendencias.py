@@ -0,0 +1,45 @@
+"""
+Trabalho dos signals adiado para o commit e feito uma vez por transação.
+
+Os signals de ItemTreino disparam uma vez por item: salvar ou excluir um
+treino com 30 itens recalcularia o mesmo resumo diário e invalidaria os
+mesmos escopos de cache 30 vezes. Com `agendar_no_commit` cada signal só
+anota o que precisa ser feito, e no commit a tarefa roda uma vez com tudo o
+que foi anotado na transação (fora de uma transação, roda na hora).
+"""
+
+from functools import partial
+
+from django.db import transaction
+
+
+def agendar_no_commit(nome, itens, executar):
+    """
+    Junta `itens` aos já anotados sob `nome` na transação atual e agenda
+    `executar(itens)` para o commit, com todos eles.
+    """
+    conexao = transaction.get_connection()
+    pendentes = conexao.__dict__.setdefault("_pendencias_no_commit", {})
+    if not _agendado(conexao, nome):
+        # Anotações sem callback sobraram de uma transação desfeita
+        pendentes.pop(nome, None)
+    pendentes.setdefault(nome, set()).update(itens)
+    # Um callback por chamada: o primeiro executa tudo e os demais não acham
+    # nada. Registrar um só deixaria as anotações sem callback depois do
+    # rollback de um savepoint, que descarta os callbacks registrados nele.
+    transaction.on_commit(partial(_executar, conexao, nome, executar))
+
+
+def _agendado(conexao, nome):
+    return any(
+        isinstance(callback, partial)
+        and callback.func is _executar
+        and callback.args[1] == nome
+        for _, callback, _ in conexao.run_on_commit
+    )
+
+
+def _executar(conexao, nome, executar):
+    itens = conexao.__dict__.get("_pendencias_no_commit", {}).pop(nome, None)
+    if itens:
+        executar(itens)
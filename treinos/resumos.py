@@ -0,0 +1,241 @@
+"""
+Manutenção das tabelas de resumo diário (ResumoDiario e ResumoDiarioCategoria).
+
+Uma "célula" é o recorte (aluno, personal, dia) de um treino. Sempre que um
+treino ou item muda, apenas as células afetadas são recalculadas a partir dos
+dados de origem, o que mantém os resumos corretos mesmo em edições e exclusões.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from academias.models import Aluno
+from .models import ItemTreino, ResumoDiario, ResumoDiarioCategoria, Treino
+from .pendencias import agendar_no_commit
+
+
+def dia_local(data):
+    """Converte um datetime para a data no fuso horário atual."""
+    return timezone.localtime(data).date()
+
+
+def celula_do_treino(treino):
+    """Retorna a célula (aluno_id, personal_id, dia) de um treino."""
+    return (treino.aluno_id, treino.personal_criador_id, dia_local(treino.data_criacao))
+
+
+def celulas_dos_treinos(treino_ids):
+    """Retorna as células dos treinos informados, com uma única consulta."""
+    treinos = Treino.objects.filter(pk__in=treino_ids).values_list(
+        "aluno_id", "personal_criador_id", "data_criacao"
+    )
+    return {
+        (aluno_id, personal_id, dia_local(data_criacao))
+        for aluno_id, personal_id, data_criacao in treinos
+    }
+
+
+def _intervalo_do_dia(dia):
+    inicio = timezone.make_aware(datetime.combine(dia, time.min))
+    return inicio, inicio + timedelta(days=1)
+
+
+def recalcular_celula(aluno_id, personal_id, dia):
+    """
+    Recalcula os resumos de uma célula a partir de Treino e ItemTreino.
+    Células que ficaram vazias são removidas.
+    """
+    inicio, fim = _intervalo_do_dia(dia)
+    treinos = Treino.objects.filter(
+        aluno_id=aluno_id,
+        personal_criador_id=personal_id,
+        data_criacao__gte=inicio,
+        data_criacao__lt=fim,
+    )
+    totais = treinos.aggregate(
+        total=Count("pk"), ativos=Count("pk", filter=Q(ativo=True))
+    )
+    categorias = list(
+        ItemTreino.objects.filter(treino__in=treinos)
+        .order_by()
+        .values("exercicio__category")
+        .annotate(total=Count("pk"), series=Sum("series"))
+    )
+    academia_id = (
+        Aluno.objects.filter(pk=aluno_id).values_list("academia_id", flat=True).first()
+    )
+    filtro = {"aluno_id": aluno_id, "personal_id": personal_id, "dia": dia}
+
+    with transaction.atomic():
+        ResumoDiario.objects.filter(**filtro).delete()
+        ResumoDiarioCategoria.objects.filter(**filtro).delete()
+
+        if not totais["total"]:
+            return
+
+        ResumoDiario.objects.create(
+            academia_id=academia_id,
+            total_treinos=totais["total"],
+            treinos_ativos=totais["ativos"],
+            total_itens=sum(c["total"] for c in categorias),
+            total_series=sum(c["series"] or 0 for c in categorias),
+            **filtro,
+        )
+        ResumoDiarioCategoria.objects.bulk_create(
+            ResumoDiarioCategoria(
+                academia_id=academia_id,
+                categoria=c["exercicio__category"],
+                total_itens=c["total"],
+                total_series=c["series"] or 0,
+                **filtro,
+            )
+            for c in categorias
+        )
+
+
+def recalcular_celulas(celulas):
+    """Recalcula um conjunto de células (ver `celula_do_treino`)."""
+    for aluno_id, personal_id, dia in set(celulas):
+        recalcular_celula(aluno_id, personal_id, dia)
+
+
+def recalcular_no_commit(celulas=(), treino_ids=()):
+    """
+    Agenda o recálculo de `celulas` e das células de `treino_ids` para o
+    commit (ver treinos/pendencias.py): salvar um treino com 30 itens
+    recalcula a célula uma vez, não 31. As células dos treinos são lidas só
+    no commit, com uma consulta para todos.
+    """
+    agendar_no_commit(
+        "resumos",
+        [("celula", celula) for celula in celulas]
+        + [("treino", treino_id) for treino_id in treino_ids],
+        _recalcular_pendentes,
+    )
+
+
+def _recalcular_pendentes(pendentes):
+    celulas = {valor for tipo, valor in pendentes if tipo == "celula"}
+    treino_ids = {valor for tipo, valor in pendentes if tipo == "treino"}
+    if treino_ids:
+        celulas |= celulas_dos_treinos(treino_ids)
+    recalcular_celulas(celulas)
+
+
+def atualizar_academia_do_aluno(aluno):
+    """Copia a academia atual do aluno para os seus resumos."""
+    for modelo in (ResumoDiario, ResumoDiarioCategoria):
+        modelo.objects.filter(aluno=aluno).exclude(
+            academia_id=aluno.academia_id
+        ).update(academia_id=aluno.academia_id)
+
+
+def _resumos_agrupados(treinos, itens):
+    """
+    Monta (sem gravar) os ResumoDiario e ResumoDiarioCategoria de `treinos`
+    e dos seus `itens`, com uma consulta agrupada para cada modelo.
+    """
+    treinos = (
+        treinos.annotate(dia=TruncDate("data_criacao"))
+        .order_by()
+        .values("dia", "aluno_id", "personal_criador_id", "aluno__academia_id")
+        .annotate(total=Count("pk"), ativos=Count("pk", filter=Q(ativo=True)))
+    )
+    categorias = (
+        itens.annotate(dia=TruncDate("treino__data_criacao"))
+        .order_by()
+        .values(
+            "dia",
+            "treino__aluno_id",
+            "treino__personal_criador_id",
+            "treino__aluno__academia_id",
+            "exercicio__category",
+        )
+        .annotate(total=Count("pk"), series=Sum("series"))
+    )
+
+    resumos = {}
+    for linha in treinos:
+        chave = (linha["aluno_id"], linha["personal_criador_id"], linha["dia"])
+        resumos[chave] = ResumoDiario(
+            dia=linha["dia"],
+            aluno_id=linha["aluno_id"],
+            personal_id=linha["personal_criador_id"],
+            academia_id=linha["aluno__academia_id"],
+            total_treinos=linha["total"],
+            treinos_ativos=linha["ativos"],
+        )
+
+    resumos_categoria = []
+    for linha in categorias:
+        chave = (
+            linha["treino__aluno_id"],
+            linha["treino__personal_criador_id"],
+            linha["dia"],
+        )
+        resumo = resumos[chave]
+        resumo.total_itens += linha["total"]
+        resumo.total_series += linha["series"] or 0
+        resumos_categoria.append(
+            ResumoDiarioCategoria(
+                dia=linha["dia"],
+                aluno_id=resumo.aluno_id,
+                personal_id=resumo.personal_id,
+                academia_id=resumo.academia_id,
+                categoria=linha["exercicio__category"],
+                total_itens=linha["total"],
+                total_series=linha["series"] or 0,
+            )
+        )
+
+    return list(resumos.values()), resumos_categoria
+
+
+@transaction.atomic
+def recalcular_dias_dos_alunos(aluno_ids, dias):
+    """
+    Recalcula todas as células dos `aluno_ids` nos `dias` com consultas
+    agrupadas, em número fixo qualquer que seja a quantidade de alunos. Para
+    gravações em lote, em que `recalcular_celulas` faria consultas por célula.
+    """
+    aluno_ids, dias = set(aluno_ids), set(dias)
+    if not aluno_ids or not dias:
+        return
+
+    inicio, _ = _intervalo_do_dia(min(dias))
+    _, fim = _intervalo_do_dia(max(dias))
+    treinos = Treino.objects.filter(
+        aluno_id__in=aluno_ids, data_criacao__gte=inicio, data_criacao__lt=fim
+    )
+    resumos, resumos_categoria = _resumos_agrupados(
+        treinos, ItemTreino.objects.filter(treino__in=treinos)
+    )
+
+    filtro = {"aluno_id__in": aluno_ids, "dia__in": dias}
+    ResumoDiario.objects.filter(**filtro).delete()
+    ResumoDiarioCategoria.objects.filter(**filtro).delete()
+    ResumoDiario.objects.bulk_create(r for r in resumos if r.dia in dias)
+    ResumoDiarioCategoria.objects.bulk_create(
+        r for r in resumos_categoria if r.dia in dias
+    )
+
+
+@transaction.atomic
+def reconstruir_resumos():
+    """
+    Apaga e reconstrói todos os resumos com consultas agrupadas.
+    Retorna o número de linhas criadas em (ResumoDiario, ResumoDiarioCategoria).
+    """
+    ResumoDiario.objects.all().delete()
+    ResumoDiarioCategoria.objects.all().delete()
+
+    resumos, resumos_categoria = _resumos_agrupados(
+        Treino.objects.all(), ItemTreino.objects.all()
+    )
+    ResumoDiario.objects.bulk_create(resumos, batch_size=1000)
+    ResumoDiarioCategoria.objects.bulk_create(resumos_categoria, batch_size=1000)
+    return len(resumos), len(resumos_categoria)
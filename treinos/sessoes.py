@@ -0,0 +1,53 @@
+"""
+Gravação das sessões de treino e das séries realizadas.
+
+É o caminho de escrita mais quente do sistema (alunos registrando séries
+durante o pico da academia), por isso cada lote vira um único bulk_create
+dentro de uma transação, sem signals por linha.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .historico_carga import registrar_cargas_da_sessao
+from .models import ItemTreino, SerieRealizada
+
+
+def itens_do_treino(treino_id):
+    """Retorna {item_id: exercicio_id} dos itens de um treino."""
+    return dict(
+        ItemTreino.objects.filter(treino_id=treino_id).values_list("pk", "exercicio_id")
+    )
+
+
+def registrar_series(sessao, series, itens=None):
+    """
+    Grava um lote de séries já validadas em uma sessão.
+
+    Cada série é um dict com "item", "numero", "repeticoes" e, opcionalmente,
+    "carga_kg" e "realizada_em". `itens` é o mapa de `itens_do_treino`,
+    se já tiver sido carregado. As maiores cargas do lote também entram no
+    histórico de carga do aluno. Retorna as séries criadas.
+    """
+    if itens is None:
+        itens = itens_do_treino(sessao.treino_id)
+
+    agora = timezone.now()
+    objetos = [
+        SerieRealizada(
+            sessao_id=sessao.pk,
+            item_id=serie["item"],
+            exercicio_id=itens[serie["item"]],
+            numero=serie["numero"],
+            repeticoes=serie["repeticoes"],
+            carga_kg=serie.get("carga_kg"),
+            realizada_em=serie.get("realizada_em") or agora,
+        )
+        for serie in series
+    ]
+
+    with transaction.atomic():
+        SerieRealizada.objects.bulk_create(objetos)
+        registrar_cargas_da_sessao(sessao, objetos)
+
+    return objetos
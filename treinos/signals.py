@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from academias.models import Aluno
+from .contadores import ajustar_minutos, recalcular_contador, registrar_sessao
+from .historico_carga import registrar_carga_da_ficha
+from .models import ItemTreino, SessaoTreino, Treino
+from .resumos import (
+    atualizar_academia_do_aluno,
+    celula_do_treino,
+    celulas_dos_treinos,
+    recalcular_no_commit,
+)
+
+
+@receiver(pre_save, sender=Treino)
+def guardar_celula_anterior(sender, instance, raw=False, **kwargs):
+    """
+    Guarda a célula de resumo do treino antes da edição, para que ela também
+    seja recalculada caso o aluno ou o personal do treino mudem.
+    """
+    instance._celulas_anteriores = set()
+    if instance.pk and not raw:
+        instance._celulas_anteriores = celulas_dos_treinos([instance.pk])
+
+
+@receiver(post_save, sender=Treino)
+def atualizar_resumo_treino(sender, instance, raw=False, **kwargs):
+    """Recalcula os resumos diários afetados por um treino salvo."""
+    if raw:
+        return
+    celulas = getattr(instance, "_celulas_anteriores", set())
+    recalcular_no_commit(celulas | {celula_do_treino(instance)})
+
+
+@receiver(post_delete, sender=Treino)
+def remover_resumo_treino(sender, instance, **kwargs):
+    """Recalcula o resumo diário do qual o treino excluído fazia parte."""
+    recalcular_no_commit([celula_do_treino(instance)])
+
+
+@receiver(post_save, sender=ItemTreino)
+@receiver(post_delete, sender=ItemTreino)
+def atualizar_resumo_item(sender, instance, raw=False, **kwargs):
+    """
+    Recalcula o resumo diário do treino ao qual o item pertence, uma vez por
+    transação, junto com os demais itens e o próprio treino.
+    """
+    if raw:
+        return
+    # Na exclusão em cascata de um treino o treino já não existe no commit;
+    # a célula dele vem do signal do próprio treino.
+    recalcular_no_commit(treino_ids=[instance.treino_id])
+
+
+@receiver(post_save, sender=ItemTreino)
+def registrar_historico_item(sender, instance, raw=False, **kwargs):
+    """Leva a carga prescrita no item para o histórico de carga do aluno."""
+    if not raw:
+        registrar_carga_da_ficha(instance)
+
+
+@receiver(post_save, sender=Aluno)
+def atualizar_academia_resumos(sender, instance, created, raw=False, **kwargs):
+    """Mantém a academia copiada nos resumos igual à academia do aluno."""
+    if not created and not raw:
+        atualizar_academia_do_aluno(instance)
+
+
+@receiver(pre_save, sender=SessaoTreino)
+def guardar_sessao_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda início e duração anteriores para atualizar os contadores."""
+    instance._sessao_anterior = None
+    if instance.pk and not raw:
+        instance._sessao_anterior = (
+            SessaoTreino.objects.filter(pk=instance.pk).only("inicio", "fim").first()
+        )
+
+
+@receiver(post_save, sender=SessaoTreino)
+def atualizar_contador_sessao(sender, instance, created, raw=False, **kwargs):
+    """Atualiza os contadores do aluno a cada sessão registrada ou alterada."""
+    if raw:
+        return
+    anterior = getattr(instance, "_sessao_anterior", None)
+    if created or anterior is None:
+        registrar_sessao(instance)
+    elif anterior.inicio != instance.inicio:
+        recalcular_contador(instance.aluno_id)
+    else:
+        ajustar_minutos(instance, anterior.duracao_minutos)
+
+
+@receiver(post_delete, sender=SessaoTreino)
+def remover_sessao_contador(sender, instance, **kwargs):
+    """Recalcula os contadores do aluno depois que uma sessão é excluída."""
+    aluno_id = instance.aluno_id
+
+    def recalcular():
+        # Na exclusão do próprio aluno não há mais contador a manter.
+        if Aluno.objects.filter(pk=aluno_id).exists():
+            recalcular_contador(aluno_id)
+
+    transaction.on_commit(recalcular)
@@ -1,3 +1,313 @@
+"""
+Gravação das sessões de treino em lotes (treinos/sessoes.py) e contadores
+dos alunos (treinos/contadores.py).
+
+Cada lote de séries custa o mesmo número de queries qualquer que seja o
+tamanho, e deixa no histórico de carga um único ponto de sessão por
+exercício, com a maior carga feita. Os contadores mantidos sessão a sessão
+têm de bater com os recalculados do histórico pelo comando
+recalcular_contadores.
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from academias.models import Aluno, PersonalTrainer
+from .contadores import inicio_da_semana, valores_atuais
+from .models import (
+    ContadorAluno,
+    Exercicio,
+    HistoricoCarga,
+    ItemTreino,
+    SerieRealizada,
+    SessaoTreino,
+    Treino,
+)
+from .sessoes import itens_do_treino, registrar_series
+
+User = get_user_model()
+
+# Uma quarta-feira: a semana dela começa na segunda, dia 12
+HOJE = date(2026, 10, 14)
+
+# Tamanhos de lote medidos; todos cabem em um único INSERT
+TAMANHOS_LOTE = (1, 10, 50)
+
+# Queries de um lote: INSERT das séries, SELECT dos pontos da sessão e o
+# INSERT ou UPDATE deles, mais os SAVEPOINTs das duas transações aninhadas
+ORCAMENTO_LOTE = 7
+
+
+def criar_usuario(nome, tipo):
+    return User.objects.create_user(
+        username=nome,
+        email=f"{nome}@athlos.test",
+        password="senha-de-teste",
+        user_type=tipo,
+    )
+
+
+class RegistrarSeriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = Aluno.objects.get(user=criar_usuario("aluno", "ALUNO"))
+        personal = PersonalTrainer.objects.get(
+            user=criar_usuario("personal", "PERSONAL")
+        )
+        exercicios = Exercicio.objects.bulk_create(
+            Exercicio(
+                nome=f"Exercício {i}",
+                primary_muscles=[],
+                secondary_muscles=[],
+                instructions=[],
+                images=[],
+            )
+            for i in range(max(TAMANHOS_LOTE))
+        )
+        cls.treino = Treino.objects.create(
+            aluno=cls.aluno, personal_criador=personal, nome_treino="Ficha"
+        )
+        cls.itens = ItemTreino.objects.bulk_create(
+            ItemTreino(
+                treino=cls.treino, exercicio=exercicio, series=3, repeticoes="10"
+            )
+            for exercicio in exercicios
+        )
+
+    def nova_sessao(self):
+        return SessaoTreino.objects.create(
+            treino=self.treino, aluno=self.aluno, inicio=timezone.now()
+        )
+
+    def series(self, itens, carga, numero=1, **extras):
+        return [
+            {
+                "item": item.pk,
+                "numero": numero,
+                "repeticoes": 10,
+                "carga_kg": None if carga is None else Decimal(carga),
+                **extras,
+            }
+            for item in itens
+        ]
+
+    def pontos(self, sessao):
+        return {
+            ponto.exercicio_id: ponto
+            for ponto in HistoricoCarga.objects.filter(sessao=sessao)
+        }
+
+    def test_exercicio_vem_do_item(self):
+        sessao = self.nova_sessao()
+        registrar_series(sessao, self.series(self.itens[:3], 20))
+
+        self.assertEqual(
+            set(
+                SerieRealizada.objects.filter(sessao=sessao).values_list(
+                    "item_id", "exercicio_id"
+                )
+            ),
+            {(item.pk, item.exercicio_id) for item in self.itens[:3]},
+        )
+
+    def test_um_ponto_por_exercicio_com_a_maior_carga(self):
+        sessao = self.nova_sessao()
+        item = self.itens[0]
+        quando = timezone.now() - timedelta(minutes=30)
+        registrar_series(
+            sessao,
+            self.series([item], 40, numero=1)
+            + self.series([item], 50, numero=2, realizada_em=quando)
+            + self.series([item], 45, numero=3),
+        )
+
+        pontos = self.pontos(sessao)
+        self.assertEqual(list(pontos), [item.exercicio_id])
+        ponto = pontos[item.exercicio_id]
+        self.assertEqual(ponto.origem, HistoricoCarga.ORIGEM_SESSAO)
+        self.assertEqual(ponto.aluno_id, self.aluno.pk)
+        self.assertEqual(ponto.carga_kg, Decimal(50))
+        self.assertEqual(ponto.registrado_em, quando)
+
+    def test_lotes_seguintes_so_sobem_o_ponto(self):
+        sessao = self.nova_sessao()
+        item = self.itens[0]
+        registrar_series(sessao, self.series([item], 50, numero=1))
+        registrar_series(sessao, self.series([item], 30, numero=2))
+        self.assertEqual(self.pontos(sessao)[item.exercicio_id].carga_kg, Decimal(50))
+
+        registrar_series(sessao, self.series([item], 60, numero=3))
+        self.assertEqual(HistoricoCarga.objects.filter(sessao=sessao).count(), 1)
+        self.assertEqual(self.pontos(sessao)[item.exercicio_id].carga_kg, Decimal(60))
+
+    def test_series_sem_carga_nao_geram_ponto(self):
+        sessao = self.nova_sessao()
+        registrar_series(sessao, self.series(self.itens[:3], None))
+
+        self.assertEqual(SerieRealizada.objects.filter(sessao=sessao).count(), 3)
+        self.assertEqual(self.pontos(sessao), {})
+
+    def test_queries_por_lote_nao_crescem(self):
+        itens = itens_do_treino(self.treino.pk)
+        for etapa, carga in (("novos", 20), ("alterados", 30)):
+            contagens = []
+            for tamanho in TAMANHOS_LOTE:
+                sessao = self.nova_sessao()
+                if etapa == "alterados":
+                    registrar_series(sessao, self.series(self.itens[:tamanho], 20))
+                with CaptureQueriesContext(connection) as queries:
+                    registrar_series(
+                        sessao, self.series(self.itens[:tamanho], carga), itens
+                    )
+                contagens.append(len(queries))
+            with self.subTest(etapa=etapa):
+                self.assertLessEqual(max(contagens), ORCAMENTO_LOTE)
+                self.assertEqual(
+                    len(set(contagens)),
+                    1,
+                    f"{etapa}: {dict(zip(TAMANHOS_LOTE, contagens))}",
+                )
+
+
+class ContadorAlunoTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = Aluno.objects.get(user=criar_usuario("aluno", "ALUNO"))
+        cls.treino = Treino.objects.create(aluno=cls.aluno, nome_treino="Ficha")
+
+    def setUp(self):
+        hoje = mock.patch("django.utils.timezone.localdate", return_value=HOJE)
+        hoje.start()
+        self.addCleanup(hoje.stop)
+
+    def sessao(self, dias_atras, minutos=60):
+        inicio = timezone.make_aware(
+            datetime.combine(HOJE - timedelta(days=dias_atras), time(18))
+        )
+        return SessaoTreino.objects.create(
+            treino=self.treino,
+            aluno=self.aluno,
+            inicio=inicio,
+            fim=inicio + timedelta(minutes=minutos),
+        )
+
+    def valores(self, hoje=HOJE):
+        contador = ContadorAluno.objects.get(aluno=self.aluno)
+        return {"ultimo_dia": contador.ultimo_dia, **valores_atuais(contador, hoje)}
+
+    def test_dias_seguidos_somam_a_sequencia(self):
+        for dias_atras in (2, 1, 1, 0):
+            self.sessao(dias_atras)
+
+        self.assertEqual(
+            self.valores(),
+            {
+                "ultimo_dia": HOJE,
+                "sequencia_dias": 3,
+                "maior_sequencia": 3,
+                "sessoes_semana": 4,
+                "minutos_semana": 240,
+                "minutos_totais": 240,
+            },
+        )
+
+    def test_intervalo_zera_a_sequencia(self):
+        for dias_atras in (9, 8, 7, 1):
+            self.sessao(dias_atras)
+
+        valores = self.valores()
+        self.assertEqual(valores["sequencia_dias"], 1)
+        self.assertEqual(valores["maior_sequencia"], 3)
+        # Dois dias sem treinar: a sequência guardada não vale mais
+        valores = self.valores(HOJE + timedelta(days=1))
+        self.assertEqual(valores["sequencia_dias"], 0)
+        self.assertEqual(valores["maior_sequencia"], 3)
+
+    def test_virada_da_semana(self):
+        segunda = inicio_da_semana(HOJE)
+        anteriores = (HOJE - segunda + timedelta(days=2)).days
+        self.sessao(anteriores, minutos=30)
+        self.sessao(anteriores - 1, minutos=30)
+        # Só há sessões da semana passada
+        self.assertEqual(self.valores()["sessoes_semana"], 0)
+        self.assertEqual(self.valores(segunda - timedelta(days=1))["sessoes_semana"], 2)
+
+        self.sessao(anteriores - 2, minutos=45)
+        self.sessao(1, minutos=45)
+        self.assertEqual(
+            self.valores(),
+            {
+                "ultimo_dia": HOJE - timedelta(days=1),
+                "sequencia_dias": 4,
+                "maior_sequencia": 4,
+                "sessoes_semana": 2,
+                "minutos_semana": 90,
+                "minutos_totais": 150,
+            },
+        )
+        # Na semana seguinte não sobra nada da semana
+        valores = self.valores(segunda + timedelta(days=7))
+        self.assertEqual(valores["sessoes_semana"], 0)
+        self.assertEqual(valores["minutos_semana"], 0)
+        self.assertEqual(valores["minutos_totais"], 150)
+
+    def test_excluir_sessao_recalcula(self):
+        self.sessao(2)
+        meio = self.sessao(1)
+        self.sessao(0)
+        self.assertEqual(self.valores()["sequencia_dias"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            meio.delete()
+
+        valores = self.valores()
+        self.assertEqual(valores["sequencia_dias"], 1)
+        self.assertEqual(valores["maior_sequencia"], 1)
+        self.assertEqual(valores["sessoes_semana"], 2)
+        self.assertEqual(valores["minutos_totais"], 120)
+
+    def test_sessao_retroativa_emenda_a_sequencia(self):
+        self.sessao(0)
+        self.sessao(2)
+        self.assertEqual(self.valores()["sequencia_dias"], 1)
+
+        self.sessao(1)
+        self.assertEqual(self.valores()["sequencia_dias"], 3)
+        self.assertEqual(self.valores()["ultimo_dia"], HOJE)
+
+    def test_encerrar_sessao_soma_os_minutos(self):
+        sessao = self.sessao(0)
+        sessao.fim = sessao.inicio + timedelta(minutes=90)
+        sessao.save()
+
+        valores = self.valores()
+        self.assertEqual(valores["minutos_semana"], 90)
+        self.assertEqual(valores["minutos_totais"], 90)
+
+    def test_comando_recalcula_o_mesmo_estado(self):
+        for dias_atras in (20, 12, 11, 3, 2, 2, 0):
+            self.sessao(dias_atras, minutos=40 + dias_atras)
+        encerrada = self.sessao(1, minutos=10)
+        encerrada.fim += timedelta(minutes=25)
+        encerrada.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            SessaoTreino.objects.get(inicio__date=HOJE - timedelta(days=12)).delete()
+        incremental = self.valores()
+
+        ContadorAluno.objects.filter(aluno=self.aluno).update(
+            sequencia_atual=0, maior_sequencia=0, sessoes_semana=0, minutos_totais=0
+        )
+        call_command("recalcular_contadores", stdout=StringIO())
 
-# Create your tests here.
+        self.assertEqual(self.valores(), incremental)
+        self.assertEqual(incremental["sequencia_dias"], 4)
+        self.assertEqual(incremental["maior_sequencia"], 4)
@@ -50,6 +50,12 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # ordem da paginação por cursor de alunos e personais na API
+            models.Index(fields=["date_joined", "id"]),
+        ]
+
     def save(self, *args, **kwargs):
         # Gera username automaticamente a partir do email se estiver vazio
         if not self.username: